@@ -0,0 +1,125 @@
+import collections
+import os
+import threading
+import time
+
+
+# Raised when too many hashing jobs are already waiting for a worker
+# (a ValueError so that sign_up/log_in report it like any other login error)
+class AuthBusyError(ValueError):
+    pass
+
+
+# Auth executor class - runs bcrypt hashing and verification on a worker pool
+class AuthExecutor:
+    """
+    Runs the CPU-heavy bcrypt work on a thread pool (bcrypt releases the GIL while hashing).
+    The number of queued jobs is bounded so that a login burst is rejected quickly
+    instead of piling up behind the workers.
+    """
+
+    def __init__(self, rounds: int = 12, workers: int = None, max_pending: int = 64, queue_timeout: float = 5.0, rate_window: float = 10.0):
+        self.rounds = rounds # bcrypt work factor (cost) for new hashes
+        self.queue_timeout = queue_timeout # Seconds to wait for a free queue slot
+        self.rate_window = rate_window # Seconds covered by the hashes-per-second figure
+
+        self._workers = workers or os.cpu_count() or 2
+        self._executor = None # Started by the first job, so that commands that never hash do not pay for it
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._completed = collections.deque() # Completion times inside the rate window
+        self._hashes = 0
+        self._verifications = 0
+        self._rehashes = 0
+        self._rejected = 0
+        self._jobs = 0 # Finished jobs, used for the average queue latency
+        self._total_queue_wait = 0.0
+        self._max_queue_wait = 0.0
+
+    # Run a bcrypt job on the pool and wait for its result
+    def _run(self, func, *args):
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            with self._lock:
+                self._rejected += 1
+            raise AuthBusyError("Authentication service is busy, please try again")
+
+        submitted = time.perf_counter()
+
+        def job():
+            started = time.perf_counter()
+            try:
+                return func(*args)
+            finally:
+                self._record(started - submitted)
+
+        try:
+            return self._get_executor().submit(job).result()
+        finally:
+            self._slots.release()
+
+    def _get_executor(self):
+        if self._executor is None:
+            with self._lock:
+                if self._executor is None:
+                    from concurrent.futures import ThreadPoolExecutor
+                    self._executor = ThreadPoolExecutor(max_workers=self._workers, thread_name_prefix='bcrypt')
+        return self._executor
+
+    def _record(self, queue_wait):
+        now = time.monotonic()
+        with self._lock:
+            self._completed.append(now)
+            while self._completed and now - self._completed[0] > self.rate_window:
+                self._completed.popleft()
+            self._jobs += 1
+            self._total_queue_wait += queue_wait
+            self._max_queue_wait = max(self._max_queue_wait, queue_wait)
+
+    # Hash a password with the configured work factor
+    def hash_password(self, password: str) -> bytes:
+        with self._lock:
+            self._hashes += 1
+        import bcrypt # Imported on first use so that commands that never hash start faster
+        return self._run(lambda: bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=self.rounds)))
+
+    # Compare a plain password against a stored hash
+    def check_password(self, stored_password: bytes, provided_password: str) -> bool:
+        with self._lock:
+            self._verifications += 1
+        import bcrypt
+        return self._run(bcrypt.checkpw, provided_password.encode('utf-8'), stored_password)
+
+    # True if the stored hash was made with a lower work factor than the configured one.
+    # Stronger hashes are kept, so a process started with a low cost (e.g. a benchmark) never weakens them.
+    def needs_rehash(self, stored_password: bytes) -> bool:
+        try:
+            # bcrypt hashes look like $2b$12$..., where 12 is the cost
+            cost = int(stored_password.split(b'$')[2])
+        except (IndexError, ValueError):
+            return True
+        return cost < self.rounds
+
+    def note_rehash(self):
+        with self._lock:
+            self._rehashes += 1
+
+    # Hashes per second and queue latency
+    def metrics(self):
+        with self._lock:
+            jobs = self._jobs
+            return {
+                'rounds': self.rounds,
+                'hashes': self._hashes,
+                'verifications': self._verifications,
+                'rehashes': self._rehashes,
+                'rejected': self._rejected,
+                'ops_per_second': len(self._completed) / self.rate_window,
+                'avg_queue_ms': (self._total_queue_wait / jobs * 1000) if jobs > 0 else 0.0,
+                'max_queue_ms': self._max_queue_wait * 1000,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
@@ -0,0 +1,122 @@
+import bisect
+import threading
+
+
+# Rentals in these statuses hold the car for their date range
+BLOCKING_STATUSES = ('on process', 'active')
+
+# SQL value of cars.available_now: the car is in service and not out on an active rental on the given day.
+# Takes the day twice as parameters; used by the scheduler's sweep and whenever a car is updated.
+AVAILABLE_NOW_SQL = (
+    "CASE WHEN cars.in_service = 1 AND NOT EXISTS (SELECT 1 FROM rentals WHERE rentals.car_id = cars.car_id"
+    " AND rentals.status = 'active' AND rentals.start_date <= %s AND rentals.end_date >= %s) THEN 1 ELSE 0 END"
+)
+
+
+# Availability engine - keeps the booked date ranges of every car in memory
+class AvailabilityEngine:
+    """
+    Per-car interval index of booked date ranges.
+    Each car keeps its bookings sorted by start date together with a running maximum
+    of the end dates, so an overlap check is a single binary search.
+    The database stays the source of truth; this index only answers questions quickly, and a
+    booking that the index says is taken is confirmed against the database (see reconcile()).
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._bookings = {} # car_id -> list of (start_date, end_date, rental_id) sorted by start_date
+        self._starts = {} # car_id -> list of start dates (parallel to _bookings, used for bisect)
+        self._reach = {} # car_id -> running maximum of end dates (parallel to _bookings)
+        self._rentals = {} # rental_id -> car_id
+
+    # Load every blocking rental from the rentals table
+    def load(self, conn):
+        cursor = conn.cursor()
+        cursor.execute(
+            "SELECT rental_id, car_id, start_date, end_date FROM rentals WHERE status IN (%s, %s)",
+            BLOCKING_STATUSES
+        )
+        rows = cursor.fetchall()
+        with self._lock:
+            self._bookings.clear()
+            self._starts.clear()
+            self._reach.clear()
+            self._rentals.clear()
+            for rental_id, car_id, start_date, end_date in rows:
+                self.book(car_id, rental_id, start_date, end_date)
+        return len(rows)
+
+    # Record a booking for a car
+    def book(self, car_id, rental_id, start_date, end_date):
+        with self._lock:
+            if rental_id in self._rentals:
+                self.release(rental_id)
+            bookings = self._bookings.setdefault(car_id, [])
+            starts = self._starts.setdefault(car_id, [])
+            position = bisect.bisect_right(starts, start_date)
+            bookings.insert(position, (start_date, end_date, rental_id))
+            starts.insert(position, start_date)
+            self._rentals[rental_id] = car_id
+            self._rebuild_reach(car_id, position)
+
+    # Forget a booking once the rental is cancelled, completed or returned
+    def release(self, rental_id):
+        with self._lock:
+            car_id = self._rentals.pop(rental_id, None)
+            if car_id is None:
+                return False
+            bookings = self._bookings[car_id]
+            for position, booking in enumerate(bookings):
+                if booking[2] == rental_id:
+                    del bookings[position]
+                    del self._starts[car_id][position]
+                    self._rebuild_reach(car_id, position)
+                    break
+            return True
+
+    # Bring the bookings of one car that overlap [start_date, end_date] in line with the blocking rentals the
+    # database holds for that period (rows of rental_id, start_date, end_date). Other processes - a second
+    # CLI, the scheduler run from cron - change rentals without telling this index.
+    def reconcile(self, car_id, start_date, end_date, rows):
+        with self._lock:
+            current = {row[0] for row in rows}
+            for booking_start, booking_end, rental_id in list(self._bookings.get(car_id, [])):
+                if booking_start <= end_date and booking_end >= start_date and rental_id not in current:
+                    self.release(rental_id)
+            for rental_id, booking_start, booking_end in rows:
+                self.book(car_id, rental_id, booking_start, booking_end)
+
+    # Recompute the running maximum of end dates from `position` onwards
+    def _rebuild_reach(self, car_id, position):
+        bookings = self._bookings[car_id]
+        reach = self._reach.setdefault(car_id, [])
+        del reach[position:]
+        current = reach[-1] if reach else None
+        for start_date, end_date, _ in bookings[position:]:
+            if current is None or end_date > current:
+                current = end_date
+            reach.append(current)
+
+    # Is the car free for the whole period [start_date, end_date]?
+    def is_free(self, car_id, start_date, end_date):
+        with self._lock:
+            starts = self._starts.get(car_id)
+            if not starts:
+                return True
+            # Bookings that start on or before end_date are the only ones that can overlap
+            position = bisect.bisect_right(starts, end_date)
+            if position == 0:
+                return True
+            # One of them overlaps if the latest end date among them reaches start_date
+            return self._reach[car_id][position - 1] < start_date
+
+    # Which of the given cars are free for the whole period [start_date, end_date]?
+    def free_cars(self, car_ids, start_date, end_date):
+        with self._lock:
+            return [car_id for car_id in car_ids if self.is_free(car_id, start_date, end_date)]
+
+    # Booked periods of one car as (start_date, end_date, rental_id) tuples
+    def bookings(self, car_id):
+        with self._lock:
+            return list(self._bookings.get(car_id, []))
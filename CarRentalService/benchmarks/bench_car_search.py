@@ -0,0 +1,152 @@
+# Benchmark - car search through the in-memory index versus the equivalent SQL LIKE queries.
+# Usage: python benchmarks/bench_car_search.py [cars] [repeats]
+# Runs against a temporary SQLite database, so no server is needed. Both sides return the first
+# 20 matches; the index ranks whole-word matches first, SQL simply orders by car_id.
+# The second table times every plan the index could use for each query next to the planner's estimate,
+# which is how the cost constants in car_search.py are checked: the chosen plan should be the fastest.
+import os
+import random
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKDIR = tempfile.mkdtemp()
+os.environ.update(DB_BACKEND='sqlite', SQLITE_PATH=os.path.join(WORKDIR, 'search.db'))
+
+from main import create_connection, create_pool, CarManager # noqa: E402
+from car_search import tokenize # noqa: E402
+
+MAKES = ['Toyota', 'Tesla', 'Ford', 'Honda', 'Land Rover', 'Volkswagen', 'Mercedes Benz', 'Mazda', 'Nissan', 'Kia']
+MODELS = ['Corolla', 'Camry', 'Model 3', 'Model Y', 'Focus', 'Fiesta', 'Civic', 'Range Rover', 'Golf', 'Polo',
+          'C 200', 'Mazda3', 'Leaf', 'Sportage', 'Mustang', 'Accord', 'Defender', 'Passat', 'Qashqai', 'Ceed']
+
+# (label, search arguments)
+QUERIES = [
+    ('one word', dict(text='toyota')),
+    ('two prefixes', dict(text='toy cor')),
+    ('short prefix', dict(text='m')),
+    ('prefix + year range', dict(text='mod', year=(2020, 2024))),
+    ('mileage range only', dict(mileage=(None, 20000))),
+    ('year + mileage', dict(year=(2015, 2016), mileage=(50000, 60000))),
+    ('word + rental days', dict(text='land rover', rental_days=14)),
+    ('no match', dict(text='zzz')),
+]
+
+
+def seed(pool, count):
+    rng = random.Random(7)
+    rows = []
+    for _ in range(count):
+        min_days = rng.randint(1, 7)
+        rows.append((rng.choice(MAKES), rng.choice(MODELS), rng.randint(2005, 2024), rng.randint(0, 200000),
+                     1 if rng.random() < 0.9 else 0, min_days, min_days + rng.randint(0, 30)))
+    with pool.transaction() as conn:
+        conn.cursor().executemany(
+            "INSERT INTO cars (make, model, year, mileage, in_service, available_now, min_rent_period, max_rent_period) "
+            "VALUES (%s, %s, %s, %s, %s, 1, %s, %s)", rows
+        )
+
+
+# The same search as one SQL statement: every term is a prefix of a make or model word
+def sql_search(conn, text=None, year=None, mileage=None, rental_days=None, limit=20):
+    conditions, params = ["in_service = 1"], []
+    for term in tokenize(text):
+        conditions.append("(LOWER(make) LIKE %s OR LOWER(make) LIKE %s OR LOWER(model) LIKE %s OR LOWER(model) LIKE %s)")
+        params.extend([f"{term}%", f"% {term}%"] * 2)
+    for column, bounds in (('year', year), ('mileage', mileage)):
+        low, high = bounds or (None, None)
+        if low is not None:
+            conditions.append(f"{column} >= %s")
+            params.append(low)
+        if high is not None:
+            conditions.append(f"{column} <= %s")
+            params.append(high)
+    if rental_days is not None:
+        conditions.append("min_rent_period <= %s AND max_rent_period >= %s")
+        params.extend([rental_days, rental_days])
+    sql = f"SELECT car_id FROM cars WHERE {' AND '.join(conditions)} ORDER BY car_id"
+    if limit is not None:
+        sql += f" LIMIT {int(limit)}"
+    cursor = conn.cursor()
+    cursor.execute(sql, params)
+    return [row[0] for row in cursor.fetchall()]
+
+
+# The keys of the conditions a plan is driven by, as explain() reports them
+def plan_keys(how, chosen):
+    return [] if how == 'scan' else [condition[2] for condition in (chosen if how == 'slice' else [chosen])]
+
+
+# Every plan the planner weighs for a query as (estimated cost in us, (plan, keys))
+def candidate_plans(index, arguments):
+    ranges = index._ranges(arguments.get('year'), arguments.get('mileage'), None, None, arguments.get('rental_days'))
+    conditions = index._conditions(list(dict.fromkeys(tokenize(arguments.get('text')))), ranges, len(index))
+    if conditions is None: # Nothing matches, no plan runs
+        return []
+    return [(cost / 1000, (how, plan_keys(how, chosen))) for cost, how, chosen in index._plans(conditions, len(index), 20)]
+
+
+# Time a search with the planner forced to one plan
+def timed_plan(index, arguments, plan, repeats):
+    plans = index._plans
+    index._plans = lambda conditions, total, limit: [
+        candidate for candidate in plans(conditions, total, limit) if (candidate[1], plan_keys(*candidate[1:])) == plan
+    ]
+    try:
+        return timed(lambda: index.search(**arguments), repeats)[0]
+    finally:
+        del index._plans
+
+
+def timed(function, repeats):
+    samples = []
+    for _ in range(repeats):
+        started = time.perf_counter()
+        function()
+        samples.append(time.perf_counter() - started)
+    samples.sort()
+    return statistics.median(samples) * 1e6, samples[int(len(samples) * 0.95) - 1] * 1e6
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    try:
+        create_connection().close() # Creates and migrates the database
+        pool = create_pool()
+        seed(pool, count)
+        car_manager = CarManager(pool)
+
+        started = time.perf_counter()
+        index = car_manager.search_index
+        print(f"{len(index)} cars indexed in {(time.perf_counter() - started) * 1000:.0f} ms, {index.stats()['words']} words\n")
+
+        print(f"{'query':<22} {'matches':>8} {'index p50':>10} {'index p95':>10} {'SQL p50':>10} {'SQL p95':>10} {'speed-up':>9}  plan")
+        with pool.connection() as conn:
+            for label, arguments in QUERIES:
+                # Both sides must find the same cars
+                found = sorted(car[0] for car in index.search(limit=None, **arguments))
+                expected = sql_search(conn, limit=None, **arguments)
+                if found != expected:
+                    sys.exit(f"{label}: index found {len(found)} cars, SQL found {len(expected)}")
+
+                index_p50, index_p95 = timed(lambda: index.search(**arguments), repeats)
+                sql_p50, sql_p95 = timed(lambda: sql_search(conn, **arguments), max(repeats // 10, 5))
+                how, keys = index.explain(**arguments)
+                print(f"{label:<22} {len(found):>8} {index_p50:>8.0f}us {index_p95:>8.0f}us {sql_p50:>8.0f}us {sql_p95:>8.0f}us {sql_p50 / index_p50:>8.0f}x  {how} {' '.join(keys)}")
+
+        print(f"\n{'query':<22} {'plan':<28} {'estimate':>9} {'measured':>9}")
+        for label, arguments in QUERIES:
+            chosen = index.explain(**arguments)
+            for estimate, plan in candidate_plans(index, arguments):
+                measured = timed_plan(index, arguments, plan, max(repeats // 4, 5))
+                marker = ' <- chosen' if plan == chosen else ''
+                print(f"{label:<22} {' '.join([plan[0], *plan[1]]):<28} {estimate:>7.0f}us {measured:>7.0f}us{marker}")
+                label = ''
+        pool.close()
+    finally:
+        shutil.rmtree(WORKDIR, ignore_errors=True)
@@ -0,0 +1,82 @@
+# Benchmark - compare per-row CarManager.add_car with the batched fleet import.
+# Usage: python benchmarks/bench_fleet_import.py [cars] [batch size]
+# Runs against the database configured in .env. Every car it creates has the make
+# 'BENCH-IMPORT' and is deleted again at the end.
+import contextlib
+import csv
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from main import create_connection, create_pool, CarManager # noqa: E402
+from fleet_io import CAR_FIELDS, import_cars # noqa: E402
+
+BENCH_MAKE = 'BENCH-IMPORT'
+
+
+# Write a CSV file with `count` synthetic cars
+def write_fleet(path, count):
+    models = ['Corolla', 'Civic', 'Model 3', 'Golf', 'Focus', 'Swift', 'Mazda3', 'Leaf']
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.writer(file)
+        writer.writerow(CAR_FIELDS)
+        for _ in range(count):
+            min_period = random.randint(1, 7)
+            writer.writerow((BENCH_MAKE, random.choice(models), random.randint(2005, 2024), random.randint(0, 200000),
+                             random.choice(('yes', 'no')), min_period, min_period + random.randint(0, 60)))
+
+
+def delete_bench_cars(pool):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("DELETE FROM cars WHERE make = %s", (BENCH_MAKE,))
+        conn.commit()
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    batch_size = int(sys.argv[2]) if len(sys.argv) > 2 else 1000
+    per_row_count = min(count, 1000) # The per-row path is slow, so it runs on a sample and is extrapolated
+
+    conn = create_connection()
+    if conn is None:
+        sys.exit("Failed to initialize database.")
+    conn.close()
+
+    pool = create_pool()
+    car_manager = CarManager(pool)
+    path = os.path.join(tempfile.mkdtemp(), 'fleet.csv')
+    write_fleet(path, count)
+
+    try:
+        # Per-row add_car: one INSERT and one commit per car
+        with open(path, newline='', encoding='utf-8') as file:
+            rows = list(csv.DictReader(file))[:per_row_count]
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()): # add_car prints a line per car
+            for row in rows:
+                available_now = 1 if row['available_now'] == 'yes' else 0
+                car_manager.add_car(row['make'], row['model'], row['year'], row['mileage'], available_now, row['min_rent_period'], row['max_rent_period'])
+        per_row_seconds = time.perf_counter() - started
+        per_row_rate = per_row_count / per_row_seconds
+        delete_bench_cars(pool)
+
+        # Batched import
+        started = time.perf_counter()
+        report = import_cars(car_manager, path, batch_size)
+        bulk_seconds = time.perf_counter() - started
+        bulk_rate = report.inserted / bulk_seconds
+
+        print(f"per-row add_car : {per_row_count} cars in {per_row_seconds:.2f}s ({per_row_rate:,.0f} cars/s, "
+              f"~{count / per_row_rate:.1f}s for {count})")
+        print(f"batched import  : {report.inserted} cars in {bulk_seconds:.2f}s ({bulk_rate:,.0f} cars/s, batch size {batch_size})")
+        print(f"speed-up        : {bulk_rate / per_row_rate:.1f}x")
+    finally:
+        delete_bench_cars(pool)
+        os.remove(path)
+        pool.close()
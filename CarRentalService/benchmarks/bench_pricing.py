@@ -0,0 +1,66 @@
+# Benchmark - quote a synthetic catalog with one quote() call per car versus a single quote_catalog() pass.
+# Usage: python benchmarks/bench_pricing.py [cars] [rental days]
+# Runs entirely in memory; no database is needed.
+import datetime
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pricing import PricingEngine, PricingError # noqa: E402
+
+
+def make_catalog(count):
+    makes = ['Toyota', 'Honda', 'Tesla', 'Volkswagen', 'Ford', 'Suzuki', 'Mazda', 'Nissan']
+    cars = []
+    for car_id in range(1, count + 1):
+        min_period = random.randint(1, 5)
+        cars.append((car_id, random.choice(makes), 'Model', random.randint(2005, 2024), random.randint(0, 200000), 1, min_period, min_period + random.randint(5, 60)))
+    return cars
+
+
+def best_of(runs, func):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - started)
+    return min(timings), result
+
+
+if __name__ == "__main__":
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+    days = int(sys.argv[2]) if len(sys.argv) > 2 else 7
+
+    engine = PricingEngine(
+        default_rate=50,
+        class_rates={'Tesla': 95, 'Toyota': 45},
+        car_rates={car_id: 70 for car_id in range(1, count + 1, 97)},
+        seasons=[('12-15', '01-05', 1.3), ('07-01', '08-31', 1.15)],
+        weekend_multiplier=1.2,
+        duration_discounts=[(7, 0.10), (28, 0.25)],
+    )
+    cars = make_catalog(count)
+    start_date = datetime.date.today() + datetime.timedelta(days=30)
+    end_date = start_date + datetime.timedelta(days=days - 1)
+
+    def per_car():
+        quotes = []
+        for car in cars:
+            try:
+                quotes.append((car, engine.quote(car, start_date, end_date)))
+            except PricingError:
+                pass
+        return quotes
+
+    per_car_seconds, per_car_quotes = best_of(5, per_car)
+    cold_seconds, _ = best_of(1, lambda: engine.quote_catalog(cars, start_date, end_date)) # Builds the rate table
+    catalog_seconds, catalog_quotes = best_of(5, lambda: engine.quote_catalog(cars, start_date, end_date))
+    assert per_car_quotes == catalog_quotes
+
+    print(f"{count} cars, {days}-day rental, {len(catalog_quotes)} cars quotable")
+    print(f"per-car quote() : {per_car_seconds * 1000:8.2f} ms")
+    print(f"quote_catalog() : {cold_seconds * 1000:8.2f} ms (first call, builds the rate table)")
+    print(f"quote_catalog() : {catalog_seconds * 1000:8.2f} ms ({per_car_seconds / catalog_seconds:.1f}x faster)")
@@ -0,0 +1,78 @@
+# Benchmark - cold-start latency of each main.py subcommand, with and without the schema-verified marker.
+# Usage: python benchmarks/bench_startup.py [runs per command]
+# Every run is a fresh interpreter against a temporary SQLite database, so no server is needed.
+import datetime
+import os
+import shutil
+import sqlite3
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAIN = os.path.join(ROOT, 'main.py')
+
+# Each command runs against the same database; the IDs below exist after seed()
+COMMANDS = [
+    ('--help', ['--help']),
+    ('list-cars', ['list-cars']),
+    ('list-rentals', ['list-rentals', '--status', 'active']),
+    ('add-car', ['add-car', '--make', 'Bench', '--model', 'Startup', '--year', '2022', '--mileage', '10',
+                 '--in-service', 'yes', '--min-days', '1', '--max-days', '30']),
+    ('update-car', ['update-car', '1', '--make', 'Bench', '--model', 'Startup', '--year', '2022', '--mileage', '20',
+                    '--in-service', 'yes', '--min-days', '1', '--max-days', '30']),
+    ('approve', ['approve', '1']), # Fails after the first run (already active), which is still a full round trip
+    ('cancel', ['cancel', '2']),
+]
+
+
+def run(args, env):
+    started = time.perf_counter()
+    subprocess.run([sys.executable, MAIN] + args, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=ROOT)
+    return time.perf_counter() - started
+
+
+def seed(database):
+    conn = sqlite3.connect(database)
+    conn.executemany(
+        "INSERT INTO cars (make, model, year, mileage, in_service, available_now, min_rent_period, max_rent_period) VALUES (?, ?, ?, ?, 1, 1, 1, 30)",
+        [('Toyota', 'Corolla', 2020, 1000 * i) for i in range(200)]
+    )
+    start = datetime.date.today() + datetime.timedelta(days=10)
+    conn.executemany(
+        "INSERT INTO rentals (car_id, user_id, start_date, end_date, total_fee, status) VALUES (?, NULL, ?, ?, 100, ?)",
+        [(i + 1, start.isoformat(), (start + datetime.timedelta(days=2)).isoformat(), 'on process' if i < 100 else 'active') for i in range(200)]
+    )
+    conn.commit()
+    conn.close()
+
+
+if __name__ == "__main__":
+    runs = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, DB_BACKEND='sqlite', SQLITE_PATH=os.path.join(workdir, 'startup.db'),
+               SCHEMA_MARKER_DIR=os.path.join(workdir, 'markers'))
+    try:
+        subprocess.run([sys.executable, MAIN, 'migrate'], env=env, stdout=subprocess.DEVNULL, check=True, cwd=ROOT)
+        seed(env['SQLITE_PATH'])
+
+        interpreter = []
+        for _ in range(runs):
+            started = time.perf_counter()
+            subprocess.run([sys.executable, '-c', 'pass'], env=env)
+            interpreter.append(time.perf_counter() - started)
+        print(f"python -c pass: {statistics.median(interpreter) * 1000:7.1f} ms (interpreter start-up alone)\n")
+
+        print(f"{'command':<14} {'no marker (median)':>19} {'marker (median)':>16} {'marker (min)':>13}")
+        for name, args in COMMANDS:
+            # Without the marker every run verifies the schema against the database first
+            cold = []
+            for _ in range(runs):
+                shutil.rmtree(env['SCHEMA_MARKER_DIR'], ignore_errors=True)
+                cold.append(run(args, env))
+            warm = [run(args, env) for _ in range(runs)]
+            print(f"{name:<14} {statistics.median(cold) * 1000:>16.1f} ms {statistics.median(warm) * 1000:>13.1f} ms {min(warm) * 1000:>10.1f} ms")
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,368 @@
+# Load test - seeds synthetic users, cars and rental history, drives a mixed concurrent workload
+# through the managers and reports p50/p95/p99 latency and ops/sec per operation.
+#
+# Usage:
+#   python benchmarks/load_test.py [--backend sqlite|mysql] [--cars 1000] [--users 500] [--years 3]
+#                                  [--threads 16] [--duration 30] [--mix search=40,book=25,...]
+#                                  [--output results.json]
+#   python benchmarks/load_test.py --compare old.json new.json
+#
+# The default SQLite backend runs in a temporary file and needs no server. With --backend mysql
+# the database configured in .env is used, so point it at a scratch database.
+import argparse
+import collections
+import contextlib
+import datetime
+import io
+import itertools
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+DEFAULT_MIX = 'search=30,quote=10,list=15,book=20,approve=10,return=5,cancel=3,login=5,register=2'
+PASSWORD = 'password'
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Load test for the booking hot path")
+    parser.add_argument('--backend', choices=('sqlite', 'mysql'), default='sqlite')
+    parser.add_argument('--sqlite-path', help="SQLite database file (default: a new temporary file)")
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--cars', type=int, default=1000)
+    parser.add_argument('--years', type=int, default=3, help="Years of rental history to seed")
+    parser.add_argument('--rentals-per-year', type=int, default=12, help="Past rentals per car per year")
+    parser.add_argument('--threads', type=int, default=16)
+    parser.add_argument('--pool-size', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=30.0, help="Seconds to run the workload")
+    parser.add_argument('--mix', default=DEFAULT_MIX, help="Operation weights, e.g. search=40,book=30")
+    parser.add_argument('--bcrypt-rounds', type=int, default=4, help="bcrypt cost used for seeded and new users")
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--query-metrics', action='store_true', help="Record per-statement timings and include them in the results")
+    parser.add_argument('--slow-query-ms', type=float, default=100.0)
+    parser.add_argument('--output', help="Write the results to this JSON file")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="Compare two result files and exit")
+    return parser.parse_args()
+
+
+# p-th percentile of a sorted list (nearest-rank)
+def percentile(sorted_values, p):
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(p / 100 * len(sorted_values) + 0.5)) - 1))
+    return sorted_values[rank]
+
+
+# Latency samples and outcome counters of one operation
+class OperationStats:
+    def __init__(self):
+        self.latencies = []
+        self.succeeded = 0
+        self.rejected = 0 # The operation ran but did nothing (e.g. car already booked)
+        self.errors = 0
+
+    def summary(self, elapsed):
+        latencies = sorted(self.latencies)
+        count = len(latencies)
+        return {
+            'count': count,
+            'succeeded': self.succeeded,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'ops_per_sec': round(count / elapsed, 2) if elapsed else 0.0,
+            'mean_ms': round(sum(latencies) / count * 1000, 3) if count else 0.0,
+            'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+            'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+            'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+            'max_ms': round(latencies[-1] * 1000, 3) if count else 0.0,
+        }
+
+
+# Insert users, cars and multi-year rental history straight into the database in batches
+def seed(pool, args, password_hash):
+    from availability import AVAILABLE_NOW_SQL
+
+    rng = random.Random(args.seed)
+    makes = {'Toyota': ['Corolla', 'Camry', 'RAV4'], 'Honda': ['Civic', 'Jazz'], 'Tesla': ['Model 3', 'Model Y'],
+             'Ford': ['Focus', 'Ranger'], 'Mazda': ['Mazda3', 'CX-5'], 'Suzuki': ['Swift'], 'Nissan': ['Leaf']}
+    today = datetime.date.today()
+    history_start = today - datetime.timedelta(days=365 * args.years)
+
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        users = [(f"User {i}", f"user{i}@bench.test", password_hash, 'admin' if i % 50 == 0 else 'customer') for i in range(args.users)]
+        cursor.executemany("INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, %s)", users)
+
+        cars = []
+        for _ in range(args.cars):
+            make = rng.choice(list(makes))
+            min_period = rng.randint(1, 3)
+            # About 10% of the fleet is out of service; available_now is derived from the bookings below
+            cars.append((make, rng.choice(makes[make]), rng.randint(2010, 2024), rng.randint(0, 150000), 1 if rng.random() < 0.9 else 0, min_period, min_period + rng.randint(10, 60)))
+        cursor.executemany("INSERT INTO cars (make, model, year, mileage, in_service, min_rent_period, max_rent_period) VALUES (%s, %s, %s, %s, %s, %s, %s)", cars)
+        conn.commit()
+
+        cursor.execute("SELECT MIN(user_id), MAX(user_id) FROM users")
+        first_user, last_user = cursor.fetchone()
+        cursor.execute("SELECT car_id FROM cars")
+        car_ids = [row[0] for row in cursor.fetchall()]
+
+        # Non-overlapping rentals per car, spread over the history window and a little into the future
+        rentals = []
+        for car_id in car_ids:
+            day = history_start + datetime.timedelta(days=rng.randint(0, 20))
+            gap = max(1, 365 // max(1, args.rentals_per_year))
+            while day < today + datetime.timedelta(days=60):
+                length = rng.randint(1, 10)
+                end = day + datetime.timedelta(days=length - 1)
+                if end < today:
+                    status = rng.choice(('returned', 'returned', 'completed', 'cancelled'))
+                elif day <= today:
+                    status = 'active'
+                else:
+                    status = rng.choice(('on process', 'active'))
+                rentals.append((car_id, rng.randint(first_user, last_user), day, end, length * 50, status))
+                day = end + datetime.timedelta(days=rng.randint(1, gap * 2))
+        for start in range(0, len(rentals), 5000):
+            cursor.executemany("INSERT INTO rentals (car_id, user_id, start_date, end_date, total_fee, status) VALUES (%s, %s, %s, %s, %s, %s)", rentals[start:start + 5000])
+            conn.commit()
+        cursor.execute(f"UPDATE cars SET available_now = {AVAILABLE_NOW_SQL}", (today, today))
+        conn.commit()
+
+    return first_user, last_user, car_ids, len(rentals)
+
+
+# The mixed workload: each worker picks operations by weight until the deadline
+class Workload:
+    def __init__(self, main, managers, args, first_user, last_user, car_ids):
+        self.main = main
+        self.users, self.cars, self.rentals = managers
+        self.args = args
+        self.first_user = first_user
+        self.last_user = last_user
+        self.car_ids = car_ids
+        self.pending = collections.deque() # Rentals created during the run, waiting for approval
+        self.active = collections.deque() # Rentals approved during the run, waiting for return
+        self.new_users = 0
+        self.lock = threading.Lock()
+
+        weights = dict(item.split('=') for item in args.mix.split(','))
+        self.operations = [name for name in weights]
+        self.weights = [float(weights[name]) for name in self.operations]
+        for name in self.operations:
+            if not hasattr(self, 'op_' + name):
+                raise SystemExit(f"Unknown operation in --mix: {name}")
+
+    def random_window(self, rng):
+        start = datetime.date.today() + datetime.timedelta(days=rng.randint(1, 365))
+        return start, start + datetime.timedelta(days=rng.randint(2, 9))
+
+    # Each operation returns True (did something), False (ran but was rejected)
+    def op_search(self, rng):
+        start, end = self.random_window(rng)
+        self.rentals.find_available_cars(start.isoformat(), end.isoformat())
+        return True
+
+    def op_quote(self, rng):
+        start, end = self.random_window(rng)
+        return bool(self.rentals.quote_available_cars(start.isoformat(), end.isoformat()))
+
+    def op_list(self, rng):
+        # Only the first page, like the menus show before prompting for more
+        rows = list(itertools.islice(self.rentals.iter_rentals(statuses=self.main.OPEN_STATUSES, after=rng.randint(0, 1000), page_size=20), 20))
+        return bool(rows)
+
+    def op_book(self, rng):
+        start, end = self.random_window(rng)
+        rental_id = self.rentals.create_rental(rng.choice(self.car_ids), rng.randint(self.first_user, self.last_user), start.isoformat(), end.isoformat())
+        if rental_id is None:
+            return False
+        self.pending.append(rental_id)
+        return True
+
+    def op_approve(self, rng):
+        try:
+            rental_id = self.pending.popleft()
+        except IndexError:
+            return False
+        if self.rentals.approve_rental(rental_id):
+            self.active.append(rental_id)
+            return True
+        return False
+
+    def op_return(self, rng):
+        try:
+            rental_id = self.active.popleft()
+        except IndexError:
+            return False
+        return bool(self.rentals.return_rental(rental_id))
+
+    def op_cancel(self, rng):
+        try:
+            rental_id = self.pending.pop()
+        except IndexError:
+            return False
+        return bool(self.rentals.cancel_rental(rental_id))
+
+    def op_login(self, rng):
+        user_number = rng.randint(0, self.args.users - 1)
+        return self.users.login(f"user{user_number}@bench.test", PASSWORD) is not None
+
+    def op_register(self, rng):
+        with self.lock:
+            self.new_users += 1
+            number = self.new_users
+        self.users.register_user(f"New {number}", f"new{number}-{rng.random()}@bench.test", PASSWORD, 'customer')
+        return True
+
+    def run(self, threads, duration):
+        stats = {name: OperationStats() for name in self.operations}
+        deadline = time.perf_counter() + duration
+
+        def worker(worker_id):
+            rng = random.Random(self.args.seed * 1000 + worker_id)
+            local = {name: OperationStats() for name in self.operations}
+            while time.perf_counter() < deadline:
+                name = rng.choices(self.operations, self.weights)[0]
+                started = time.perf_counter()
+                try:
+                    ok = getattr(self, 'op_' + name)(rng)
+                    outcome = 'succeeded' if ok else 'rejected'
+                except Exception:
+                    outcome = 'errors'
+                local[name].latencies.append(time.perf_counter() - started)
+                setattr(local[name], outcome, getattr(local[name], outcome) + 1)
+            with self.lock:
+                for name, op in local.items():
+                    stats[name].latencies.extend(op.latencies)
+                    stats[name].succeeded += op.succeeded
+                    stats[name].rejected += op.rejected
+                    stats[name].errors += op.errors
+
+        workers = [threading.Thread(target=worker, args=(i,)) for i in range(threads)]
+        started = time.perf_counter()
+        for thread in workers:
+            thread.start()
+        for thread in workers:
+            thread.join()
+        return stats, time.perf_counter() - started
+
+
+def git_version():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def print_results(results):
+    print(f"\n{'operation':<10} {'count':>8} {'ok':>7} {'rej':>6} {'err':>5} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for name, op in sorted(results['operations'].items()):
+        print(f"{name:<10} {op['count']:>8} {op['succeeded']:>7} {op['rejected']:>6} {op['errors']:>5} {op['ops_per_sec']:>9.1f} {op['p50_ms']:>9.2f} {op['p95_ms']:>9.2f} {op['p99_ms']:>9.2f}")
+    print(f"\ntotal: {results['total_ops']} ops in {results['elapsed_sec']:.1f}s ({results['total_ops_per_sec']:.1f} ops/s)")
+
+
+# Show how each operation changed between two result files
+def compare(old_path, new_path):
+    with open(old_path, encoding='utf-8') as file:
+        old = json.load(file)
+    with open(new_path, encoding='utf-8') as file:
+        new = json.load(file)
+    print(f"{old.get('version')} -> {new.get('version')}")
+    print(f"{'operation':<10} {'ops/s':>18} {'p95 ms':>22} {'p99 ms':>22}")
+    for name in sorted(set(old['operations']) | set(new['operations'])):
+        a, b = old['operations'].get(name), new['operations'].get(name)
+        if not a or not b:
+            print(f"{name:<10} only in {'new' if b else 'old'}")
+            continue
+
+        def change(key):
+            before, after = a[key], b[key]
+            delta = ((after - before) / before * 100) if before else 0.0
+            return f"{before:.1f} -> {after:.1f} ({delta:+.0f}%)"
+        print(f"{name:<10} {change('ops_per_sec'):>18} {change('p95_ms'):>22} {change('p99_ms'):>22}")
+
+
+if __name__ == "__main__":
+    args = parse_args()
+    if args.compare:
+        compare(*args.compare)
+        sys.exit(0)
+
+    # The settings main.py reads at import time
+    os.environ['DB_BACKEND'] = args.backend
+    os.environ['BCRYPT_ROUNDS'] = str(args.bcrypt_rounds)
+    os.environ['DB_POOL_SIZE'] = str(args.pool_size)
+    if args.query_metrics:
+        os.environ['QUERY_METRICS'] = '1'
+        os.environ['SLOW_QUERY_MS'] = str(args.slow_query_ms)
+    if args.backend == 'sqlite':
+        os.environ['SQLITE_PATH'] = args.sqlite_path or os.path.join(tempfile.mkdtemp(), 'load_test.db')
+
+    import main # noqa: E402
+    import instrumentation # noqa: E402
+
+    conn = main.create_connection()
+    if conn is None:
+        sys.exit("Failed to initialize database.")
+    conn.close()
+    pool = main.create_pool()
+
+    print(f"Seeding {args.users} users, {args.cars} cars and {args.years} years of rentals...")
+    started = time.perf_counter()
+    password_hash = main.hash_password(PASSWORD).decode('utf-8')
+    first_user, last_user, car_ids, rental_count = seed(pool, args, password_hash)
+    seed_seconds = time.perf_counter() - started
+    print(f"Seeded {rental_count} rentals in {seed_seconds:.1f}s")
+
+    user_manager = main.UserManager(pool)
+    car_manager = main.CarManager(pool)
+    rental_manager = main.RentalManager(pool, car_manager)
+    workload = Workload(main, (user_manager, car_manager, rental_manager), args, first_user, last_user, car_ids)
+
+    if instrumentation.active() is not None:
+        instrumentation.active().reset() # Only measure the workload, not the seeding
+    print(f"Running {args.threads} threads for {args.duration:.0f}s...")
+    with contextlib.redirect_stdout(io.StringIO()): # The managers print a line per operation
+        stats, elapsed = workload.run(args.threads, args.duration)
+
+    total_ops = sum(len(op.latencies) for op in stats.values())
+    results = {
+        'version': git_version(),
+        'timestamp': datetime.datetime.now().isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'config': {key: value for key, value in vars(args).items() if key not in ('compare', 'output')},
+        'seeded_rentals': rental_count,
+        'seed_sec': round(seed_seconds, 2),
+        'elapsed_sec': round(elapsed, 2),
+        'total_ops': total_ops,
+        'total_ops_per_sec': round(total_ops / elapsed, 2),
+        'operations': {name: op.summary(elapsed) for name, op in stats.items()},
+        'pool': pool.stats(),
+        'car_cache': car_manager.cache.stats(),
+        'auth': main.auth_executor.metrics(),
+    }
+    if instrumentation.active() is not None:
+        results['queries'] = instrumentation.active().snapshot()
+    print_results(results)
+    if 'queries' in results:
+        print("\nslowest statements by total time:")
+        for statement in results['queries']['statements'][:5]:
+            print(f"  {statement['total_ms']:>10.1f} ms  {statement['count']:>7}x  p99 {statement['p99_ms']:>7.2f} ms  {statement['sql'][:90]}")
+
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as file:
+            json.dump(results, file, indent=2, default=str)
+        print(f"Results written to {args.output}")
+
+    pool.close()
+    main.auth_executor.shutdown()
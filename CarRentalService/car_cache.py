@@ -0,0 +1,138 @@
+import threading
+import time
+from collections import OrderedDict
+
+
+# LRU cache with a time-to-live for every entry
+class LRUTTLCache:
+    """
+    Least-recently-used cache whose entries also expire after `ttl` seconds.
+    Keeps hit, miss, eviction and expiration counters.
+    """
+
+    def __init__(self, max_size: int = 1024, ttl: float = 60.0):
+        self.max_size = max_size
+        self.ttl = ttl
+        self._entries = OrderedDict() # key -> (value, expiry time)
+        self._lock = threading.Lock()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    # Return (True, value) for a fresh entry, (False, None) otherwise
+    def lookup(self, key):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return False, None
+            value, expires_at = entry
+            if expires_at <= now:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return False, None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return True, value
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def invalidate(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+            }
+
+
+# Car cache class - read-through cache of car rows plus a snapshot of the whole catalog
+class CarCache:
+    """
+    Car rows keyed by car_id, and the full car list as one snapshot.
+    CarManager invalidates both whenever a car is added, updated or deleted;
+    the TTL bounds how stale data changed by another process can get.
+    Every invalidation bumps a generation counter, so a row or snapshot that was being loaded
+    while the write happened is returned to its caller but not kept.
+    """
+
+    def __init__(self, max_size: int = 10000, ttl: float = 60.0, catalog_ttl: float = 30.0):
+        self.cars = LRUTTLCache(max_size, ttl)
+        self.catalog_ttl = catalog_ttl
+        self._catalog = None # (rows, expiry time)
+        self._lock = threading.Lock()
+        self._generations = {} # car_id -> number of times it was invalidated
+        self._catalog_generation = 0 # Number of invalidations of any kind
+
+        self.catalog_hits = 0
+        self.catalog_misses = 0
+
+    # Return the car row, loading it with `load(car_id)` on a miss
+    def get(self, car_id, load):
+        found, car = self.cars.lookup(car_id)
+        if found:
+            return car
+        with self._lock:
+            generation = self._generations.get(car_id, 0)
+        car = load(car_id)
+        if car is not None:
+            with self._lock:
+                if self._generations.get(car_id, 0) == generation: # Not written while we were loading
+                    self.cars.put(car_id, car)
+        return car
+
+    # Return every car row, reloading the snapshot with `load()` when it is missing or expired
+    def catalog(self, load):
+        now = time.monotonic()
+        with self._lock:
+            if self._catalog is not None and self._catalog[1] > now:
+                self.catalog_hits += 1
+                return self._catalog[0]
+            self.catalog_misses += 1
+            generation = self._catalog_generation
+        rows = tuple(load())
+        with self._lock:
+            if self._catalog_generation != generation: # A car changed while we were loading
+                return rows
+            self._catalog = (rows, time.monotonic() + self.catalog_ttl)
+            # Warm the per-car cache from the snapshot
+            for row in rows:
+                self.cars.put(row[0], row)
+        return rows
+
+    # Drop one car (or only the catalog when car_id is None) after a write
+    def invalidate(self, car_id=None):
+        with self._lock:
+            if car_id is not None:
+                self._generations[car_id] = self._generations.get(car_id, 0) + 1
+                self.cars.invalidate(car_id)
+            self._catalog = None
+            self._catalog_generation += 1
+
+    def stats(self):
+        stats = self.cars.stats()
+        with self._lock:
+            stats['catalog_hits'] = self.catalog_hits
+            stats['catalog_misses'] = self.catalog_misses
+        return stats
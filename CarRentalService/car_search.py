@@ -0,0 +1,356 @@
+import bisect
+import heapq
+import math
+import re
+import threading
+
+# Positions in a car row (see CAR_COLUMNS in main.py)
+CAR_ID, MAKE, MODEL, YEAR, MILEAGE, IN_SERVICE, MIN_RENT_PERIOD, MAX_RENT_PERIOD = range(8)
+
+# Numeric columns kept as sorted arrays for range filters
+RANGE_FIELDS = ('year', 'mileage', 'min_rent_period', 'max_rent_period')
+UNLIMITED = 10 ** 9 # Stands in for a missing maximum rental period
+
+# Rough cost in nanoseconds (CPython) of the steps a query plan is made of
+STEP_COST = 45 # Moving to the next car of a walk and testing set membership
+CHECK_COST = 150 # Checking the remaining conditions on one car
+MERGE_COST = 250 # Taking the next car from several postings merged in car_id order
+BUILD_COST = 65 # Adding one car ID to a new set
+PROBE_COST = 15 # Testing one car ID of a list against a set (set.intersection runs in C)
+FILTER_COST = 60 # Testing one car's value against a range in a list comprehension
+HEAP_COST = 300 # Taking the next car from a heap
+
+_TOKEN = re.compile(r'[0-9a-z]+')
+
+
+# Lower-case words of a make/model ("Model 3" -> ['model', '3'])
+def tokenize(text):
+    return _TOKEN.findall(str(text or '').lower())
+
+
+# One numeric column as two parallel lists sorted by value, plus each car's value for range checks
+class _SortedColumn:
+    def __init__(self, values=None, ids=None):
+        self.values = values or []
+        self.ids = ids or []
+        self.value_of = dict(zip(self.ids, self.values)) # car_id -> value
+
+    def add(self, value, car_id):
+        position = bisect.bisect_right(self.values, value)
+        self.values.insert(position, value)
+        self.ids.insert(position, car_id)
+        self.value_of[car_id] = value
+
+    def remove(self, value, car_id):
+        low = bisect.bisect_left(self.values, value)
+        position = self.ids.index(car_id, low, bisect.bisect_right(self.values, value))
+        del self.values[position]
+        del self.ids[position]
+        del self.value_of[car_id]
+
+    # Slice bounds of the cars with low <= value <= high
+    def bounds(self, low, high):
+        start = bisect.bisect_left(self.values, low)
+        return start, max(start, bisect.bisect_right(self.values, high))
+
+
+# Car search index class - prefix search on make/model words plus range filters, answered from memory
+class CarSearchIndex:
+    """
+    Inverted index from make/model words to car IDs, with a sorted vocabulary for prefix lookups,
+    and one sorted array per numeric column for range filters.
+    Postings are kept in car_id order, so a query driven by a search term reads its cars in order
+    and stops after `limit` results. A query driven by ranges walks the catalog when matches are
+    common; when they are rare it narrows the smallest range's cars by the other ranges and takes
+    them off a heap in car_id order. Every other condition is checked per car.
+    Results are ranked: cars where every search term is a whole word come first, then prefix
+    matches; within a rank, by car_id. The database stays the source of truth; CarManager keeps
+    the index in step with its own writes.
+    """
+
+    def __init__(self):
+        self._lock = threading.RLock()
+        self._cars = {} # car_id -> car row, in ascending car_id order
+        self._text = {} # car_id -> " word word " (its make/model words, for substring checks)
+        self._numbers = {} # car_id -> values of RANGE_FIELDS
+        self._postings = {} # word -> {car_id: None} in ascending car_id order (ordered, with fast membership tests)
+        self._vocabulary = [] # Every word, sorted (for prefix lookups)
+        self._columns = {name: _SortedColumn() for name in RANGE_FIELDS}
+
+    # Build the index from car rows (e.g. CarManager.iter_cars())
+    def load(self, cars):
+        with self._lock:
+            self._cars = {}
+            self._text.clear()
+            self._numbers.clear()
+            self._postings.clear()
+            for car in sorted(cars, key=lambda car: car[CAR_ID]):
+                self._cars[car[CAR_ID]] = car
+                for word in self._describe(car):
+                    self._postings.setdefault(word, {})[car[CAR_ID]] = None
+            self._vocabulary = sorted(self._postings)
+            # Sorting each column once is much faster than inserting every car into it
+            for position, name in enumerate(RANGE_FIELDS):
+                pairs = sorted((numbers[position], car_id) for car_id, numbers in self._numbers.items())
+                self._columns[name] = _SortedColumn([value for value, _ in pairs], [car_id for _, car_id in pairs])
+            return len(self._cars)
+
+    # Record the words and numbers of a car and return its words
+    def _describe(self, car):
+        words = sorted(set(tokenize(car[MAKE]) + tokenize(car[MODEL])))
+        self._text[car[CAR_ID]] = " " + " ".join(words) + " "
+        self._numbers[car[CAR_ID]] = (
+            int(car[YEAR] or 0),
+            int(car[MILEAGE] or 0),
+            int(car[MIN_RENT_PERIOD] or 0),
+            int(car[MAX_RENT_PERIOD] or UNLIMITED), # Like pricing, an empty maximum means no limit
+        )
+        return words
+
+    # Add a car, or replace it after an update (only the words and values that changed are moved)
+    def put(self, car):
+        with self._lock:
+            car_id = car[CAR_ID]
+            old_words = set(self._text.get(car_id, '').split())
+            old_numbers = self._numbers.get(car_id, (None,) * len(RANGE_FIELDS))
+            late = car_id not in self._cars and self._cars and car_id < next(reversed(self._cars))
+            self._cars[car_id] = car # Replacing a key keeps its position
+            if late: # IDs normally only grow; keep the ascending order if one arrives out of order
+                self._cars = dict(sorted(self._cars.items()))
+
+            words = set(self._describe(car))
+            for word in old_words - words:
+                self._drop_posting(word, car_id)
+            for word in words - old_words:
+                postings = self._postings.get(word)
+                if postings is None:
+                    postings = self._postings[word] = {}
+                    bisect.insort(self._vocabulary, word)
+                ordered = not postings or car_id > next(reversed(postings))
+                postings[car_id] = None
+                if not ordered:
+                    self._postings[word] = dict.fromkeys(sorted(postings))
+            for name, old, new in zip(RANGE_FIELDS, old_numbers, self._numbers[car_id]):
+                if old != new:
+                    if old is not None:
+                        self._columns[name].remove(old, car_id)
+                    self._columns[name].add(new, car_id)
+
+    # Forget a deleted car; returns False if it was not indexed
+    def remove(self, car_id):
+        with self._lock:
+            if self._cars.pop(car_id, None) is None:
+                return False
+            self._unindex(car_id)
+            return True
+
+    # Take a car's words and numbers out of the index (caller holds the lock)
+    def _unindex(self, car_id):
+        for word in self._text.pop(car_id).split():
+            self._drop_posting(word, car_id)
+        for name, value in zip(RANGE_FIELDS, self._numbers.pop(car_id)):
+            self._columns[name].remove(value, car_id)
+
+    # Take a car out of a word's postings, and the word out of the vocabulary when no car is left
+    def _drop_posting(self, word, car_id):
+        postings = self._postings[word]
+        del postings[car_id]
+        if not postings:
+            del self._postings[word]
+            del self._vocabulary[bisect.bisect_left(self._vocabulary, word)]
+
+    def get(self, car_id):
+        return self._cars.get(car_id)
+
+    def __len__(self):
+        return len(self._cars)
+
+    # Search the catalog and return up to `limit` car rows, best first (limit=None for every match).
+    #   text         - words matched as prefixes of make/model words, all of them must match ("toy cor")
+    #   year, mileage, min_rent_period, max_rent_period - (low, high) ranges, either end may be None
+    #   rental_days  - only cars that may be rented for this many days (min_rent_period <= days <= max_rent_period)
+    #   in_service   - True (default) for cars that can be rented, False for the others, None for both
+    #   accept       - optional test on the car ID, e.g. free for the requested dates; checked last
+    def search(self, text=None, year=None, mileage=None, min_rent_period=None, max_rent_period=None,
+               rental_days=None, in_service=True, accept=None, limit=20):
+        ranges = self._ranges(year, mileage, min_rent_period, max_rent_period, rental_days)
+        terms = list(dict.fromkeys(tokenize(text)))
+
+        with self._lock:
+            total = len(self._cars)
+            conditions = self._conditions(terms, ranges, total) if total else None
+            if conditions is None:
+                return []
+            order = self._plan(conditions, total, limit, ranges)
+
+            needles = [f" {key}" for _, kind, key, _ in conditions if kind == 'term']
+            checks = [(RANGE_FIELDS.index(key), *ranges[key]) for _, kind, key, _ in conditions if kind == 'range']
+            # Ranking matters when some term is both a whole word and the prefix of longer words
+            ranked = terms and all(term in self._postings for term in terms) and any(len(self._prefixed(term)) > 1 for term in terms)
+            whole_words = [f" {term} " for term in terms]
+
+            results, others = [], []
+            for car_id in order:
+                if in_service is not None and bool(self._cars[car_id][IN_SERVICE]) != in_service:
+                    continue
+                text = self._text[car_id]
+                if needles and not all(needle in text for needle in needles):
+                    continue
+                if checks:
+                    numbers = self._numbers[car_id]
+                    outside = False
+                    for position, low, high in checks: # A plain loop: all() over a generator costs more than the tests
+                        if not low <= numbers[position] <= high:
+                            outside = True
+                            break
+                    if outside:
+                        continue
+                if accept is not None and not accept(car_id):
+                    continue
+                if ranked and not all(word in text for word in whole_words):
+                    if limit is None or len(others) < limit:
+                        others.append(self._cars[car_id])
+                    continue
+                results.append(self._cars[car_id])
+                if limit is not None and len(results) >= limit:
+                    return results
+            results.extend(others)
+            return results if limit is None else results[:limit]
+
+    # The plan a search with these arguments would use: (plan, keys of the conditions driving it), e.g.
+    # ('postings', ['toy']) or ('slice', ['mileage', 'year']); ('none', []) when nothing can match
+    def explain(self, text=None, year=None, mileage=None, min_rent_period=None, max_rent_period=None, rental_days=None, limit=20):
+        ranges = self._ranges(year, mileage, min_rent_period, max_rent_period, rental_days)
+        with self._lock:
+            total = len(self._cars)
+            conditions = self._conditions(list(dict.fromkeys(tokenize(text))), ranges, total) if total else None
+            if conditions is None:
+                return 'none', []
+            how, chosen = self._choose(conditions, total, limit)
+        if how == 'scan':
+            return how, []
+        return how, [condition[2] for condition in (chosen if how == 'slice' else [chosen])]
+
+    # (low, high) bounds per range field; rental_days narrows the rental period columns
+    def _ranges(self, year, mileage, min_rent_period, max_rent_period, rental_days):
+        ranges = {}
+        for name, bounds in zip(RANGE_FIELDS, (year, mileage, min_rent_period, max_rent_period)):
+            if bounds is not None:
+                low, high = bounds
+                ranges[name] = (-math.inf if low is None else low, math.inf if high is None else high)
+        if rental_days is not None:
+            low, high = ranges.get('min_rent_period', (-math.inf, math.inf))
+            ranges['min_rent_period'] = (low, min(high, rental_days))
+            low, high = ranges.get('max_rent_period', (-math.inf, math.inf))
+            ranges['max_rent_period'] = (max(low, rental_days), high)
+        return ranges
+
+    # Every condition matches a set of cars of known size: the postings of the words a term is a prefix of,
+    # or a slice of a sorted column. Returns (size, kind, key, matching words or slice bounds) tuples,
+    # or None when some condition matches no car (caller holds the lock)
+    def _conditions(self, terms, ranges, total):
+        conditions = []
+        for term in terms:
+            words = self._prefixed(term)
+            if not words:
+                return None
+            conditions.append((sum(len(self._postings[word]) for word in words), 'term', term, words))
+        for name, (low, high) in ranges.items():
+            start, end = self._columns[name].bounds(low, high)
+            if end == start:
+                return None
+            if end - start < total: # A range covering every car filters nothing
+                conditions.append((end - start, 'range', name, (start, end)))
+        return conditions
+
+    # Choose how to produce candidate car IDs in ascending order, and drop the conditions that
+    # the chosen plan already guarantees from `conditions`. The plans are:
+    #   scan     - walk every car and check every condition
+    #   postings - read the cars of a term's words, already in car_id order; stops after `limit` matches
+    #   walk     - walk every car, keeping the members of a range; good when matches are common
+    #   slice    - take the cars of the smallest range, keep those inside every other range and pop
+    #              them from a heap in car_id order; good when the ranges together match few cars
+    def _plan(self, conditions, total, limit, ranges):
+        how, chosen = self._choose(conditions, total, limit)
+        if how == 'scan':
+            return iter(self._cars)
+        if how == 'slice':
+            for condition in chosen:
+                conditions.remove(condition)
+            return self._sliced(chosen, ranges)
+
+        conditions.remove(chosen)
+        _, kind, key, detail = chosen
+        if how == 'postings':
+            return iter(self._postings[detail[0]]) if len(detail) == 1 else self._merged(detail)
+        members = set(self._columns[key].ids[detail[0]:detail[1]])
+        return (car_id for car_id in self._cars if car_id in members)
+
+    # The cheapest plan by the cost constants above: (plan, condition or conditions it is driven by)
+    def _choose(self, conditions, total, limit):
+        _, how, chosen = min(self._plans(conditions, total, limit), key=lambda plan: plan[0])
+        return how, chosen
+
+    # Every plan that can answer the conditions as (estimated cost, plan, condition or conditions)
+    def _plans(self, conditions, total, limit):
+        share = 1.0 # Estimated share of the catalog that matches every condition
+        for condition in conditions:
+            share *= condition[0] / total
+        steps = total if limit is None else min(total, limit / share) # Cars a walk goes through
+
+        plans = [(steps * (STEP_COST + CHECK_COST), 'scan', None)]
+        for condition in conditions:
+            size, kind, key, detail = condition
+            checked = size if limit is None else min(size, limit * size / total / share) # Cars of the set looked at
+            if kind == 'term':
+                plans.append((checked * (CHECK_COST + (MERGE_COST if len(detail) > 1 else 0)), 'postings', condition))
+            else:
+                plans.append((steps * STEP_COST + checked * CHECK_COST + size * BUILD_COST, 'walk', condition))
+
+        ordered = sorted(condition for condition in conditions if condition[1] == 'range')
+        if ordered:
+            # The smallest range's cars, narrowed by the others in order of size (all in C or in one comprehension)
+            candidates, cost = ordered[0][0], 0.0
+            for size, _, _, _ in ordered[1:]:
+                cost += min(size * PROBE_COST + candidates * BUILD_COST, candidates * FILTER_COST)
+                candidates *= size / total
+            terms_share = share * total / candidates if candidates else 0.0 # Share of the candidates passing the terms
+            popped = candidates if limit is None else min(candidates, limit / terms_share if terms_share else candidates)
+            plans.append((cost + candidates * BUILD_COST + popped * (HEAP_COST + CHECK_COST), 'slice', ordered))
+
+        return plans
+
+    # Cars inside every range, smallest range first, in ascending car_id order
+    def _sliced(self, ordered, ranges):
+        _, _, key, (start, end) = ordered[0]
+        candidates = self._columns[key].ids[start:end]
+        for size, _, key, (start, end) in ordered[1:]:
+            if size * PROBE_COST + len(candidates) * BUILD_COST < len(candidates) * FILTER_COST:
+                candidates = list(set(candidates).intersection(self._columns[key].ids[start:end]))
+            else:
+                (low, high), value_of = ranges[key], self._columns[key].value_of
+                candidates = [car_id for car_id in candidates if low <= value_of[car_id] <= high]
+        heapq.heapify(candidates) # Only the cars actually looked at are taken off the heap
+        while candidates:
+            yield heapq.heappop(candidates)
+
+    # Cars having any of the words, in ascending car_id order without repeats
+    def _merged(self, words):
+        previous = None
+        for car_id in heapq.merge(*(self._postings[word] for word in words)):
+            if car_id != previous:
+                yield car_id
+                previous = car_id
+
+    # Words starting with `prefix`, from the sorted vocabulary
+    def _prefixed(self, prefix):
+        start = bisect.bisect_left(self._vocabulary, prefix)
+        return self._vocabulary[start:bisect.bisect_left(self._vocabulary, prefix + '\uffff', start)]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'cars': len(self._cars),
+                'words': len(self._vocabulary),
+                'postings': sum(len(postings) for postings in self._postings.values()),
+            }
@@ -0,0 +1,203 @@
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+
+# Raised when no connection becomes free before the checkout timeout expires
+class PoolTimeoutError(Exception):
+    pass
+
+
+# Connection pool class - hands out a database connection per operation instead of one shared connection
+class ConnectionPool:
+    """
+    Bounded pool of database connections.
+    Connections are created lazily up to `size`, checked out per operation and
+    health-checked (and reconnected if needed) before being handed out again.
+    """
+
+    def __init__(self, connect, size: int = 5, timeout: float = 10.0, check_after: float = 30.0):
+        self._connect = connect # Function that opens a new database connection
+        self.size = size # Maximum number of open connections
+        self.timeout = timeout # Seconds to wait for a free connection before giving up
+        self.check_after = check_after # Connections idle for longer than this are pinged before reuse
+
+        self._idle = queue.LifoQueue() # (connection, time it was returned) pairs ready to be reused
+        self._lock = threading.Lock()
+        self._created = 0
+        self._in_use = 0
+        self._closed = False
+
+        # Statistics
+        self._checkouts = 0
+        self._timeouts = 0
+        self._reconnects = 0
+        self._discarded = 0 # Connections found dead after a failed operation
+        self._total_wait = 0.0
+        self._max_wait = 0.0
+        self._peak_in_use = 0
+
+    # Borrow a connection for the duration of a `with` block
+    @contextmanager
+    def connection(self):
+        conn = self._acquire()
+        alive = True
+        try:
+            yield conn
+        except Exception:
+            # Do not hand a half-finished transaction to the next caller
+            self._rollback_quietly(conn)
+            # nor a connection the server dropped: the idle health check would only notice it much later
+            alive = self._is_alive(conn)
+            raise
+        finally:
+            if alive:
+                self._release(conn)
+            else:
+                self._discard(conn)
+
+    # Unit of work: borrow a connection, commit if the block finishes and roll back if it raises
+    @contextmanager
+    def transaction(self):
+        with self.connection() as conn:
+            yield conn
+            conn.commit()
+
+    # Take a connection out of the pool, creating or reconnecting one when needed
+    def _acquire(self):
+        if self._closed:
+            raise PoolTimeoutError("Connection pool is closed")
+
+        started = time.perf_counter()
+        conn = None
+        returned_at = None
+
+        try:
+            conn, returned_at = self._idle.get_nowait()
+        except queue.Empty:
+            # Open a new connection if we have not reached the limit yet
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                try:
+                    conn = self._connect()
+                except Exception:
+                    with self._lock:
+                        self._created -= 1
+                    raise
+            else:
+                # Otherwise wait for another caller to return one
+                try:
+                    conn, returned_at = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    with self._lock:
+                        self._timeouts += 1
+                    raise PoolTimeoutError(f"No database connection available after {self.timeout} seconds")
+
+        if returned_at is not None and time.monotonic() - returned_at > self.check_after:
+            conn = self._ensure_healthy(conn)
+
+        waited = time.perf_counter() - started
+        with self._lock:
+            self._in_use += 1
+            self._checkouts += 1
+            self._total_wait += waited
+            self._max_wait = max(self._max_wait, waited)
+            self._peak_in_use = max(self._peak_in_use, self._in_use)
+        return conn
+
+    # Put a connection back so that the next caller can reuse it
+    def _release(self, conn):
+        with self._lock:
+            self._in_use -= 1
+        # End any read-only transaction left open so the next caller does not see an old snapshot
+        if getattr(conn, 'in_transaction', False):
+            self._rollback_quietly(conn)
+        if self._closed:
+            self._close_quietly(conn)
+            with self._lock:
+                self._created -= 1
+            return
+        self._idle.put((conn, time.monotonic()))
+
+    # Close a broken connection instead of returning it; the next caller opens a new one
+    def _discard(self, conn):
+        self._close_quietly(conn)
+        with self._lock:
+            self._in_use -= 1
+            self._created -= 1
+            self._discarded += 1
+
+    def _is_alive(self, conn):
+        try:
+            return conn.is_connected()
+        except Exception:
+            return False
+
+    # Make sure a connection that sat idle is still alive, reconnecting if the server dropped it
+    def _ensure_healthy(self, conn):
+        try:
+            if conn.is_connected():
+                return conn
+            conn.reconnect(attempts=2, delay=0)
+            with self._lock:
+                self._reconnects += 1
+            return conn
+        except Exception:
+            # The old connection cannot be revived, so replace it with a fresh one
+            self._close_quietly(conn)
+            try:
+                conn = self._connect()
+            except Exception:
+                with self._lock:
+                    self._created -= 1
+                raise
+            with self._lock:
+                self._reconnects += 1
+            return conn
+
+    def _rollback_quietly(self, conn):
+        try:
+            conn.rollback()
+        except Exception:
+            pass
+
+    def _close_quietly(self, conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    # Checkout wait time and how full the pool is
+    def stats(self):
+        with self._lock:
+            checkouts = self._checkouts
+            return {
+                'size': self.size,
+                'open': self._created,
+                'in_use': self._in_use,
+                'idle': self._idle.qsize(),
+                'peak_in_use': self._peak_in_use,
+                'utilization': self._in_use / self.size if self.size else 0.0,
+                'checkouts': checkouts,
+                'timeouts': self._timeouts,
+                'reconnects': self._reconnects,
+                'discarded': self._discarded,
+                'avg_wait_ms': (self._total_wait / checkouts * 1000) if checkouts else 0.0,
+                'max_wait_ms': self._max_wait * 1000,
+            }
+
+    # Close every idle connection; connections still in use are closed when they are returned
+    def close(self):
+        self._closed = True
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._close_quietly(conn)
+            with self._lock:
+                self._created -= 1
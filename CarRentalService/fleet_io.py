@@ -0,0 +1,192 @@
+import csv
+import json
+import os
+import tempfile
+
+from storage import DatabaseError
+
+
+# Columns of a car in import and export files (car_id is assigned by the database)
+CAR_FIELDS = ('make', 'model', 'year', 'mileage', 'in_service', 'min_rent_period', 'max_rent_period')
+# Older files call the in_service column available_now; imports still accept that name
+DEPRECATED_FIELDS = {'in_service': 'available_now'}
+
+# A new car has no bookings, so available_now starts out equal to in_service (the last parameter)
+INSERT_CAR = "INSERT INTO cars (make, model, year, mileage, in_service, min_rent_period, max_rent_period, available_now) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)"
+
+
+# Result of an import: how many rows went in and which ones were rejected
+class ImportReport:
+    def __init__(self):
+        self.inserted = 0
+        self.batches = 0
+        self.errors = [] # (line number, error message)
+
+    def __str__(self):
+        return f"{self.inserted} cars imported in {self.batches} batches, {len(self.errors)} rows rejected"
+
+
+# Read records one at a time from a .csv or .jsonl file as (line number, dict) pairs
+def read_records(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.endswith('.jsonl'):
+            for line_no, line in enumerate(file, start=1):
+                if not line.strip():
+                    continue
+                try:
+                    yield line_no, json.loads(line)
+                except json.JSONDecodeError as err:
+                    yield line_no, err
+        else:
+            # Line 1 is the header row
+            for line_no, record in enumerate(csv.DictReader(file), start=2):
+                yield line_no, record
+
+
+def _to_int(record, field):
+    value = record.get(field)
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"{field} must be a whole number, got {value!r}")
+
+
+# Check one record and turn it into the tuple that is inserted into the cars table
+def validate_car(record):
+    if not isinstance(record, dict):
+        raise ValueError(f"Invalid record: {record}")
+
+    make = str(record.get('make') or '').strip()
+    model = str(record.get('model') or '').strip()
+    if not make or not model:
+        raise ValueError("make and model are required")
+    if len(make) > 255 or len(model) > 255:
+        raise ValueError("make and model must be at most 255 characters")
+
+    year = _to_int(record, 'year')
+    if not 1901 <= year <= 2155: # Range of the MySQL YEAR type
+        raise ValueError(f"year out of range: {year}")
+
+    mileage = _to_int(record, 'mileage')
+    if mileage < 0:
+        raise ValueError("mileage must not be negative")
+
+    field = 'in_service' if 'in_service' in record else DEPRECATED_FIELDS['in_service']
+    flag = str(record.get(field, '')).strip().lower()
+    if flag in ('1', 'yes', 'true'):
+        in_service = 1
+    elif flag in ('0', 'no', 'false'):
+        in_service = 0
+    else:
+        raise ValueError(f"in_service must be yes/no, got {record.get(field)!r}")
+
+    min_rent_period = _to_int(record, 'min_rent_period')
+    max_rent_period = _to_int(record, 'max_rent_period')
+    if min_rent_period < 1 or max_rent_period < min_rent_period:
+        raise ValueError("rental periods must satisfy 1 <= min_rent_period <= max_rent_period")
+
+    return (make, model, year, mileage, in_service, min_rent_period, max_rent_period)
+
+
+# Parameters of INSERT_CAR for a validated row
+def _insert_params(row):
+    return row + (row[4],)
+
+
+# Insert one batch with a single multi-row INSERT; on failure, retry row by row to find the bad rows
+def _insert_batch(conn, batch, report):
+    cursor = conn.cursor()
+    try:
+        cursor.executemany(INSERT_CAR, [_insert_params(row) for _, row in batch])
+        conn.commit()
+        report.inserted += len(batch)
+    except DatabaseError:
+        conn.rollback()
+        for line_no, row in batch:
+            try:
+                cursor.execute(INSERT_CAR, _insert_params(row))
+                report.inserted += 1
+            except DatabaseError as err:
+                report.errors.append((line_no, str(err)))
+        conn.commit()
+    report.batches += 1
+
+
+# Insert one batch through LOAD DATA LOCAL INFILE (needs allow_local_infile on the connection and server).
+# csv.writer quotes fields but does not escape backslashes, hence ESCAPED BY '' (a model called "\N" stays text, not NULL).
+def _load_batch(conn, batch, report):
+    with tempfile.NamedTemporaryFile('w', suffix='.csv', newline='', delete=False, encoding='utf-8') as file:
+        csv.writer(file).writerows(row for _, row in batch)
+        temp_path = file.name
+    try:
+        cursor = conn.cursor()
+        cursor.execute(
+            "LOAD DATA LOCAL INFILE %s INTO TABLE cars FIELDS TERMINATED BY ',' OPTIONALLY ENCLOSED BY '\"' ESCAPED BY '' LINES TERMINATED BY '\\r\\n' "
+            "(make, model, year, mileage, in_service, min_rent_period, max_rent_period) SET available_now = in_service",
+            (temp_path,)
+        )
+        # LOCAL loads turn bad values into warnings and skip or truncate rows instead of failing.
+        # Redo such a batch with INSERTs, which report every rejected row.
+        if cursor.rowcount != len(batch) or getattr(cursor, 'warning_count', 0):
+            conn.rollback()
+            _insert_batch(conn, batch, report)
+            return
+        conn.commit()
+        report.inserted += len(batch)
+        report.batches += 1
+    finally:
+        os.remove(temp_path)
+
+
+# Import cars from a CSV/JSONL file in batches, each batch in its own transaction
+def import_cars(car_manager, path, batch_size=1000, use_load_data=False):
+    report = ImportReport()
+    batch = []
+
+    with car_manager.pool.connection() as conn:
+        def flush():
+            nonlocal use_load_data
+            if use_load_data and conn.dialect == 'mysql':
+                try:
+                    _load_batch(conn, batch, report)
+                    return
+                except DatabaseError as err:
+                    # LOAD DATA is disabled on the client or server; fall back to executemany
+                    conn.rollback()
+                    print(f"LOAD DATA LOCAL INFILE unavailable ({err}), using batched INSERTs.")
+                    use_load_data = False
+            _insert_batch(conn, batch, report)
+
+        for line_no, record in read_records(path):
+            try:
+                batch.append((line_no, validate_car(record)))
+            except ValueError as err:
+                report.errors.append((line_no, str(err)))
+                continue
+            if len(batch) >= batch_size:
+                flush()
+                batch = []
+        if batch:
+            flush()
+
+    car_manager.refresh() # The catalog snapshot and the search index no longer have every car
+    return report
+
+
+# Export every car to a CSV/JSONL file, streaming page by page
+def export_cars(car_manager, path, page_size=1000):
+    count = 0
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        if path.endswith('.jsonl'):
+            for car in car_manager.iter_cars(page_size=page_size):
+                record = dict(zip(('car_id',) + CAR_FIELDS, car))
+                record['year'] = int(record['year'])
+                file.write(json.dumps(record) + '\n')
+                count += 1
+        else:
+            writer = csv.writer(file)
+            writer.writerow(('car_id',) + CAR_FIELDS)
+            for car in car_manager.iter_cars(page_size=page_size):
+                writer.writerow(car[:len(CAR_FIELDS) + 1]) # available_now (derived) is not exported
+                count += 1
+    return count
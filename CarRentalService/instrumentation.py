@@ -0,0 +1,254 @@
+import bisect
+import collections
+import re
+import threading
+import time
+
+
+# Upper bounds (seconds) of the latency histogram buckets; the last bucket is +Inf
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+
+_PLACEHOLDER_LIST = re.compile(r"\(\s*%s(?:\s*,\s*%s)+\s*\)") # IN (%s, %s, ...) of any length
+_WHITESPACE = re.compile(r"\s+")
+
+
+# Latency histogram, row count and error count of one SQL statement
+class StatementStats:
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKETS) + 1)
+        self.count = 0
+        self.errors = 0
+        self.rows = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.buckets[bisect.bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+
+    # Upper bound of the bucket holding the p-th percentile
+    def percentile(self, p):
+        if not self.count:
+            return 0.0
+        target = p / 100 * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return BUCKETS[index] if index < len(BUCKETS) else self.max
+        return self.max
+
+
+# Collects the metrics of every query run through an instrumented cursor
+class QueryMetrics:
+    """
+    Per-statement latency histograms, row counts and error counts, plus a log of the
+    most recent statements slower than `slow_threshold` seconds.
+    Statements are grouped by their SQL text with whitespace collapsed and IN (...)
+    lists of any length folded together.
+    """
+
+    def __init__(self, slow_threshold: float = 0.1, slow_log_size: int = 100, slow_log_path=None):
+        self.slow_threshold = slow_threshold
+        self.slow_log_path = slow_log_path # Slow queries are also appended to this file when set
+        self.slow_queries = collections.deque(maxlen=slow_log_size)
+        self._slow_count = 0 # Every slow statement since start or reset; the log above only keeps the latest
+        self.started_at = time.time()
+        self._statements = {} # normalized SQL -> StatementStats
+        self._normalized = {} # raw SQL -> normalized SQL
+        self._lock = threading.Lock()
+
+    def normalize(self, sql):
+        key = self._normalized.get(sql)
+        if key is None:
+            key = _WHITESPACE.sub(' ', _PLACEHOLDER_LIST.sub('(%s, ...)', sql)).strip()
+            if len(self._normalized) < 10000: # Statements built at runtime could otherwise grow this forever
+                self._normalized[sql] = key
+        return key
+
+    def record(self, sql, seconds, rows=0, error=None):
+        key = self.normalize(sql)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is None:
+                stats = self._statements[key] = StatementStats()
+            stats.observe(seconds)
+            stats.rows += max(rows, 0)
+            if error is not None:
+                stats.errors += 1
+        if seconds >= self.slow_threshold:
+            self._log_slow(key, seconds, error)
+
+    def add_rows(self, sql, rows):
+        key = self.normalize(sql)
+        with self._lock:
+            stats = self._statements.get(key)
+            if stats is not None:
+                stats.rows += rows
+
+    def _log_slow(self, key, seconds, error):
+        entry = {
+            'at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            'ms': round(seconds * 1000, 3),
+            'sql': key,
+            'error': str(error) if error is not None else None,
+        }
+        with self._lock:
+            self.slow_queries.append(entry)
+            self._slow_count += 1
+        if self.slow_log_path:
+            try:
+                with open(self.slow_log_path, 'a', encoding='utf-8') as file:
+                    file.write(f"{entry['at']} {entry['ms']:.3f}ms {key}\n")
+            except OSError:
+                pass
+
+    # Everything recorded so far, slowest total time first
+    def snapshot(self):
+        with self._lock:
+            statements = [
+                {
+                    'sql': key,
+                    'count': stats.count,
+                    'errors': stats.errors,
+                    'rows': stats.rows,
+                    'total_ms': round(stats.total * 1000, 3),
+                    'mean_ms': round(stats.total / stats.count * 1000, 3) if stats.count else 0.0,
+                    'p50_ms': round(stats.percentile(50) * 1000, 3),
+                    'p95_ms': round(stats.percentile(95) * 1000, 3),
+                    'p99_ms': round(stats.percentile(99) * 1000, 3),
+                    'max_ms': round(stats.max * 1000, 3),
+                }
+                for key, stats in self._statements.items()
+            ]
+        statements.sort(key=lambda statement: statement['total_ms'], reverse=True)
+        return {
+            'uptime_sec': round(time.time() - self.started_at, 1),
+            'queries': sum(statement['count'] for statement in statements),
+            'errors': sum(statement['errors'] for statement in statements),
+            'statements': statements,
+            'slow_query_count': self._slow_count,
+            'slow_queries': list(self.slow_queries),
+        }
+
+    # Prometheus text exposition format
+    def prometheus(self):
+        lines = [
+            "# HELP car_rental_query_duration_seconds Latency of SQL statements.",
+            "# TYPE car_rental_query_duration_seconds histogram",
+        ]
+        counters = []
+        with self._lock:
+            for key, stats in self._statements.items():
+                label = key.replace('\\', '\\\\').replace('"', '\\"')
+                cumulative = 0
+                for bound, count in zip(BUCKETS + ('+Inf',), stats.buckets):
+                    cumulative += count
+                    lines.append(f'car_rental_query_duration_seconds_bucket{{statement="{label}",le="{bound}"}} {cumulative}')
+                lines.append(f'car_rental_query_duration_seconds_sum{{statement="{label}"}} {stats.total:.6f}')
+                lines.append(f'car_rental_query_duration_seconds_count{{statement="{label}"}} {stats.count}')
+                counters.append((label, stats.rows, stats.errors))
+        lines.append("# HELP car_rental_query_rows_total Rows returned or changed by SQL statements.")
+        lines.append("# TYPE car_rental_query_rows_total counter")
+        lines.extend(f'car_rental_query_rows_total{{statement="{label}"}} {rows}' for label, rows, _ in counters)
+        lines.append("# HELP car_rental_query_errors_total SQL statements that raised an error.")
+        lines.append("# TYPE car_rental_query_errors_total counter")
+        lines.extend(f'car_rental_query_errors_total{{statement="{label}"}} {errors}' for label, _, errors in counters)
+        lines.append("# HELP car_rental_slow_queries_total Statements slower than the slow-query threshold.")
+        lines.append("# TYPE car_rental_slow_queries_total counter")
+        with self._lock:
+            lines.append(f"car_rental_slow_queries_total {self._slow_count}")
+        return "\n".join(lines) + "\n"
+
+    def reset(self):
+        with self._lock:
+            self._statements.clear()
+            self.slow_queries.clear()
+            self._slow_count = 0
+            self.started_at = time.time()
+
+
+# Cursor wrapper that times every statement; only used while instrumentation is enabled
+class InstrumentedCursor:
+    def __init__(self, cursor, metrics):
+        self._cursor = cursor
+        self._metrics = metrics
+        self._last_sql = None
+
+    def execute(self, sql, params=()):
+        self._last_sql = sql
+        started = time.perf_counter()
+        try:
+            self._cursor.execute(sql, params)
+        except Exception as err:
+            self._metrics.record(sql, time.perf_counter() - started, error=err)
+            raise
+        # Rows of a SELECT are counted as they are fetched; rowcount is what other statements changed
+        rows = 0 if sql.lstrip()[:6].upper() == 'SELECT' else self._cursor.rowcount
+        self._metrics.record(sql, time.perf_counter() - started, rows)
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        self._last_sql = sql
+        started = time.perf_counter()
+        try:
+            self._cursor.executemany(sql, seq_of_params)
+        except Exception as err:
+            self._metrics.record(sql, time.perf_counter() - started, error=err)
+            raise
+        self._metrics.record(sql, time.perf_counter() - started, self._cursor.rowcount)
+        return self
+
+    def fetchone(self):
+        row = self._cursor.fetchone()
+        if row is not None and self._last_sql:
+            self._metrics.add_rows(self._last_sql, 1)
+        return row
+
+    def fetchall(self):
+        rows = self._cursor.fetchall()
+        if self._last_sql:
+            self._metrics.add_rows(self._last_sql, len(rows))
+        return rows
+
+    def fetchmany(self, *args):
+        rows = self._cursor.fetchmany(*args)
+        if self._last_sql:
+            self._metrics.add_rows(self._last_sql, len(rows))
+        return rows
+
+    def __getattr__(self, name):
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self.fetchall())
+
+
+_metrics = None # The active QueryMetrics, or None while instrumentation is disabled
+
+
+# Start recording every query; returns the QueryMetrics that collects them
+def enable(slow_threshold=0.1, slow_log_size=100, slow_log_path=None):
+    global _metrics
+    _metrics = QueryMetrics(slow_threshold, slow_log_size, slow_log_path)
+    return _metrics
+
+
+def disable():
+    global _metrics
+    _metrics = None
+
+
+def active():
+    return _metrics
+
+
+# Wrap a cursor when instrumentation is enabled, otherwise hand it back untouched
+def instrument(cursor):
+    metrics = _metrics
+    if metrics is None:
+        return cursor
+    return InstrumentedCursor(cursor, metrics)
@@ -1,99 +1,267 @@
-import mysql.connector
 import datetime
-import bcrypt # enhancing password security
-from dotenv import load_dotenv
 import os
+import sys
+import threading
+import time
+from connection_pool import ConnectionPool
+from availability import AvailabilityEngine, AVAILABLE_NOW_SQL, BLOCKING_STATUSES
+from auth_executor import AuthExecutor
+from car_cache import CarCache
+from rental_states import allowed_sources, transition
+from storage import DatabaseError
+# Feature modules (search, pricing, reporting, sessions, archive, instrumentation) are imported where they
+# are first used, so that short commands such as --help or list-cars do not pay for them
+
+# Parse one KEY=VALUE line of a .env file; returns None for blank lines and comments
+def _parse_env_line(line):
+    line = line.strip()
+    if not line or line.startswith('#') or '=' not in line:
+        return None
+    key, value = line.split('=', 1)
+    key = key.strip()
+    if key.startswith('export '):
+        key = key[len('export '):].strip()
+    value = value.strip()
+    if len(value) >= 2 and value[0] == value[-1] and value[0] in '"\'':
+        value = value[1:-1] # Quoted value, taken as is
+    elif ' #' in value:
+        value = value.split(' #', 1)[0].rstrip() # Trailing comment
+    return key, value
+
+# Load environment variables from the nearest .env file; variables that are already set win
+def load_env_file():
+    directory = os.path.dirname(os.path.abspath(__file__))
+    while True:
+        path = os.path.join(directory, '.env')
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8') as file:
+                for line in file:
+                    entry = _parse_env_line(line)
+                    if entry is not None:
+                        os.environ.setdefault(*entry)
+            return
+        parent = os.path.dirname(directory)
+        if parent == directory:
+            return
+        directory = parent
 
-load_dotenv()  # Load environment variables
+load_env_file()
 
 # Use environment variables
 DB_HOST = os.getenv('DB_HOST')
 DB_USER = os.getenv('DB_USER')
 DB_PASSWORD = os.getenv('DB_PASSWORD')
 DB_NAME = os.getenv('DB_NAME')
+DB_POOL_SIZE = int(os.getenv('DB_POOL_SIZE', '5'))
+DB_POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', '10'))
+BCRYPT_ROUNDS = int(os.getenv('BCRYPT_ROUNDS', '12')) # bcrypt work factor for new password hashes
+SERVICE_CONCURRENCY = int(os.getenv('SERVICE_CONCURRENCY', '32')) # Manager calls the service runs at the same time (at most the pool size)
+CAR_CACHE_SIZE = int(os.getenv('CAR_CACHE_SIZE', '10000'))
+CAR_CACHE_TTL = float(os.getenv('CAR_CACHE_TTL', '60')) # Seconds before a cached car is re-read from the database
+CAR_SEARCH_TTL = float(os.getenv('CAR_SEARCH_TTL', '300')) # Seconds before the search index is rebuilt to pick up other processes' changes
+AVAILABILITY_TTL = float(os.getenv('AVAILABILITY_TTL', '60')) # Seconds before the booked periods are reloaded to pick up other processes' changes
+SCHEDULER_INTERVAL = float(os.getenv('SCHEDULER_INTERVAL', '300')) # Seconds between background sweeps in the menus (0 = off)
+SCHEMA_MARKER_DIR = os.getenv('SCHEMA_MARKER_DIR', os.path.join(os.path.expanduser('~'), '.cache', 'car_rental'))
+
+
+# Objects shared by the whole process, created on first use
+_shared = {}
+_shared_lock = threading.Lock()
+
+def _shared_object(name, create):
+    value = _shared.get(name)
+    if value is None:
+        with _shared_lock:
+            value = _shared.get(name)
+            if value is None:
+                value = _shared[name] = create()
+    return value
+
+# Choose the storage backend: MySQL, or the embedded SQLite engine for tests and benchmarks (DB_BACKEND=sqlite)
+def create_backend():
+    from storage import MySQLBackend, SQLiteBackend
+
+    if os.getenv('DB_BACKEND', 'mysql') == 'sqlite':
+        return SQLiteBackend(os.getenv('SQLITE_PATH', ':memory:'))
+    return MySQLBackend(
+        host=DB_HOST,
+        user=DB_USER,
+        password=DB_PASSWORD,
+        database=DB_NAME,
+        allow_local_infile=os.getenv('DB_ALLOW_LOCAL_INFILE') == '1' # Needed by bulk imports that use LOAD DATA LOCAL INFILE
+    )
+
+# The configured backend, created with the first connection
+def get_backend():
+    def start():
+        # Query instrumentation (QUERY_METRICS=1) - per-statement timings and a slow-query log.
+        # When it is off cursors are not wrapped at all, so it costs nothing.
+        if os.getenv('QUERY_METRICS') == '1':
+            import instrumentation
+            instrumentation.enable(
+                slow_threshold=float(os.getenv('SLOW_QUERY_MS', '100')) / 1000,
+                slow_log_path=os.getenv('SLOW_QUERY_LOG')
+            )
+        return create_backend()
+    return _shared_object('backend', start)
+
+# Set up database connection - creates the database and tables if needed; returns None on failure
+def create_connection():
+    return get_backend().bootstrap()
 
+# File that records which schema version was last verified for the configured database
+def schema_marker_path():
+    import hashlib
 
-# Set up database connection
-def create_connection():
-    # Retrieve environment variables
-    host = os.getenv('DB_HOST')
-    user = os.getenv('DB_USER')
-    password = os.getenv('DB_PASSWORD')
-    database = os.getenv('DB_NAME')
+    identity = get_backend().identity
+    if identity is None: # An in-memory database starts empty every time
+        return None
+    digest = hashlib.sha256(identity.encode('utf-8')).hexdigest()[:16]
+    return os.path.join(SCHEMA_MARKER_DIR, f"schema-{digest}")
 
-    # Use a try statement as the connection attempt may fail.
-    try:
-        # Connect if the database exists.
-        conn = mysql.connector.connect(
-            # Attempt to connect to the database using the retrieved environment variables.
-            host=host, 
-            user=user, 
-            password=password, 
-            database=database
-        )
-        return conn # Return the connected object. Through this connection object conn, you can send queries to the database or retrieve data from it.
-    
-    except mysql.connector.Error as err:
-        if err.errno == mysql.connector.errorcode.ER_BAD_DB_ERROR:
-            # Create the database if it does not exist
-            conn = mysql.connector.connect(host=host, user=user, password=password)
-            cursor = conn.cursor()
-            cursor.execute(f"CREATE DATABASE {database}")
-            conn.database = database
-            create_tables(conn)
-            return conn
-
-        # Print an error message if the database connection fails
-        else:
-            print("Database connection failed:", err)
-            return None
-
-# Set up default tables.
-def create_tables(conn):
-    cursor = conn.cursor()
-    cursor.execute("""
-    CREATE TABLE users (
-        user_id INT AUTO_INCREMENT PRIMARY KEY,
-        name VARCHAR(255),
-        email VARCHAR(255) UNIQUE,
-        password VARCHAR(255),
-        role ENUM('admin', 'customer')
-    )""")
-    cursor.execute("""
-    CREATE TABLE cars (
-        car_id INT AUTO_INCREMENT PRIMARY KEY,
-        make VARCHAR(255),
-        model VARCHAR(255),
-        year YEAR,
-        mileage INT,
-        available_now BOOLEAN,
-        min_rent_period INT,
-        max_rent_period INT
-    )""")
-    cursor.execute("""
-    CREATE TABLE rentals (
-        rental_id INT AUTO_INCREMENT PRIMARY KEY,
-        car_id INT,
-        user_id INT,
-        start_date DATE,
-        end_date DATE,
-        total_fee DECIMAL(10, 2),
-        status ENUM('on process', 'active', 'completed', 'cancelled', 'returned'),
-        FOREIGN KEY (car_id) REFERENCES cars(car_id),
-        FOREIGN KEY (user_id) REFERENCES users(user_id)
-    )""")
-    conn.commit()
+# Make sure the schema is up to date, skipping the database round trips when a previous run already
+# verified the latest version. Returns False if the database cannot be set up.
+def ensure_schema(force=False):
+    from migrations import LATEST_VERSION
 
-    
+    marker = schema_marker_path()
+    if marker and not force:
+        try:
+            with open(marker, encoding='utf-8') as file:
+                if file.read().strip() == str(LATEST_VERSION):
+                    return True
+        except OSError:
+            pass
+
+    conn = create_connection()
+    if conn is None:
+        return False
+    conn.close()
+    if marker:
+        try:
+            os.makedirs(os.path.dirname(marker), exist_ok=True)
+            with open(marker, 'w', encoding='utf-8') as file:
+                file.write(str(LATEST_VERSION))
+        except OSError:
+            pass # Without a marker the next run simply verifies again
+    return True
+
+# Create the pricing engine; rates, seasons and discounts can be configured in a JSON file
+def create_pricing():
+    from pricing import PricingEngine
+
+    path = os.getenv('PRICING_CONFIG')
+    if path:
+        return PricingEngine.from_file(path)
+    return PricingEngine(default_rate=float(os.getenv('PRICE_PER_DAY', '50')))
+
+# Create the connection pool shared by all manager classes
+def create_pool(pool_backend=None):
+    pool_backend = pool_backend or get_backend()
+    size = min(DB_POOL_SIZE, pool_backend.recommended_pool_size or DB_POOL_SIZE)
+    return ConnectionPool(pool_backend.connect, size=size, timeout=DB_POOL_TIMEOUT)
+
+
+# Columns returned by the listing queries (no SELECT *)
+# (in_service is the admin's "can be rented" flag; available_now is derived from the bookings by the scheduler)
+CAR_COLUMNS = ('car_id', 'make', 'model', 'year', 'mileage', 'in_service', 'min_rent_period', 'max_rent_period', 'available_now')
+# (version is what approve/cancel/complete/return_rental take as expected_version to fail fast on concurrent changes)
+RENTAL_COLUMNS = ('rental_id', 'car_id', 'user_id', 'start_date', 'end_date', 'total_fee', 'status', 'version')
+OPEN_STATUSES = ('on process', 'active', 'completed', 'cancelled') # Every status except 'returned'
+BATCH_CHUNK = 1000 # Rental IDs per IN (...) list in batch updates
+PAGE_SIZE = int(os.getenv('PAGE_SIZE', '20'))
+
+# Keyset pagination - yield rows one page at a time, ordered by the primary key.
+# Each page uses its own pooled connection, so a paused generator never holds a connection.
+# `table` may also be a tuple of tables with disjoint keys (e.g. rentals and rentals_archive);
+# each page then reads one page from every table and keeps the lowest keys.
+def iter_pages(pool, table, key, columns, conditions, params, page_size, after=0):
+    tables = (table,) if isinstance(table, str) else tuple(table)
+    last_key = after # Start after this key (0 = from the beginning)
+    where = " AND ".join(list(conditions) + [f"{key} > %s"])
+    sqls = [f"SELECT {', '.join(columns)} FROM {name} WHERE {where} ORDER BY {key} LIMIT %s" for name in tables]
+    while True:
+        with pool.connection() as conn:
+            cursor = conn.cursor() # Unbuffered cursor: rows are streamed from the server as they are read
+            rows = []
+            for sql in sqls:
+                cursor.execute(sql, (*params, last_key, page_size))
+                rows.extend(cursor.fetchall())
+        if len(tables) > 1:
+            rows = sorted(rows, key=lambda row: row[0])[:page_size]
+        yield from rows
+        if len(rows) < page_size:
+            return
+        last_key = rows[-1][0]
+
+# Print rows a page at a time and ask before showing the next page; returns the number of rows shown
+def show_pages(rows, format_row, page_size=PAGE_SIZE):
+    shown = 0
+    for row in rows:
+        print(format_row(row))
+        shown += 1
+        if shown % page_size == 0:
+            if input("Press Enter for the next page or 'q' to stop: ").lower() == 'q':
+                break
+    return shown
+
+# Pull rows page by page from a service page method (used by the menus; `args` is e.g. the session token)
+def iter_service_pages(fetch_page, *args, **filters):
+    after_id = 0
+    while True:
+        rows = fetch_page(*args, after_id=after_id, limit=PAGE_SIZE, **filters) or []
+        yield from rows
+        if len(rows) < PAGE_SIZE:
+            return
+        after_id = rows[-1][0]
+
+# Split a list into consecutive pieces of at most `size` items
+def _chunks(items, size):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+# Format a rental row for display
+def format_rental(rental):
+    start_date_formatted = rental[3].strftime('%Y-%m-%d')  # Convert to 'YYYY-MM-DD' format
+    end_date_formatted = rental[4].strftime('%Y-%m-%d')    # Convert to 'YYYY-MM-DD' format
+    return f"{rental[0]}, {rental[1]}, {rental[2]}, {start_date_formatted}, {end_date_formatted}, {rental[5]}, {rental[6]}, {rental[7]}"
+
+
+# Enhance password security - bcrypt runs on a worker pool so that it does not block the caller
+auth_executor = AuthExecutor(
+    rounds=BCRYPT_ROUNDS,
+    workers=int(os.getenv('AUTH_WORKERS', '0')) or None,
+    max_pending=int(os.getenv('AUTH_MAX_PENDING', '64'))
+)
 
-# Enhance password security
 def hash_password(password):
-    salt = bcrypt.gensalt() # Generate salt for hashing
-    return bcrypt.hashpw(password.encode('utf-8'), salt) # Perform hashing using the encoded password and salt
+    return auth_executor.hash_password(password) # Hash with a fresh salt and the configured work factor
+
+# Logged-in sessions (validated from memory, no database or bcrypt)
+def get_sessions():
+    def create():
+        from sessions import SessionStore
+        return SessionStore(
+            secret=os.getenv('SESSION_SECRET', '').encode('utf-8') or None,
+            max_sessions=int(os.getenv('SESSION_MAX', '10000')),
+            idle_timeout=float(os.getenv('SESSION_IDLE_TIMEOUT', '1800')),
+            absolute_timeout=float(os.getenv('SESSION_MAX_AGE', '43200'))
+        )
+    return _shared_object('sessions', create)
+
+# The failed-login limit per email
+def get_login_throttle():
+    def create():
+        from sessions import LoginThrottle
+        return LoginThrottle(
+            max_failures=int(os.getenv('LOGIN_MAX_FAILURES', '5')),
+            lockout=float(os.getenv('LOGIN_LOCKOUT', '300'))
+        )
+    return _shared_object('login_throttle', create)
 
 # Verify the password
 def check_password(stored_password, provided_password):
-    return bcrypt.checkpw(provided_password.encode('utf-8'), stored_password) # compare the passwords to check if they match and return True or False
+    return auth_executor.check_password(stored_password, provided_password) # compare the passwords to check if they match and return True or False
 
 
     
@@ -104,6 +272,7 @@ class User:
         self.user_id = user_id
         self.name = name
         self.email = email
+        self.token = None # Session token, set at login
     
 
     # Polymorphism
@@ -146,9 +315,8 @@ class SingletonMeta(type):
     
 # Define the UserManager class - handles database operations for user registration and login
 class UserManager(metaclass=SingletonMeta):
-    def __init__(self, db_connection):
-        self.conn = db_connection
-        self.cursor = self.conn.cursor()
+    def __init__(self, pool):
+        self.pool = pool # Connections are checked out from the pool per operation
     
     # Register in the User database.
     def register_user(self, name: str, email: str, password: str, role: str):
@@ -160,100 +328,263 @@ class UserManager(metaclass=SingletonMeta):
         hashed_password = hash_password(password)
 
         try:
-            # Insert User data into the database.
-            self.cursor.execute("INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, %s)", (name, email, hashed_password, role))
-            self.conn.commit() # Command to complete the operation
+            with self.pool.transaction() as conn: # Commits when the block ends
+                # Insert User data into the database.
+                conn.execute_prepared("INSERT INTO users (name, email, password, role) VALUES (%s, %s, %s, %s)", (name, email, hashed_password.decode('utf-8'), role))
 
             print(f"\nUser {name} registered successfully with role {role}.")
             # In case of incorrect data input.
-        except mysql.connector.Error as err:
+        except DatabaseError as err:
             raise ValueError(f"Database error: {err}")
 
     # Log in
     def login(self, email: str, password: str):
+        # Refuse locked-out emails before spending a query and a bcrypt check on them
+        login_throttle = get_login_throttle()
+        login_throttle.check(email)
+
         # Retrieve information from the Users table
-        self.cursor.execute("SELECT user_id, name, password, role FROM users WHERE email = %s", (email,)) #Retrieve the email
-        result = self.cursor.fetchone() 
+        with self.pool.connection() as conn:
+            rows = conn.execute_prepared("SELECT user_id, name, password, role FROM users WHERE email = %s", (email,)).fetchall() #Retrieve the email
+            result = rows[0] if rows else None
         
         # Login successful
         if result: # If a matching email is found
             user_id, name, stored_password, role = result
             # Check if it matches the hashed password
             if check_password(stored_password.encode('utf-8'), password):
+                # Upgrade hashes made with an outdated work factor while we still have the plain password
+                if auth_executor.needs_rehash(stored_password.encode('utf-8')):
+                    self._rehash_password(user_id, password)
+
                 # Do not store the password in the object; discard it immediately after a successful login
                 print(f"\nLogged in as {name} with role {role}")
+                login_throttle.record_success(email)
                 if role == 'admin':
-                    return Admin(user_id, name, email) # Return the Admin object
+                    user = Admin(user_id, name, email) # Return the Admin object
                 else:
-                    return Customer(user_id, name, email) # Return the Customer object
+                    user = Customer(user_id, name, email) # Return the Customer object
+                user.token = get_sessions().create(user) # Later requests show the token instead of logging in again
+                return user
             else:
+                login_throttle.record_failure(email)
                 raise ValueError("Incorrect password")
         # Login failed
         else:
+            login_throttle.record_failure(email)
             raise ValueError("Incorrect email or password")
+
+    # Return the Admin or Customer object of a session token (raises SessionError if it is not valid)
+    def authenticate(self, token):
+        return get_sessions().authenticate(token)
+
+    # End a session
+    def logout(self, token):
+        return get_sessions().revoke(token)
+
+    # Store a new hash made with the current work factor
+    def _rehash_password(self, user_id, password):
+        try:
+            with self.pool.transaction() as conn:
+                conn.execute_prepared("UPDATE users SET password = %s WHERE user_id = %s", (hash_password(password).decode('utf-8'), user_id))
+            auth_executor.note_rehash()
+        except DatabaseError as err:
+            print(f"Error: {err}") # The login itself still succeeds with the old hash
         
         
 
 # CarManager class - Handles car management
 class CarManager(metaclass=SingletonMeta):
-    def __init__(self, db_connection):
-        self.conn = db_connection
-        self.cursor = self.conn.cursor()
+    def __init__(self, pool):
+        self.pool = pool # Connections are checked out from the pool per operation
+        self.cache = CarCache(max_size=CAR_CACHE_SIZE, ttl=CAR_CACHE_TTL) # Cars rarely change, so reads are cached
+
+        # Search index over the whole catalog, built on first use and kept in step with the writes below.
+        # Writes by other processes are only seen after a rebuild, so the index is rebuilt every CAR_SEARCH_TTL seconds.
+        self._search_index = None
+        self._search_built = 0.0 # time.monotonic() of the last build
+        self._search_lock = threading.Lock()
+
+    @property
+    def search_index(self):
+        index = self._search_index
+        if index is None:
+            with self._search_lock:
+                if self._search_index is None:
+                    self._build_search_index()
+                return self._search_index
+        if time.monotonic() - self._search_built > CAR_SEARCH_TTL:
+            # Searches keep using the current index while a new one is built in the background
+            self._search_built = time.monotonic()
+            threading.Thread(target=self._rebuild_search_index, name='car-search-rebuild', daemon=True).start()
+        return index
+
+    # Load a new search index from the database (caller holds _search_lock)
+    def _build_search_index(self):
+        from car_search import CarSearchIndex
+        index = CarSearchIndex()
+        index.load(self.iter_cars(page_size=5000))
+        self._search_index, self._search_built = index, time.monotonic()
+
+    def _rebuild_search_index(self):
+        with self._search_lock: # Writes from this process wait, then go into the new index
+            if self._search_index is not None: # Unless refresh() dropped it and the next search builds it anyway
+                try:
+                    self._build_search_index()
+                except DatabaseError as err:
+                    print(f"Error: {err}")
+
+    # A car was added, changed or deleted: drop it from the cache and update the search index.
+    # Without car_id (e.g. after a bulk import) the catalog snapshot and the search index are rebuilt on next use.
+    def refresh(self, car_id=None):
+        self.cache.invalidate(car_id)
+        if car_id is None:
+            with self._search_lock:
+                self._search_index = None
+            return
+        with self._search_lock: # Waits for a build in progress, which may have read the old row
+            index = self._search_index
+        if index is not None:
+            car = self._load_car(car_id)
+            if car is None:
+                index.remove(car_id)
+            else:
+                index.put(car)
+
+    # Look up one car (read-through cache)
+    def get_car(self, car_id):
+        return self.cache.get(car_id, self._load_car)
+
+    def _load_car(self, car_id):
+        with self.pool.connection() as conn:
+            rows = conn.execute_prepared(f"SELECT {', '.join(CAR_COLUMNS)} FROM cars WHERE car_id = %s", (car_id,)).fetchall()
+            return rows[0] if rows else None
+
+    # Every car as one cached snapshot
+    def catalog(self):
+        return self.cache.catalog(lambda: self.iter_cars(page_size=1000))
 
     # Add a car (Admin's option)
-    def add_car(self, make, model, year, mileage, available_now, min_rent_period, max_rent_period):
+    def add_car(self, make, model, year, mileage, in_service, min_rent_period, max_rent_period):
         try:
-            # Insert query statement
-            self.cursor.execute("INSERT INTO cars (make, model, year, mileage, available_now, min_rent_period, max_rent_period) VALUES (%s, %s, %s, %s, %s, %s, %s)", (make, model, year, mileage, available_now, min_rent_period, max_rent_period))
-            self.conn.commit() 
+            with self.pool.transaction() as conn:
+                cursor = conn.cursor()
+                # Insert query statement (a new car has no bookings, so it is available now if it is in service)
+                cursor.execute("INSERT INTO cars (make, model, year, mileage, in_service, available_now, min_rent_period, max_rent_period) VALUES (%s, %s, %s, %s, %s, %s, %s, %s)", (make, model, year, mileage, in_service, in_service, min_rent_period, max_rent_period))
+                car_id = cursor.lastrowid
+            self.refresh(car_id) # The catalog snapshot no longer has every car
             print("Car added successfully.")
-        except mysql.connector.Error as err:
+            return True
+        except DatabaseError as err:
             print(f"Error: {err}")
+            return False
 
     # Update a car (Admin's option)
-    def update_car(self, car_id, make, model, year, mileage, available_now, min_rent_period, max_rent_period):
+    def update_car(self, car_id, make, model, year, mileage, in_service, min_rent_period, max_rent_period):
+        today = datetime.date.today()
         try:
-            self.cursor.execute("UPDATE cars SET make=%s, model=%s, year=%s, mileage=%s, available_now=%s, min_rent_period=%s, max_rent_period=%s WHERE car_id=%s", (make, model, year, mileage, available_now, min_rent_period, max_rent_period, car_id))
-            self.conn.commit()
+            with self.pool.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute("UPDATE cars SET make=%s, model=%s, year=%s, mileage=%s, in_service=%s, min_rent_period=%s, max_rent_period=%s WHERE car_id=%s", (make, model, year, mileage, in_service, min_rent_period, max_rent_period, car_id))
+                updated = cursor.rowcount
+                # Taking a car out of service (or back in) changes whether it is available right now
+                cursor.execute(f"UPDATE cars SET available_now = {AVAILABLE_NOW_SQL} WHERE car_id = %s", (today, today, car_id))
+            self.refresh(car_id)
 
             # If the number of rows affected by the previous query is one or more, it means that a change has been made
-            if self.cursor.rowcount > 0: 
+            if updated > 0: 
                 print("Car updated successfully.")
+                return True
             # if there are no changes
-            else:
-                print("Car not found.")
-        except mysql.connector.Error as err:
+            print("Car not found.")
+            return False
+        except DatabaseError as err:
             print(f"Error: {err}")
+            return False
 
     # Delete a car (Admin's option)
     def delete_car(self, car_id):
         try:
-            # Delete query statement
-            self.cursor.execute('DELETE FROM cars WHERE car_id=%s', (car_id,))
-            self.conn.commit()
+            with self.pool.transaction() as conn:
+                cursor = conn.cursor()
+                # Delete query statement
+                cursor.execute('DELETE FROM cars WHERE car_id=%s', (car_id,))
+            self.refresh(car_id)
             # If the number of affected rows is one or more, it means that the deletion was successful
-            if self.cursor.rowcount > 0:
+            if cursor.rowcount > 0:
                 print("Car deleted successfully.")
+                return True
             # if there are no changes
-            else:
-                print("Car not found.")
-        except mysql.connector.Error as err:
+            print("Car not found.")
+            return False
+        except DatabaseError as err:
             print(f"Error: {err}")
-
-
-    # Retrieve the car list (Admin's option)
-    def list_cars(self):
-        print("car_id, make, model, year, mileage, available_now, min_rent_period, max_rent_period\n")
-        self.cursor.execute('SELECT * FROM cars')
-        cars = self.cursor.fetchall()
-        for car in cars:
-            print(car)
+            return False
+
+
+    # Stream cars page by page, filtered by make/model/year range/availability right now
+    def iter_cars(self, make=None, model=None, year_from=None, year_to=None, available=None, page_size=PAGE_SIZE, after=0):
+        conditions, params = [], []
+        if make:
+            conditions.append("make = %s")
+            params.append(make)
+        if model:
+            conditions.append("model = %s")
+            params.append(model)
+        if year_from:
+            conditions.append("year >= %s")
+            params.append(year_from)
+        if year_to:
+            conditions.append("year <= %s")
+            params.append(year_to)
+        if available is not None:
+            conditions.append("available_now = %s")
+            params.append(1 if available else 0)
+        return iter_pages(self.pool, 'cars', 'car_id', CAR_COLUMNS, conditions, params, page_size, after)
 
 # Rental Manager class 
 class RentalManager(metaclass=SingletonMeta):
-    def __init__(self, db_connection):
-        self.conn = db_connection
-        self.cursor = self.conn.cursor()
+    def __init__(self, pool, car_manager, pricing=None):
+        self.pool = pool # Connections are checked out from the pool per operation
+        self.cars = car_manager # Car lookups go through the car cache
+        self.pricing = pricing or create_pricing() # Computes rental fees
+
+        # The booked date ranges of every car, loaded on first use so that short-lived commands skip it.
+        # Bookings, cancellations and sweeps by other processes only show up after a reload, so the
+        # engine is reloaded every AVAILABILITY_TTL seconds.
+        self._availability = None
+        self._availability_loaded = 0.0 # time.monotonic() of the last load
+        self._availability_lock = threading.Lock()
+
+    @property
+    def availability(self):
+        engine = self._availability
+        if engine is None or time.monotonic() - self._availability_loaded > AVAILABILITY_TTL:
+            with self._availability_lock: # Releases wait for the reload and then go into the new engine
+                if self._availability is engine: # Unless another thread reloaded it meanwhile
+                    try:
+                        self._availability = self._load_availability()
+                    except DatabaseError as err:
+                        if engine is None:
+                            raise
+                        print(f"Error: {err}") # Keep answering from the old engine; try again after the next TTL
+                    self._availability_loaded = time.monotonic()
+                engine = self._availability
+        return engine
+
+    def _load_availability(self):
+        engine = AvailabilityEngine()
+        with self.pool.connection() as conn:
+            engine.load(conn)
+            conn.commit()
+        return engine
+
+    # The car is free again for these dates (nothing to do if the engine was never loaded;
+    # a later load reads the committed status anyway)
+    def _release_dates(self, rental_id):
+        with self._availability_lock:
+            if self._availability is not None:
+                self._availability.release(rental_id)
 
     # Create a rental booking (Customer's option)
     def create_rental(self, car_id, user_id, start_date, end_date):
@@ -262,104 +593,257 @@ class RentalManager(metaclass=SingletonMeta):
         start_date = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
         end_date = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
 
-        # Check availability for rental
-        self.cursor.execute("SELECT available_now FROM cars WHERE car_id = %s", (car_id,))
-        available = self.cursor.fetchone()
-        
-        # In case of unavailability for rental
-        if not available[0]:
+        if end_date < start_date:
+            print("End date must not be before start date.")
+            return
+
+        # Reject unknown or unavailable cars without touching the database
+        car = self.cars.get_car(car_id)
+        if car is None:
+            print("Car not found.")
+            return
+        if not car[5]: # in_service
             print("This car is not available for rental.")
             return
-        
-        # In case of availability for rental.
-        # Calculate rental fee ($50 per day)
-        days = (end_date - start_date).days + 1
-        total_fee = days * 50
-        
-        # Insert the requested rental car into the rentals table - status: on process
+        # Calculate rental fee (also enforces the car's minimum and maximum rental period)
+        from pricing import PricingError
         try:
-            self.cursor.execute("INSERT INTO rentals (car_id, user_id, start_date, end_date, total_fee, status) VALUES (%s, %s, %s, %s, %s, 'on process')", (car_id, user_id, start_date, end_date, total_fee))
-            self.conn.commit()
-            print("Rental created successfully. Total fee: ${:.2f}".format(total_fee))
-        except mysql.connector.Error as err:
+            total_fee = self.pricing.quote(car, start_date, end_date)
+        except PricingError as pe:
+            print(pe)
+            return
+
+        # One transaction: locked check, INSERT, commit
+        try:
+            # The in-memory index can be behind rentals changed by other processes, so a "booked" answer is only
+            # a hint; the locked query below decides and brings the index up to date
+            index_free = self.availability.is_free(car_id, start_date, end_date)
+
+            with self.pool.transaction() as conn:
+                # Check availability for rental. This row lock is the only lock a booking takes:
+                # it serializes bookings of the same car and leaves every other car alone.
+                available = conn.execute_prepared("SELECT in_service FROM cars WHERE car_id = %s FOR UPDATE", (car_id,)).fetchall()
+
+                # In case of unavailability for rental
+                if not available or not available[0][0]:
+                    print("This car is not available for rental.")
+                    return
+
+                # Re-check the rentals table while holding the lock; the database is the source of truth.
+                # A plain read is enough here because every booking of this car waits for the lock above.
+                overlapping = conn.execute_prepared(
+                    "SELECT rental_id, start_date, end_date FROM rentals WHERE car_id = %s AND status IN (%s, %s) AND start_date <= %s AND end_date >= %s",
+                    (car_id, *BLOCKING_STATUSES, end_date, start_date)
+                ).fetchall()
+                if overlapping or not index_free: # The index and the database disagree
+                    self.availability.reconcile(car_id, start_date, end_date, overlapping)
+                if overlapping:
+                    print("This car is already booked for the requested dates.")
+                    return
+
+                # In case of availability for rental.
+                # Insert the requested rental car into the rentals table - status: on process
+                cursor = conn.execute_prepared(
+                    "INSERT INTO rentals (car_id, user_id, start_date, end_date, total_fee, status) VALUES (%s, %s, %s, %s, %s, 'on process')",
+                    (car_id, user_id, start_date, end_date, total_fee)
+                )
+                rental_id = cursor.lastrowid
+        except DatabaseError as err:
             print(f"Error: {err}")
+            return
 
-    
-    # List of rented cars (Customer's option)
-    def list_rentals(self):
-        self.cursor.execute("SELECT * FROM rentals WHERE status <> 'returned'")
-        rentals = self.cursor.fetchall()
-
-        # If there are no rented cars
-        if len(rentals) == 0:
-            print("\nYou do not have booking yet")
-
-        # If there are rented cars
-        else: 
-            print("\n[rental_id, car_id, user_id, start_date, end_date, total_fee, status]\n")
-            for rental in rentals:
-                start_date_formatted = rental[3].strftime('%Y-%m-%d')  # Convert to 'YYYY-MM-DD' format
-                end_date_formatted = rental[4].strftime('%Y-%m-%d')    # Convert to 'YYYY-MM-DD' format
-                print(f"{rental[0]}, {rental[1]}, {rental[2]}, {start_date_formatted}, {end_date_formatted}, {rental[5]}, {rental[6]}")
+        self.availability.book(car_id, rental_id, start_date, end_date)
+        print("Rental created successfully. Total fee: ${:.2f}".format(total_fee))
+        return rental_id
 
-    # Approve rental request. (Admin's option)
-    def approve_rental(self, rental_id):
-        try:
-            self.cursor.execute("UPDATE rentals SET status = 'active' WHERE rental_id = %s AND status = 'on process'", (rental_id,))
-            self.conn.commit()
+    # Find the cars that are free for the whole period (dates as 'YYYY-MM-DD' strings)
+    def find_available_cars(self, start_date, end_date):
+        start_date = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_date = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
 
-            # If the number of affected rows is one or more, it means the approval was successful
-            if self.cursor.rowcount > 0:
-                print("Rental approved successfully.")
-            else:
-                print("Rental not found or already processed.")
-        except mysql.connector.Error as err:
-            print(f"Error: {err}")
+        car_ids = [car[0] for car in self.cars.catalog() if car[5]] # Cars in service
 
-    # Cancel rental request (Admin's option)
-    def cancel_rental(self, rental_id):
-        try:
-            self.cursor.execute("UPDATE rentals SET status = 'cancelled' WHERE rental_id = %s", (rental_id,))
-            self.conn.commit()
+        return self.availability.free_cars(car_ids, start_date, end_date)
 
-            # If the number of affected rows is one or more, it means that the deletion was successful
-            if self.cursor.rowcount > 0:
-                print("Rental cancelled successfully.")
-            else:
-                print("Rental not found.")
-        except mysql.connector.Error as err:
+    # Price every car that is free for the whole period; returns a list of (car, fee)
+    def quote_available_cars(self, start_date, end_date):
+        start_date = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
+        end_date = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
+
+        # Quote the cached catalog as a whole (its rate table is reused between calls), then keep the free cars
+        quotes = self.pricing.quote_catalog(self.cars.catalog(), start_date, end_date)
+        return [(car, fee) for car, fee in quotes if car[5] and self.availability.is_free(car[0], start_date, end_date)]
+
+    # Search the cars that can be rented by make/model prefix and year/mileage ranges, best matches first.
+    # With dates ('YYYY-MM-DD' strings) only cars free for the whole period and allowing its length are returned.
+    def search_cars(self, text=None, start_date=None, end_date=None, limit=PAGE_SIZE, **filters):
+        accept = None
+        if bool(start_date) != bool(end_date):
+            raise ValueError("Give both a start and an end date, or neither.")
+        if start_date and end_date:
+            start_date = datetime.datetime.strptime(start_date, '%Y-%m-%d').date()
+            end_date = datetime.datetime.strptime(end_date, '%Y-%m-%d').date()
+            if end_date < start_date:
+                raise ValueError("End date must not be before start date.")
+            filters['rental_days'] = (end_date - start_date).days + 1
+            availability = self.availability
+            accept = lambda car_id: availability.is_free(car_id, start_date, end_date)
+        return self.cars.search_index.search(text, accept=accept, limit=limit, **filters)
+
+    
+    # Stream rentals page by page, filtered by status/user/date window.
+    # Archived rentals are included whenever the statuses asked for can be archived (archived=None),
+    # or always/never with archived=True/False.
+    def iter_rentals(self, statuses=None, user_id=None, window_start=None, window_end=None, page_size=PAGE_SIZE, after=0, archived=None):
+        conditions, params = [], []
+        if statuses:
+            conditions.append("status IN (" + ", ".join(["%s"] * len(statuses)) + ")")
+            params.extend(statuses)
+        if user_id is not None:
+            conditions.append("user_id = %s")
+            params.append(user_id)
+        # Rentals that overlap the window [window_start, window_end]
+        if window_start:
+            conditions.append("end_date >= %s")
+            params.append(window_start)
+        if window_end:
+            conditions.append("start_date <= %s")
+            params.append(window_end)
+        if archived is None:
+            from rental_archive import ARCHIVE_STATUSES
+            archived = not statuses or any(status in ARCHIVE_STATUSES for status in statuses)
+        tables = ('rentals', 'rentals_archive') if archived else 'rentals'
+        return iter_pages(self.pool, tables, 'rental_id', RENTAL_COLUMNS, conditions, params, page_size, after)
+
+    # Move one rental through the state machine, printing the outcome; returns True on success
+    def _change_status(self, rental_id, target, success_message, expected_version=None, user_id=None):
+        try:
+            with self.pool.connection() as conn:
+                transition(conn, rental_id, target, expected_version, before_commit=self._refresh_reports, user_id=user_id)
+        except ValueError as ve: # Not found, not allowed from the current status, or changed concurrently
+            print(f"Error: {ve}")
+            return False
+        except DatabaseError as err:
             print(f"Error: {err}")
+            return False
+
+        if target not in BLOCKING_STATUSES:
+            self._release_dates(rental_id)
+        print(success_message)
+        return True
+
+    # Keep the daily report aggregates in step with a status change (same transaction)
+    def _refresh_reports(self, conn, rental_id, old_status, new_status):
+        import reporting
+        reporting.apply_transition(conn, [rental_id], old_status, new_status)
+
+    # Approve rental request. (Admin's option)
+    def approve_rental(self, rental_id, expected_version=None):
+        return self._change_status(rental_id, 'active', "Rental approved successfully.", expected_version)
+
+    # Cancel rental request (Admin's option)
+    def cancel_rental(self, rental_id, expected_version=None):
+        return self._change_status(rental_id, 'cancelled', "Rental cancelled successfully.", expected_version)
 
     # Complete (end) the rental (Admin's option)
-    def complete_rental(self, rental_id):
-        try:
-            self.cursor.execute("UPDATE rentals SET status = 'completed' WHERE rental_id = %s", (rental_id,))
-            self.conn.commit()
+    def complete_rental(self, rental_id, expected_version=None):
+        return self._change_status(rental_id, 'completed', "Rental completed successfully.", expected_version)
+
+    # Process rental return (Customer's option); with user_id, only that customer's rental can be returned
+    def return_rental(self, rental_id, expected_version=None, user_id=None):
+        return self._change_status(rental_id, 'returned', "Rental returned successfully.", expected_version, user_id)
+
+    # Approve many rentals at once, by ID list or by filter (Admin's option)
+    def approve_rentals(self, rental_ids=None, start_from=None, start_to=None):
+        return self._update_status_many('active', rental_ids, start_from, start_to)
+
+    # Cancel many rentals at once, by ID list or by filter (Admin's option)
+    def cancel_rentals(self, rental_ids=None, start_from=None, start_to=None, statuses=('on process',)):
+        return self._update_status_many('cancelled', rental_ids, start_from, start_to, statuses)
+
+    # Complete many rentals at once, by ID list or by filter (Admin's option)
+    def complete_rentals(self, rental_ids=None, start_from=None, start_to=None, statuses=('active',)):
+        return self._update_status_many('completed', rental_ids, start_from, start_to, statuses)
+
+    # Move a set of rentals to `target` in one transaction and return {rental_id: outcome}.
+    # Without rental_ids, the rentals are chosen by start date window and status
+    # (`statuses` defaults to every status the state machine allows to move to `target`).
+    # At least one of rental_ids, start_from and start_to is required, so a bare call cannot change the whole table.
+    def _update_status_many(self, target, rental_ids=None, start_from=None, start_to=None, statuses=None):
+        if rental_ids is None and start_from is None and start_to is None:
+            raise ValueError("Give rental IDs or a start date window.")
+        allowed = allowed_sources(target)
+        outcomes = {}
 
-            # If the number of affected rows is one or more, it means the rental has been completed
-            if self.cursor.rowcount > 0:
-                print("Rental completed successfully.")
-            else:
-                print("Rental not found.")
-        except mysql.connector.Error as err:
+        try:
+            with self.pool.connection() as conn:
+                cursor = conn.cursor()
+
+                # Lock the rentals we are about to change and read their current status
+                if rental_ids is not None:
+                    rental_ids = list(dict.fromkeys(int(rental_id) for rental_id in rental_ids))
+                    current = {}
+                    for chunk in _chunks(rental_ids, BATCH_CHUNK):
+                        placeholders = ", ".join(["%s"] * len(chunk))
+                        cursor.execute(f"SELECT rental_id, status FROM rentals WHERE rental_id IN ({placeholders}) FOR UPDATE", chunk)
+                        current.update(cursor.fetchall())
+                    for rental_id in rental_ids:
+                        if rental_id not in current:
+                            outcomes[rental_id] = 'not found'
+                else:
+                    conditions, params = [], []
+                    statuses = statuses or allowed
+                    if statuses:
+                        conditions.append("status IN (" + ", ".join(["%s"] * len(statuses)) + ")")
+                        params.extend(statuses)
+                    if start_from:
+                        conditions.append("start_date >= %s")
+                        params.append(start_from)
+                    if start_to:
+                        conditions.append("start_date <= %s")
+                        params.append(start_to)
+                    where = " AND ".join(conditions) or "1 = 1"
+                    cursor.execute(f"SELECT rental_id, status FROM rentals WHERE {where} FOR UPDATE", params)
+                    current = dict(cursor.fetchall())
+
+                # Apply the same transition rules as the single-ID methods
+                eligible = []
+                for rental_id, status in current.items():
+                    if status in allowed:
+                        eligible.append(rental_id)
+                    else:
+                        outcomes[rental_id] = f"skipped (status is '{status}')"
+
+                # One set-based UPDATE per chunk of IDs, all inside the same transaction
+                for chunk in _chunks(eligible, BATCH_CHUNK):
+                    placeholders = ", ".join(["%s"] * len(chunk))
+                    cursor.execute(f"UPDATE rentals SET status = %s, version = version + 1 WHERE rental_id IN ({placeholders})", (target, *chunk))
+
+                # Report aggregates, grouped by the status each rental came from
+                import reporting
+                by_status = {}
+                for rental_id in eligible:
+                    by_status.setdefault(current[rental_id], []).append(rental_id)
+                for old_status, ids in by_status.items():
+                    for chunk in _chunks(ids, BATCH_CHUNK):
+                        reporting.apply_transition(conn, chunk, old_status, target)
+                conn.commit()
+        except DatabaseError as err:
+            if rental_ids is None: # There are no IDs to report the error against; an empty dict would read as "nothing matched"
+                raise ValueError(f"Database error: {err}")
             print(f"Error: {err}")
+            return {rental_id: f"error: {err}" for rental_id in rental_ids}
 
-     # Process rental return (Customer's option)
-    def return_rental(self, rental_id):
-        try:
-            self.cursor.execute("UPDATE rentals SET status = 'returned' WHERE rental_id = %s", (rental_id,))
-            self.conn.commit()
+        for rental_id in eligible:
+            outcomes[rental_id] = target
+            if target not in BLOCKING_STATUSES:
+                self._release_dates(rental_id)
 
-            # If the number of affected rows is one or more, it means the car has been successfully returned
-            if self.cursor.rowcount > 0:
-                print("Rental returned successfully.")
-            else:
-                print("Rental not found.")
-        except mysql.connector.Error as err:
-            print(f"Error: {err}")
+        print(f"{len(eligible)} rentals {target}, {len(outcomes) - len(eligible)} not changed.")
+        return outcomes
 
 # User registration feature.
-def sign_up(user_manager):
+def sign_up(service):
     name = input("Enter your name: ")
     email = input("Enter your email: ")
     password = input("Enter your password: ")
@@ -370,22 +854,22 @@ def sign_up(user_manager):
         return
     
     try:
-        user_manager.register_user(name, email, password, role) # Send information to the database
+        service.register_user(name, email, password, role) # Send information to the database
     except ValueError as ve:
         print(f"Error: {ve}")
 
 # User login feature
-def log_in(user_manager):
+def log_in(service):
     email = input("Enter your email: ")
     password = input("Enter your password: ")
     try:
-        return user_manager.login(email, password) # Send information to the database and receive an Admin or Customer object in return
+        return service.login(email, password) # Send information to the database and receive an Admin or Customer object in return
     except ValueError as ve:
         print(f"Error: {ve}")
         return None
     
 # Initial screen
-def main_menu(user_manager, car_manager, rental_manager):
+def main_menu(service):
     while True:
 
         print("\n1. Sign Up")
@@ -396,16 +880,16 @@ def main_menu(user_manager, car_manager, rental_manager):
         # sign up
         if choice == '1':
             # After calling the sign_up method, enter the member information and save it to the database.
-            sign_up(user_manager) 
+            sign_up(service) 
         # Log in
         elif choice == '2':
             # After calling the log_in method, verify the member information and return either an Admin or Customer object.
-            user = log_in(user_manager) 
+            user = log_in(service) 
             if user:
                 if user.role == 'admin': # If the object is an Admin
-                    admin_menu(user, car_manager, rental_manager)
+                    admin_menu(user, service)
                 elif user.role == 'customer': # If the object is a Customer
-                    customer_menu(user, rental_manager)
+                    customer_menu(user, service)
         elif choice == '3':
             print("Exiting...")
             break
@@ -413,10 +897,22 @@ def main_menu(user_manager, car_manager, rental_manager):
             print("Invalid choice, please try again.")
 
 
+# True while the user's session token is valid (checked in memory by the service)
+def session_active(user, service):
+    try:
+        service.authenticate(user.token)
+        return True
+    except ValueError as ve: # SessionError
+        print(f"Error: {ve}")
+        return False
+
+
 # If the user is an admin, the admin menu is displayed.
-def admin_menu(user, car_manager, rental_manager):
+def admin_menu(user, service):
     while True:
 
+        if not session_active(user, service): # Expired or revoked: back to the start screen
+            break
         user.perform_task() # Polymorphism
 
         print("\n1. Add Car")
@@ -426,24 +922,25 @@ def admin_menu(user, car_manager, rental_manager):
         print("5. Approve Rental")
         print("6. Cancel Rental")
         print("7. Complete Rental")
-        print("8. Logout")
+        print("8. Process Rentals in Bulk")
+        print("9. Logout")
         
         choice = input("Select an option: ")
 
-        # When option 1 is selected, call the add_car() method of car_manager to add a new car
+        # When option 1 is selected, call the add_car() method of the service to add a new car
         if choice == '1':
             make = input("Enter car make: ")
             model = input("Enter car model: ")
             year = input("Enter car year: ")
             mileage = input("Enter car mileage: ")
             
-            available_now_input = input("Is the car available now? (yes/no): ")
-            available_now = 1 if available_now_input.lower() =='yes' else 0
+            in_service_input = input("Can the car be rented (in service)? (yes/no): ")
+            in_service = 1 if in_service_input.lower() =='yes' else 0
 
             min_rent_period = input("Enter minimum rental period (days): ")
             max_rent_period = input("Enter maximum rental period (days): ")
-            car_manager.add_car(make, model, year, mileage, available_now, min_rent_period, max_rent_period)
-        # When option 2 is selected, call the update_car() method of car_manager to update the information of an existing car
+            service.add_car(user.token, make, model, year, mileage, in_service, min_rent_period, max_rent_period)
+        # When option 2 is selected, call the update_car() method of the service to update the information of an existing car
         elif choice == '2':
             car_id = input("Enter car ID to update: ")
             make = input("Enter new car make: ")
@@ -451,33 +948,39 @@ def admin_menu(user, car_manager, rental_manager):
             year = input("Enter new car year: ")
             mileage = input("Enter new car mileage: ")
             
-            available_now_input = input("Is the car available now? (yes/no): ")
-            available_now = 1 if available_now_input.lower() =='yes' else 0
+            in_service_input = input("Can the car be rented (in service)? (yes/no): ")
+            in_service = 1 if in_service_input.lower() =='yes' else 0
 
             min_rent_period = input("Enter minimum rental period (days): ")
             max_rent_period = input("Enter maximum rental period (days): ")
-            car_manager.update_car(car_id, make, model, year, mileage, available_now, min_rent_period, max_rent_period)
-        # When option 3 is selected, call the delete_car() method of car_manager to delete a car
+            service.update_car(user.token, int(car_id), make, model, year, mileage, in_service, min_rent_period, max_rent_period)
+        # When option 3 is selected, call the delete_car() method of the service to delete a car
         elif choice == '3':
             car_id = input("Enter car ID to delete: ")
-            car_manager.delete_car(car_id)
-        # When option 4 is selected, call the list_cars() method of car_manager to display the registered cars.
+            service.delete_car(user.token, int(car_id))
+        # When option 4 is selected, page through the cars of the service to display the registered cars.
         elif choice == '4':
-            car_manager.list_cars()
-        # When option 5 is selected, call the approve_rental() method of rental_manager to approve the reservation
+            print(", ".join(CAR_COLUMNS) + "\n")
+            if show_pages(iter_service_pages(service.cars_page, user.token), lambda car: str(car)) == 0:
+                print("No cars found.")
+        # When option 5 is selected, call the approve_rental() method of the service to approve the reservation
         elif choice == '5':
             rental_id = input("Enter rental ID to approve: ")
-            rental_manager.approve_rental(int(rental_id))
-        # When option 6 is selected, call the cancel_rental() method of rental_manager to cancel the reservation.
+            service.approve_rental(user.token, int(rental_id))
+        # When option 6 is selected, call the cancel_rental() method of the service to cancel the reservation.
         elif choice == '6':
             rental_id = input("Enter rental ID to cancel: ")
-            rental_manager.cancel_rental(int(rental_id))
-        # When option 7 is selected, call the complete_rental() method of rental_manager to complete the reservation
+            service.cancel_rental(user.token, int(rental_id))
+        # When option 7 is selected, call the complete_rental() method of the service to complete the reservation
         elif choice == '7':
             rental_id = input("Enter rental ID to complete: ")
-            rental_manager.complete_rental(int(rental_id))
-        # When option 8 is selected, log out
+            service.complete_rental(user.token, int(rental_id))
+        # When option 8 is selected, approve/cancel/complete many rentals in one go
         elif choice == '8':
+            process_rentals_in_bulk(user, service)
+        # When option 9 is selected, log out
+        elif choice == '9':
+            service.logout(user.token)
             print("Logging out...")
             break
         else:
@@ -485,52 +988,365 @@ def admin_menu(user, car_manager, rental_manager):
 
 
 
+# Bulk processing of rentals (Admin's option)
+def process_rentals_in_bulk(user, service):
+    action = input("Action (approve/cancel/complete): ").lower()
+    if action not in ('approve', 'cancel', 'complete'):
+        print("Invalid action.")
+        return
+
+    ids_input = input("Enter rental IDs separated by commas (leave blank to select by start date): ")
+    try:
+        if ids_input.strip():
+            rental_ids = [int(rental_id) for rental_id in ids_input.split(',') if rental_id.strip()]
+            outcomes = getattr(service, action + '_rentals')(user.token, rental_ids)
+        else:
+            start_date = datetime.datetime.strptime(input("Enter start date (YYYY-MM-DD): "), '%Y-%m-%d').date()
+            outcomes = getattr(service, action + '_rentals')(user.token, None, start_date, start_date)
+    except ValueError as ve:
+        print(f"Error: {ve}")
+        return
+
+    for rental_id, outcome in sorted((outcomes or {}).items()):
+        print(f"{rental_id}: {outcome}")
+
+
+
 # If the user is a customer, the customer menu is displayed.
-def customer_menu(user, rental_manager):
+def customer_menu(user, service):
     while True:
 
+        if not session_active(user, service): # Expired or revoked: back to the start screen
+            break
         user.perform_task() # Polymorphism
 
         print("\n1. Rent a Car")
         print("2. View Rentals")
         print("3. Return a Car")
-        print("4. Logout")
+        print("4. Show Prices of Available Cars")
+        print("5. Search Cars")
+        print("6. Logout")
         
         choice = input("Select an option: ")
-        if choice == '4':
+        if choice == '6':
+            service.logout(user.token)
             print("Logging out...")
             break
-        # If option 1 is selected, call the create_rental() method of the rental_manager to create a new rental
+        # If option 1 is selected, call the create_rental() method of the service to create a new rental
         elif choice == '1': 
             car_id = input("Enter car ID to rent: ")
             start_date = input("Enter start date (YYYY-MM-DD): ")
             end_date = input("Enter end date (YYYY-MM-DD): ")
-            rental_manager.create_rental(int(car_id), user.user_id, start_date, end_date)
-        # If option 2 is selected, call the list_rentals() method of the rental_manager to view all rentals the user has made so far.
+            service.create_rental(user.token, int(car_id), start_date, end_date)
+        # If option 2 is selected, page through the rentals of the service to view all rentals the user has made so far.
         elif choice == '2': 
-            print("\n[rental_id, car_id, user_id, start_date, end_date, total_fee, status]\n")
-            rental_manager.list_rentals()
-        # If option 3 is selected, call the return_rental() method of the rental_manager to return the car that the user has rented
+            print("\n[" + ", ".join(RENTAL_COLUMNS) + "]\n")
+            # Only this customer's rentals - the service takes the user from the session (user_id index, archived history included)
+            if show_pages(iter_service_pages(service.rentals_page, user.token, statuses=OPEN_STATUSES), format_rental) == 0:
+                print("\nYou do not have booking yet")
+        # If option 3 is selected, call the return_rental() method of the service to return the car that the user has rented
         elif choice == '3':
                 rental_id = input("Enter rental ID to return: ")
-                rental_manager.return_rental(int(rental_id))
+                service.return_rental(user.token, int(rental_id))
+        # If option 4 is selected, price every car that is free for the requested dates
+        elif choice == '4':
+            start_date = input("Enter start date (YYYY-MM-DD): ")
+            end_date = input("Enter end date (YYYY-MM-DD): ")
+            try:
+                quotes = service.quote_available_cars(user.token, start_date, end_date)
+            except ValueError as ve:
+                print(f"Error: {ve}")
+                continue
+            print("\n[car_id, make, model, year, total_fee]\n")
+            if show_pages(iter(quotes or []), lambda quote: f"{quote[0][0]}, {quote[0][1]}, {quote[0][2]}, {quote[0][3]}, {quote[1]:.2f}") == 0:
+                print("No cars are available for these dates.")
+        # If option 5 is selected, search the catalog so that the customer can find the car_id to rent
+        elif choice == '5':
+            text = input("Make/model (e.g. 'toy cor', empty for any): ")
+            year_from = input("Oldest year (empty for any): ")
+            max_mileage = input("Maximum mileage (empty for any): ")
+            start_date = input("Start date (YYYY-MM-DD, empty for any dates): ")
+            end_date = input("End date (YYYY-MM-DD): ") if start_date else None
+            try:
+                cars = service.search_cars(user.token, text, start_date or None, end_date or None, limit=100,
+                                           year=(int(year_from), None) if year_from else None,
+                                           mileage=(None, int(max_mileage)) if max_mileage else None)
+            except ValueError as ve:
+                print(f"Error: {ve}")
+                continue
+            print("\n[car_id, make, model, year, mileage, min_rent_period, max_rent_period]\n")
+            if show_pages(iter(cars or []), lambda car: f"{car[0]}, {car[1]}, {car[2]}, {car[3]}, {car[4]}, {car[6]}, {car[7]}") == 0:
+                print("No cars match your search.")
         else:
             print("Invalid choice, please try again.")
 
 
-if __name__ == "__main__":
-
+# Interactive mode - verify the database, then run the menus on top of the async service layer
+def run_interactive():
+    from service import RentalService, ServiceClient # asyncio is only needed by the menus
 
     conn = create_connection() # Attempt to connect to the database.
     
     if conn:
         print("Database connection successful.")
+        conn.close() # The bootstrap connection is only needed to create the database; the pool opens its own connections
+
         # After successfully connecting, create instances of classes such as `UserManager`.
-        user_manager = UserManager(conn)
-        car_manager = CarManager(conn)
-        rental_manager = RentalManager(conn)
-        main_menu(user_manager, car_manager, rental_manager)
-        conn.close()
+        pool = create_pool()
+        user_manager = UserManager(pool)
+        car_manager = CarManager(pool)
+        rental_manager = RentalManager(pool, car_manager)
+
+        # Complete overdue rentals, cancel stale requests and refresh available_now in the background
+        scheduler = None
+        if SCHEDULER_INTERVAL > 0:
+            from scheduler import RentalScheduler
+            scheduler = RentalScheduler(rental_manager, interval=SCHEDULER_INTERVAL)
+            scheduler.start()
+
+        # The menus are thin clients of the async service layer; its workers are capped at the pool size,
+        # so calls wait on the service semaphore rather than on the pool
+        service = RentalService(user_manager, car_manager, rental_manager, max_concurrency=min(SERVICE_CONCURRENCY, pool.size))
+        client = ServiceClient(service)
+        main_menu(client)
+        client.close()
+        if scheduler is not None:
+            scheduler.stop()
+        service.shutdown()
+        pool.close()
+        auth_executor.shutdown()
+
+        # Leave the query metrics behind in Prometheus text format
+        import instrumentation
+        metrics = instrumentation.active()
+        if metrics is not None and os.getenv('METRICS_FILE'):
+            with open(os.getenv('METRICS_FILE'), 'w', encoding='utf-8') as file:
+                file.write(metrics.prometheus())
     else:
         print("Failed to initialize database.")
 
+
+# Command mode - one admin task per invocation, e.g. `python main.py approve 12 13`
+def build_parser():
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='main.py', description="Car rental administration. Run without arguments for the interactive menu.")
+    parser.add_argument('--verify-schema', action='store_true', help="check and migrate the schema even if a previous run already verified it")
+    commands = parser.add_subparsers(dest='command', required=True, metavar='command')
+
+    def car_fields(command, required):
+        command.add_argument('--make', required=required)
+        command.add_argument('--model', required=required)
+        command.add_argument('--year', type=int, required=required)
+        command.add_argument('--mileage', type=int, required=required)
+        command.add_argument('--in-service', choices=('yes', 'no'), required=required, help="whether the car can be rented")
+        command.add_argument('--min-days', type=int, required=required, help="minimum rental period")
+        command.add_argument('--max-days', type=int, required=required, help="maximum rental period")
+
+    car_fields(commands.add_parser('add-car', help="add a car"), True)
+    command = commands.add_parser('update-car', help="update a car (every field is required, as in the menu)")
+    command.add_argument('car_id', type=int)
+    car_fields(command, True)
+    command = commands.add_parser('delete-car', help="delete a car")
+    command.add_argument('car_id', type=int)
+
+    command = commands.add_parser('list-cars', help="list cars")
+    command.add_argument('--make')
+    command.add_argument('--model')
+    command.add_argument('--available', choices=('yes', 'no'), help="only cars that are (not) available right now")
+
+    for name, help_text in (('approve', "approve rentals"), ('cancel', "cancel rentals"), ('complete', "complete rentals")):
+        command = commands.add_parser(name, help=help_text)
+        command.add_argument('rental_ids', type=int, nargs='+')
+        command.add_argument('--expected-version', type=int, help="fail if the rental changed since list-rentals showed this version (one rental ID only)")
+
+    command = commands.add_parser('search-cars', help="search cars by make/model prefix, ranked")
+    command.add_argument('text', nargs='?', help="make/model words or prefixes, e.g. 'toy cor'")
+    command.add_argument('--year-from', type=int)
+    command.add_argument('--year-to', type=int)
+    command.add_argument('--max-mileage', type=int)
+    command.add_argument('--start', help="only cars free from this date (YYYY-MM-DD, needs --end)")
+    command.add_argument('--end', help="only cars free until this date (YYYY-MM-DD, needs --start)")
+    command.add_argument('--limit', type=int, default=20)
+
+    command = commands.add_parser('list-rentals', help="list rentals")
+    command.add_argument('--status', action='append', choices=('on process', 'active', 'completed', 'cancelled', 'returned'),
+                         help="only rentals in this status (repeatable; default: every status except returned)")
+    command.add_argument('--user', type=int, help="only rentals of this user")
+
+    commands.add_parser('migrate', help="bring the schema up to date")
+
+    command = commands.add_parser('archive', help="move finished rentals into rentals_archive")
+    command.add_argument('--older-than-days', type=int, default=365, help="only rentals that ended more than this many days ago (default 365)")
+    command.add_argument('--batch-size', type=int, default=1000)
+
+    command = commands.add_parser('sweep', help="complete overdue rentals, cancel stale requests and refresh available_now")
+    command.add_argument('--interval', type=float, default=0, help="repeat every this many seconds (default: run once, e.g. from cron)")
+    command.add_argument('--stale-after-days', type=int, default=0, help="days after its start date before an unapproved request is cancelled")
+
+    command = commands.add_parser('import', help="import cars from a CSV or JSON Lines file")
+    command.add_argument('path')
+    command.add_argument('--batch-size', type=int, default=1000)
+    command = commands.add_parser('export', help="export every car to a CSV or JSON Lines file")
+    command.add_argument('path')
+
+    command = commands.add_parser('report', help="utilization and revenue reports, or rebuild their aggregates")
+    command.add_argument('kind', choices=('revenue', 'occupancy', 'utilization', 'top', 'rebuild'))
+    command.add_argument('--start', type=datetime.date.fromisoformat, help="first day (YYYY-MM-DD, default: first of this month; rebuild: the whole history)")
+    command.add_argument('--end', type=datetime.date.fromisoformat, help="last day (YYYY-MM-DD, default: today)")
+    return parser
+
+
+# Maintenance commands: archiving, the scheduler sweeps, fleet import/export and the reports (run_command reports database errors)
+def run_maintenance(args, pool):
+    if args.command == 'archive':
+        from rental_archive import archive_rentals
+        print(f"{archive_rentals(pool, args.older_than_days, args.batch_size)} rentals archived.")
+        return 0
+
+    if args.command == 'sweep':
+        from scheduler import RentalScheduler
+        scheduler = RentalScheduler(RentalManager(pool, CarManager(pool)), interval=args.interval or 300.0, stale_after_days=args.stale_after_days)
+        try:
+            while True:
+                run = scheduler.run_once()
+                print(f"{run['started_at']}: {run['overdue']} overdue rentals completed, {run['expired']} stale requests cancelled, "
+                      f"{run['cars_available']} cars now available, {run['cars_unavailable']} now out, {run['duration_ms']:.0f} ms"
+                      + (f", error: {run['error']}" if run['error'] else ""))
+                if not args.interval:
+                    return 0 if run['error'] is None else 1
+                time.sleep(args.interval)
+        except KeyboardInterrupt:
+            return 0
+
+    if args.command in ('import', 'export'):
+        import fleet_io
+        car_manager = CarManager(pool)
+        if args.command == 'export':
+            print(f"{fleet_io.export_cars(car_manager, args.path)} cars exported.")
+            return 0
+        report = fleet_io.import_cars(car_manager, args.path, args.batch_size, use_load_data=os.getenv('DB_ALLOW_LOCAL_INFILE') == '1')
+        print(report)
+        for line_no, error in report.errors:
+            print(f"  line {line_no}: {error}")
+        return 0 if not report.errors else 1
+
+    import reporting
+    today = datetime.date.today()
+    start, end = args.start or today.replace(day=1), args.end or today
+    with pool.connection() as conn:
+        if args.kind == 'rebuild':
+            # Without dates the whole history is rebuilt
+            count = reporting.refresh(conn, args.start, args.end)
+            print(f"{count} rentals aggregated.")
+        elif args.kind == 'revenue':
+            for day, revenue, cars, started in reporting.revenue_by_day(conn, start, end):
+                print(f"{day}  ${revenue:>10.2f}  {cars:>5} cars rented  {started:>4} new rentals")
+        elif args.kind == 'occupancy':
+            for day, cars, share in reporting.occupancy(conn, start, end):
+                print(f"{day}  {cars:>5} cars  {share:6.1%}")
+        elif args.kind == 'utilization':
+            for car_id, month, rented, days, share, revenue in reporting.utilization_by_car_month(conn, start, end):
+                print(f"car {car_id:>6}  {month}  {rented:>2}/{days:<2} days  {share:6.1%}  ${revenue:.2f}")
+        else:
+            for car_id, rented, revenue in reporting.top_cars(conn, start, end):
+                print(f"car {car_id:>6}  ${revenue:>10.2f}  {rented} days rented")
+    return 0
+
+
+# Run one command and return the process exit code
+def run_command(argv):
+    args = build_parser().parse_args(argv)
+
+    # Only migrate when the schema was never verified (or on request); connections are opened on first use
+    if not ensure_schema(force=args.verify_schema or args.command == 'migrate'):
+        print("Failed to initialize database.")
+        return 1
+    if args.command == 'migrate':
+        from migrations import LATEST_VERSION
+        print(f"Schema is at version {LATEST_VERSION}.")
+        return 0
+
+    pool = create_pool()
+    try:
+        try:
+            return run_with_pool(args, pool)
+        except DatabaseError as err:
+            if not missing_table(err):
+                print(f"Error: {err}")
+                return 1
+        # The schema marker is stale (e.g. the SQLite file was deleted or the database recreated): migrate and try once more
+        marker = schema_marker_path()
+        if marker and os.path.exists(marker):
+            os.remove(marker)
+        if not ensure_schema(force=True):
+            print("Failed to initialize database.")
+            return 1
+        try:
+            return run_with_pool(args, pool)
+        except DatabaseError as err:
+            print(f"Error: {err}")
+            return 1
+    finally:
+        pool.close()
+
+
+# A table the schema marker promised is not there (MySQL error 1146, or SQLite's message)
+def missing_table(err):
+    return err.errno == 1146 or 'no such table' in str(err).lower()
+
+
+# Run a command other than migrate
+def run_with_pool(args, pool):
+    if args.command in ('archive', 'sweep', 'import', 'export', 'report'):
+        return run_maintenance(args, pool)
+    if args.command in ('add-car', 'update-car', 'delete-car', 'list-cars'):
+        car_manager = CarManager(pool)
+        if args.command == 'list-cars':
+            available = None if args.available is None else args.available == 'yes'
+            for car in car_manager.iter_cars(make=args.make, model=args.model, available=available, page_size=1000):
+                print(car)
+            return 0
+        if args.command == 'delete-car':
+            return 0 if car_manager.delete_car(args.car_id) else 1
+        fields = (args.make, args.model, args.year, args.mileage, 1 if args.in_service == 'yes' else 0, args.min_days, args.max_days)
+        if args.command == 'add-car':
+            return 0 if car_manager.add_car(*fields) else 1
+        return 0 if car_manager.update_car(args.car_id, *fields) else 1
+
+    rental_manager = RentalManager(pool, CarManager(pool))
+    if args.command == 'search-cars':
+        year = (args.year_from, args.year_to) if args.year_from or args.year_to else None
+        mileage = (None, args.max_mileage) if args.max_mileage is not None else None
+        try:
+            cars = rental_manager.search_cars(args.text, args.start, args.end, limit=args.limit, year=year, mileage=mileage)
+        except ValueError as ve:
+            print(f"Error: {ve}")
+            return 1
+        for car in cars:
+            print(car)
+        return 0
+    if args.command == 'list-rentals':
+        for rental in rental_manager.iter_rentals(statuses=args.status or OPEN_STATUSES, user_id=args.user, page_size=1000):
+            print(format_rental(rental))
+        return 0
+
+    # approve / cancel / complete: one ID goes through the state machine, several through the batch path
+    target = {'approve': 'active', 'cancel': 'cancelled', 'complete': 'completed'}[args.command]
+    if len(args.rental_ids) == 1:
+        single = {'approve': rental_manager.approve_rental, 'cancel': rental_manager.cancel_rental, 'complete': rental_manager.complete_rental}
+        return 0 if single[args.command](args.rental_ids[0], args.expected_version) else 1
+    if args.expected_version is not None:
+        print("Error: --expected-version works with one rental ID only.")
+        return 2
+    batch = {'approve': rental_manager.approve_rentals, 'cancel': rental_manager.cancel_rentals, 'complete': rental_manager.complete_rentals}
+    outcomes = batch[args.command](args.rental_ids)
+    for rental_id, outcome in sorted(outcomes.items()):
+        print(f"{rental_id}: {outcome}")
+    return 0 if all(outcome == target for outcome in outcomes.values()) else 1
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        sys.exit(run_command(sys.argv[1:]))
+    run_interactive()
@@ -0,0 +1,299 @@
+import datetime
+
+
+# Migration 1 - the original users, cars and rentals tables
+def _create_base_tables(cursor, dialect):
+    if dialect == 'sqlite':
+        _create_base_tables_sqlite(cursor)
+        return
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INT AUTO_INCREMENT PRIMARY KEY,
+        name VARCHAR(255),
+        email VARCHAR(255) UNIQUE,
+        password VARCHAR(255),
+        role ENUM('admin', 'customer')
+    )""")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS cars (
+        car_id INT AUTO_INCREMENT PRIMARY KEY,
+        make VARCHAR(255),
+        model VARCHAR(255),
+        year YEAR,
+        mileage INT,
+        available_now BOOLEAN,
+        min_rent_period INT,
+        max_rent_period INT
+    )""")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS rentals (
+        rental_id INT AUTO_INCREMENT PRIMARY KEY,
+        car_id INT,
+        user_id INT,
+        start_date DATE,
+        end_date DATE,
+        total_fee DECIMAL(10, 2),
+        status ENUM('on process', 'active', 'completed', 'cancelled', 'returned'),
+        FOREIGN KEY (car_id) REFERENCES cars(car_id),
+        FOREIGN KEY (user_id) REFERENCES users(user_id)
+    )""")
+
+
+# The same tables for the embedded SQLite backend (ENUMs become CHECK constraints)
+def _create_base_tables_sqlite(cursor):
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS users (
+        user_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        name TEXT,
+        email TEXT UNIQUE,
+        password TEXT,
+        role TEXT CHECK (role IN ('admin', 'customer'))
+    )""")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS cars (
+        car_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        make TEXT,
+        model TEXT,
+        year INTEGER,
+        mileage INTEGER,
+        available_now INTEGER,
+        min_rent_period INTEGER,
+        max_rent_period INTEGER
+    )""")
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS rentals (
+        rental_id INTEGER PRIMARY KEY AUTOINCREMENT,
+        car_id INTEGER REFERENCES cars(car_id),
+        user_id INTEGER REFERENCES users(user_id),
+        start_date DATE,
+        end_date DATE,
+        total_fee REAL,
+        status TEXT CHECK (status IN ('on process', 'active', 'completed', 'cancelled', 'returned'))
+    )""")
+
+
+# Migration 2 - composite indexes for the hot queries
+def _add_hot_query_indexes(cursor, dialect):
+    # Overlap check when booking a car and the availability engine's startup load
+    _create_index(cursor, dialect, 'rentals', 'idx_rentals_car_status_dates', 'car_id, status, start_date, end_date')
+    # Rentals of one customer
+    _create_index(cursor, dialect, 'rentals', 'idx_rentals_user_status', 'user_id, status')
+    # Rental lists filtered by status
+    _create_index(cursor, dialect, 'rentals', 'idx_rentals_status_start', 'status, start_date')
+    # Cars that can be rented right now
+    _create_index(cursor, dialect, 'cars', 'idx_cars_available', 'available_now')
+
+
+# Migration 3 - version column for optimistic concurrency on rental status changes
+def _add_rental_version(cursor, dialect):
+    _add_column(cursor, dialect, 'rentals', 'version', 'INT NOT NULL DEFAULT 0')
+
+
+# Migration 4 - daily aggregate tables for the utilization and revenue reports, filled from the existing rentals
+def _create_report_tables(cursor, dialect):
+    from reporting import rebuild
+
+    integer = 'INTEGER' if dialect == 'sqlite' else 'BIGINT'
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS car_daily_usage (
+        day DATE NOT NULL,
+        car_id INT NOT NULL,
+        rentals INT NOT NULL DEFAULT 0,
+        revenue_cents {integer} NOT NULL DEFAULT 0,
+        PRIMARY KEY (day, car_id)
+    )""")
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS daily_totals (
+        day DATE NOT NULL PRIMARY KEY,
+        occupied_cars INT NOT NULL DEFAULT 0,
+        revenue_cents {integer} NOT NULL DEFAULT 0,
+        rentals_started INT NOT NULL DEFAULT 0
+    )""")
+    # History of one car
+    _create_index(cursor, dialect, 'car_daily_usage', 'idx_car_daily_usage_car_day', 'car_id, day')
+    rebuild(cursor, dialect, ('rentals',)) # Pinned: the only rentals table when this migration was released
+
+
+# Migration 5 - archive table for finished rentals, plus indexes for per-customer history and end-date sweeps
+def _add_rental_archive(cursor, dialect):
+    from rental_archive import create_archive_table
+
+    # A customer's rentals in rental_id order (the primary key is implicitly part of the index)
+    _create_index(cursor, dialect, 'rentals', 'idx_rentals_user', 'user_id')
+    # Finished or overdue rentals by end date (archiving and background sweeps)
+    _create_index(cursor, dialect, 'rentals', 'idx_rentals_status_end', 'status, end_date')
+
+    today = datetime.date.today()
+    cursor.execute("SELECT MIN(end_date) FROM rentals")
+    first = cursor.fetchone()[0] or today
+    if isinstance(first, str): # SQLite returns aggregates of DATE columns as text
+        first = datetime.date.fromisoformat(first)
+    create_archive_table(cursor, dialect, datetime.date(first.year, first.month, 1), datetime.date(today.year, today.month, 1))
+
+
+# Migration 6 - cars.in_service keeps the admin's "can be rented" flag, so that available_now can follow the bookings
+def _add_car_in_service(cursor, dialect):
+    from availability import AVAILABLE_NOW_SQL
+
+    _add_column(cursor, dialect, 'cars', 'in_service', 'INTEGER NOT NULL DEFAULT 1' if dialect == 'sqlite' else 'BOOLEAN NOT NULL DEFAULT 1')
+    cursor.execute("UPDATE cars SET in_service = COALESCE(available_now, 0)")
+    today = datetime.date.today()
+    cursor.execute(f"UPDATE cars SET available_now = {AVAILABLE_NOW_SQL}", (today, today))
+
+
+# Create an index unless a previous (interrupted) run already created it
+def _create_index(cursor, dialect, table, name, columns):
+    if dialect == 'sqlite':
+        cursor.execute(f"CREATE INDEX IF NOT EXISTS {name} ON {table} ({columns})")
+        return
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.statistics WHERE table_schema = DATABASE() AND table_name = %s AND index_name = %s",
+        (table, name)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"CREATE INDEX {name} ON {table} ({columns})")
+
+
+# Add a column unless a previous (interrupted) run already added it
+def _add_column(cursor, dialect, table, name, definition):
+    if dialect == 'sqlite':
+        cursor.execute(f"PRAGMA table_info({table})")
+        if name not in [column[1] for column in cursor.fetchall()]:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+        return
+    cursor.execute(
+        "SELECT COUNT(*) FROM information_schema.columns WHERE table_schema = DATABASE() AND table_name = %s AND column_name = %s",
+        (table, name)
+    )
+    if cursor.fetchone()[0] == 0:
+        cursor.execute(f"ALTER TABLE {table} ADD COLUMN {name} {definition}")
+
+
+# Every schema change in order. Never edit a released migration; append a new one instead.
+MIGRATIONS = [
+    (1, "Create users, cars and rentals tables", _create_base_tables),
+    (2, "Add composite indexes for hot queries", _add_hot_query_indexes),
+    (3, "Add rentals.version for optimistic concurrency", _add_rental_version),
+    (4, "Add daily aggregate tables for reporting", _create_report_tables),
+    (5, "Add rentals_archive and indexes for customer history", _add_rental_archive),
+    (6, "Add cars.in_service and derive available_now from bookings", _add_car_in_service),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+# Read the current schema version (0 for a brand-new database)
+def current_version(conn):
+    cursor = conn.cursor()
+    cursor.execute("""
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INT PRIMARY KEY,
+        description VARCHAR(255),
+        applied_at DATETIME
+    )""")
+    cursor.execute("SELECT MAX(version) FROM schema_version")
+    version = cursor.fetchone()[0]
+    return version or 0
+
+
+# Bring the database up to the latest schema version, upgrading existing databases in place
+def migrate(conn):
+    version = current_version(conn)
+    cursor = conn.cursor()
+    dialect = getattr(conn, 'dialect', 'mysql')
+
+    for number, description, apply in MIGRATIONS:
+        if number <= version:
+            continue
+        apply(cursor, dialect)
+        # DDL statements commit implicitly in MySQL, so every migration is written to be re-runnable
+        cursor.execute(
+            "INSERT INTO schema_version (version, description, applied_at) VALUES (%s, %s, %s)",
+            (number, description, datetime.datetime.now())
+        )
+        conn.commit()
+        print(f"Applied migration {number}: {description}")
+
+    return max(version, LATEST_VERSION)
+
+
+# The queries that run on every booking or listing, with the index (or indexes) each is expected to use
+HOT_QUERIES = {
+    'booking overlap check': (
+        "SELECT rental_id, start_date, end_date FROM rentals WHERE car_id = %s AND status IN ('on process', 'active') AND start_date <= %s AND end_date >= %s",
+        (1, datetime.date.today(), datetime.date.today()),
+        'idx_rentals_car_status_dates'
+    ),
+    'availability load': (
+        "SELECT rental_id, car_id, start_date, end_date FROM rentals WHERE status IN ('on process', 'active')",
+        (),
+        ('idx_rentals_status_start', 'idx_rentals_status_end') # Any index led by status will do
+    ),
+    'customer rentals': (
+        "SELECT rental_id FROM rentals WHERE user_id = %s AND status = 'active'",
+        (1,),
+        'idx_rentals_user_status'
+    ),
+    'customer rental history': (
+        "SELECT rental_id FROM rentals WHERE user_id = %s AND rental_id > %s ORDER BY rental_id LIMIT 20",
+        (1, 0),
+        'idx_rentals_user'
+    ),
+    'overdue rental sweep': (
+        "SELECT rental_id FROM rentals WHERE status = 'active' AND end_date < %s ORDER BY end_date LIMIT 500",
+        (datetime.date.today(),),
+        'idx_rentals_status_end'
+    ),
+    'stale request sweep': (
+        "SELECT rental_id FROM rentals WHERE status = 'on process' AND start_date < %s ORDER BY start_date LIMIT 500",
+        (datetime.date.today(),),
+        'idx_rentals_status_start'
+    ),
+    'available cars': (
+        "SELECT car_id FROM cars WHERE available_now = 1",
+        (),
+        'idx_cars_available'
+    ),
+}
+
+
+# Run EXPLAIN on every hot query and report the index the database picked
+def explain_hot_queries(conn):
+    cursor = conn.cursor()
+    report = []
+    for name, (sql, params, expected) in HOT_QUERIES.items():
+        acceptable = expected if isinstance(expected, tuple) else (expected,)
+        if getattr(conn, 'dialect', 'mysql') == 'sqlite':
+            # SQLite describes the plan in text, e.g. "SEARCH rentals USING INDEX idx_... (car_id=?)"
+            cursor.execute("EXPLAIN QUERY PLAN " + sql, params)
+            details = " ".join(row[-1] for row in cursor.fetchall())
+            used = next((index for index in acceptable if f"INDEX {index} " in details + " "), details)
+            possible = None
+        else:
+            cursor.execute("EXPLAIN " + sql, params)
+            columns = [column[0] for column in cursor.description]
+            rows = cursor.fetchall()
+            used = rows[0][columns.index('key')] if rows else None
+            possible = rows[0][columns.index('possible_keys')] if rows else None
+        report.append({
+            'query': name,
+            'expected': expected,
+            'used': used,
+            'possible_keys': possible,
+            'ok': used in acceptable,
+        })
+    return report
+
+
+# Stand-alone use: python migrations.py migrates the database and prints the EXPLAIN report
+if __name__ == "__main__":
+    from main import create_connection
+
+    conn = create_connection() # Connects and migrates
+    if conn is None:
+        raise SystemExit(1)
+    print(f"Schema version: {current_version(conn)}")
+    for row in explain_hot_queries(conn):
+        status = "OK" if row['ok'] else "NOT USING INDEX"
+        print(f"{row['query']}: expected {row['expected']}, used {row['used']} (possible: {row['possible_keys']}) - {status}")
+    conn.close()
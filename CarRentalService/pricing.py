@@ -0,0 +1,126 @@
+import datetime
+import json
+
+
+# Raised when a car cannot be rented for the requested period
+class PricingError(ValueError):
+    pass
+
+
+# Pricing engine class - computes rental fees from precomputed rate tables
+class PricingEngine:
+    """
+    fee = base rate x (sum of the daily multipliers over the rental days) x (1 - duration discount)
+
+    The base rate comes from a per-car rate, else a per-class rate (the class is the car's make),
+    else the default rate. Daily multipliers combine seasonal and weekend multipliers and are
+    kept as a prefix-sum table, so the multiplier sum of any period is one subtraction and a
+    whole catalog can be quoted for the same dates in a single pass.
+    """
+
+    def __init__(self, default_rate=50.0, class_rates=None, car_rates=None, seasons=None,
+                 weekend_multiplier=1.0, duration_discounts=None, origin=None, horizon_days=1095):
+        self.default_rate = float(default_rate)
+        self.class_rates = {make.lower(): float(rate) for make, rate in (class_rates or {}).items()}
+        self.car_rates = {int(car_id): float(rate) for car_id, rate in (car_rates or {}).items()}
+        self.seasons = [(start, end, float(multiplier)) for start, end, multiplier in (seasons or [])] # ('MM-DD', 'MM-DD', multiplier)
+        self.weekend_multiplier = float(weekend_multiplier)
+        # (minimum days, discount) pairs, the largest applicable discount wins
+        self.duration_discounts = sorted((int(days), float(discount)) for days, discount in (duration_discounts or []))
+
+        self._table = None # (catalog, rate table) of the last quoted catalog
+
+        # Prefix sums of the daily multipliers: _prefix[i] = sum of the multipliers of the first i days after origin
+        self.origin = origin or (datetime.date.today() - datetime.timedelta(days=365))
+        self._prefix = [0.0]
+        for offset in range(horizon_days):
+            self._prefix.append(self._prefix[-1] + self.day_multiplier(self.origin + datetime.timedelta(days=offset)))
+
+    # Build an engine from a JSON file with the same keys as the constructor arguments
+    @classmethod
+    def from_file(cls, path, **overrides):
+        with open(path, encoding='utf-8') as file:
+            config = json.load(file)
+        config.update(overrides)
+        return cls(**config)
+
+    # Seasonal multiplier x weekend multiplier for one day
+    def day_multiplier(self, day):
+        multiplier = self.weekend_multiplier if day.weekday() >= 5 else 1.0
+        month_day = day.strftime('%m-%d')
+        for start, end, season_multiplier in self.seasons:
+            # A season may wrap around the new year (e.g. 12-15 to 01-05)
+            in_season = start <= month_day <= end if start <= end else (month_day >= start or month_day <= end)
+            if in_season:
+                multiplier *= season_multiplier
+                break
+        return multiplier
+
+    # Sum of the daily multipliers from start_date to end_date (both included)
+    def multiplier_sum(self, start_date, end_date):
+        first = (start_date - self.origin).days
+        last = (end_date - self.origin).days
+        if first >= 0 and last + 1 < len(self._prefix):
+            return self._prefix[last + 1] - self._prefix[first]
+        # Outside the precomputed horizon: add the days up one by one
+        return sum(self.day_multiplier(start_date + datetime.timedelta(days=offset)) for offset in range(last - first + 1))
+
+    def discount(self, days):
+        best = 0.0
+        for min_days, discount in self.duration_discounts:
+            if days >= min_days:
+                best = discount
+        return best
+
+    # Daily base rate of a car row (car_id, make, ...)
+    def base_rate(self, car):
+        rate = self.car_rates.get(car[0])
+        if rate is None:
+            rate = self.class_rates.get(str(car[1]).lower(), self.default_rate)
+        return rate
+
+    # Raise PricingError if the period breaks the car's min/max rental period
+    def check_period(self, car, days):
+        min_rent_period, max_rent_period = car[6], car[7]
+        if min_rent_period and days < int(min_rent_period):
+            raise PricingError(f"This car must be rented for at least {min_rent_period} days.")
+        if max_rent_period and days > int(max_rent_period):
+            raise PricingError(f"This car can be rented for at most {max_rent_period} days.")
+
+    # Total fee for renting one car (a row in CAR_COLUMNS order) from start_date to end_date
+    def quote(self, car, start_date, end_date):
+        days = (end_date - start_date).days + 1
+        if days < 1:
+            raise PricingError("End date must not be before start date.")
+        self.check_period(car, days)
+        return round(self.base_rate(car) * self.multiplier_sum(start_date, end_date) * (1 - self.discount(days)), 2)
+
+    # Base rate and rental limits of every car as parallel lists.
+    # The table of the last catalog is kept, so quoting the same cached catalog again skips this step.
+    def rate_table(self, cars):
+        if self._table is not None and self._table[0] is cars:
+            return self._table[1]
+        rates, min_periods, max_periods = [], [], []
+        for car in cars:
+            rates.append(self.base_rate(car))
+            min_periods.append(int(car[6]) if car[6] else 0)
+            max_periods.append(int(car[7]) if car[7] else float('inf'))
+        table = (rates, min_periods, max_periods)
+        self._table = (cars, table)
+        return table
+
+    # Quote every car for the same period in one pass; cars whose rental limits exclude the period are skipped.
+    # Returns a list of (car, fee).
+    def quote_catalog(self, cars, start_date, end_date):
+        days = (end_date - start_date).days + 1
+        if days < 1:
+            raise PricingError("End date must not be before start date.")
+        # Everything that depends only on the dates is computed once for the whole catalog
+        factor = self.multiplier_sum(start_date, end_date) * (1 - self.discount(days))
+
+        rates, min_periods, max_periods = self.rate_table(cars)
+        return [
+            (car, round(rate * factor, 2))
+            for car, rate, min_period, max_period in zip(cars, rates, min_periods, max_periods)
+            if min_period <= days <= max_period
+        ]
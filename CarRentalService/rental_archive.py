@@ -0,0 +1,127 @@
+import datetime
+
+
+# Final statuses; rentals in these statuses never change again and can leave the hot table.
+# 'returned' is not final (an admin still completes the rental), so returned rentals stay until then.
+ARCHIVE_STATUSES = ('completed', 'cancelled')
+
+# Columns copied from rentals into rentals_archive
+ARCHIVE_COLUMNS = ('rental_id', 'car_id', 'user_id', 'start_date', 'end_date', 'total_fee', 'status', 'version')
+
+
+def _month_start(day, months_ahead=0):
+    month = day.month - 1 + months_ahead
+    return datetime.date(day.year + month // 12, month % 12 + 1, 1)
+
+
+# Partition holding the month of `day`, e.g. p202405 for May 2024 (rows with end_date < 2024-06-01)
+def _partition(day):
+    return f"p{day.year:04d}{day.month:02d}", _month_start(day, 1)
+
+
+# Create the archive table. On MySQL it is partitioned by month of end_date: the partition key has to
+# be part of every unique key (so the primary key is (rental_id, end_date)) and partitioned tables
+# cannot have foreign keys. SQLite has no partitioning, so there it is a plain table.
+def create_archive_table(cursor, dialect, first_month, last_month):
+    if dialect == 'sqlite':
+        cursor.execute("""
+        CREATE TABLE IF NOT EXISTS rentals_archive (
+            rental_id INTEGER PRIMARY KEY,
+            car_id INTEGER,
+            user_id INTEGER,
+            start_date DATE,
+            end_date DATE NOT NULL,
+            total_fee REAL,
+            status TEXT,
+            version INTEGER NOT NULL DEFAULT 0,
+            archived_at DATETIME
+        )""")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_rentals_archive_user ON rentals_archive (user_id)")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_rentals_archive_end ON rentals_archive (end_date)")
+        return
+
+    # One partition per month from first_month to last_month, one for anything older and one for anything newer
+    partitions = [f"PARTITION p_before VALUES LESS THAN ('{first_month.isoformat()}')"]
+    month = first_month
+    while month <= last_month:
+        name, bound = _partition(month)
+        partitions.append(f"PARTITION {name} VALUES LESS THAN ('{bound.isoformat()}')")
+        month = bound
+    partitions.append("PARTITION p_future VALUES LESS THAN (MAXVALUE)")
+
+    cursor.execute(f"""
+    CREATE TABLE IF NOT EXISTS rentals_archive (
+        rental_id INT NOT NULL,
+        car_id INT,
+        user_id INT,
+        start_date DATE,
+        end_date DATE NOT NULL,
+        total_fee DECIMAL(10, 2),
+        status ENUM('on process', 'active', 'completed', 'cancelled', 'returned'),
+        version INT NOT NULL DEFAULT 0,
+        archived_at DATETIME,
+        PRIMARY KEY (rental_id, end_date),
+        KEY idx_rentals_archive_user (user_id),
+        KEY idx_rentals_archive_car (car_id)
+    )
+    PARTITION BY RANGE COLUMNS (end_date) ({", ".join(partitions)})""")
+
+
+# Split monthly partitions off p_future up to and including the month of `last_day` (MySQL only)
+def ensure_partitions(cursor, dialect, last_day):
+    if dialect == 'sqlite':
+        return
+    cursor.execute(
+        "SELECT partition_name FROM information_schema.partitions WHERE table_schema = DATABASE() AND table_name = 'rentals_archive'"
+    )
+    existing = {row[0] for row in cursor.fetchall()}
+    monthly = sorted(name for name in existing if name and name[1:].isdigit())
+    if not monthly:
+        return
+    newest = monthly[-1]
+    month = _month_start(datetime.date(int(newest[1:5]), int(newest[5:7]), 1), 1)
+
+    new = []
+    while month <= last_day:
+        name, bound = _partition(month)
+        new.append(f"PARTITION {name} VALUES LESS THAN ('{bound.isoformat()}')")
+        month = bound
+    if new:
+        cursor.execute(
+            "ALTER TABLE rentals_archive REORGANIZE PARTITION p_future INTO ("
+            + ", ".join(new) + ", PARTITION p_future VALUES LESS THAN (MAXVALUE))"
+        )
+
+
+# Move finished rentals that ended more than `older_than_days` ago from rentals into rentals_archive.
+# Each batch is copied and deleted in one transaction; returns the number of rentals moved.
+def archive_rentals(pool, older_than_days=365, batch_size=1000):
+    cutoff = datetime.date.today() - datetime.timedelta(days=older_than_days)
+    statuses = ", ".join(["%s"] * len(ARCHIVE_STATUSES))
+    columns = ", ".join(ARCHIVE_COLUMNS)
+
+    with pool.transaction() as conn:
+        ensure_partitions(conn.cursor(), conn.dialect, cutoff)
+
+    moved = 0
+    while True:
+        with pool.transaction() as conn:
+            cursor = conn.cursor()
+            # The (status, end_date) index finds the batch; FOR UPDATE keeps it from changing while it moves
+            cursor.execute(
+                f"SELECT rental_id FROM rentals WHERE status IN ({statuses}) AND end_date < %s ORDER BY rental_id LIMIT {int(batch_size)} FOR UPDATE",
+                (*ARCHIVE_STATUSES, cutoff)
+            )
+            ids = [row[0] for row in cursor.fetchall()]
+            if not ids:
+                break
+            placeholders = ", ".join(["%s"] * len(ids))
+            cursor.execute(
+                f"INSERT INTO rentals_archive ({columns}, archived_at) SELECT {columns}, %s FROM rentals WHERE rental_id IN ({placeholders})",
+                (datetime.datetime.now().replace(microsecond=0), *ids)
+            )
+            cursor.execute(f"DELETE FROM rentals WHERE rental_id IN ({placeholders})", ids)
+        moved += len(ids)
+        if len(ids) < batch_size:
+            break
+    return moved
@@ -0,0 +1,65 @@
+# Legal moves between rental statuses
+#   on process -> active (approved) or cancelled
+#   active     -> returned (customer brings the car back) or completed (admin ends the rental)
+#   returned   -> completed
+#   completed and cancelled are final
+TRANSITIONS = {
+    'on process': ('active', 'cancelled'),
+    'active': ('returned', 'completed'),
+    'returned': ('completed',),
+    'completed': (),
+    'cancelled': (),
+}
+
+
+# Raised when the rental does not exist
+class RentalNotFoundError(ValueError):
+    pass
+
+
+# Raised when the rental's current status does not allow the requested move
+class InvalidTransitionError(ValueError):
+    pass
+
+
+# Raised when another writer changed the rental between our read and our update
+class ConcurrentUpdateError(ValueError):
+    pass
+
+
+# Statuses from which a rental may move to `target`
+def allowed_sources(target):
+    return tuple(status for status, targets in TRANSITIONS.items() if target in targets)
+
+
+def check_transition(rental_id, current, target):
+    if target not in TRANSITIONS.get(current, ()):
+        raise InvalidTransitionError(f"Rental {rental_id} cannot move from '{current}' to '{target}'")
+
+
+# Move one rental to `target` using optimistic concurrency and return its new version.
+# The UPDATE only matches if status and version are still what we read, so conflicting
+# writers fail fast with ConcurrentUpdateError instead of waiting on locks or overwriting each other.
+# `before_commit(conn, rental_id, current, target)` runs inside the same transaction, after the UPDATE.
+# With `user_id`, a rental of another user is treated as not found (customers only act on their own rentals).
+def transition(conn, rental_id, target, expected_version=None, before_commit=None, user_id=None):
+    rows = conn.execute_prepared("SELECT status, version, user_id FROM rentals WHERE rental_id = %s", (rental_id,)).fetchall()
+    if not rows or (user_id is not None and rows[0][2] != user_id):
+        raise RentalNotFoundError(f"Rental {rental_id} not found")
+
+    current, version, _ = rows[0]
+    if expected_version is not None and version != expected_version:
+        raise ConcurrentUpdateError(f"Rental {rental_id} was changed by someone else, please reload it and try again")
+    check_transition(rental_id, current, target)
+
+    cursor = conn.execute_prepared(
+        "UPDATE rentals SET status = %s, version = version + 1 WHERE rental_id = %s AND status = %s AND version = %s",
+        (target, rental_id, current, version)
+    )
+    if cursor.rowcount == 0:
+        conn.rollback()
+        raise ConcurrentUpdateError(f"Rental {rental_id} was changed by someone else, please reload it and try again")
+    if before_commit is not None:
+        before_commit(conn, rental_id, current, target)
+    conn.commit()
+    return version + 1
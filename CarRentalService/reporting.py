@@ -0,0 +1,241 @@
+import calendar
+import datetime
+from collections import defaultdict
+
+
+# Rentals that occupy the car and earn revenue; 'on process' and 'cancelled' rentals do not count
+COUNTED_STATUSES = ('active', 'returned', 'completed')
+
+BACKFILL_BATCH = 5000 # Rentals expanded per backfill step
+SOURCE_TABLES = ('rentals', 'rentals_archive') # Where rebuild() finds rentals; finished ones are moved to the archive
+
+_numpy = None # The numpy module once imported, False if it is not installed
+
+
+# NumPy is optional (vectorized interval expansion for backfills) and only imported when first needed
+def _load_numpy():
+    global _numpy
+    if _numpy is None:
+        try:
+            import numpy
+            _numpy = numpy
+        except ImportError:
+            _numpy = False
+    return _numpy
+
+
+# +1 if a status change starts counting a rental, -1 if it stops, 0 otherwise
+def _sign(old_status, new_status):
+    return (new_status in COUNTED_STATUSES) - (old_status in COUNTED_STATUSES)
+
+
+# Split a fee into whole cents per day so that the days add up to the fee exactly
+def _daily_cents(total_fee, days):
+    base, remainder = divmod(int(round(float(total_fee) * 100)), days)
+    return base, remainder
+
+
+# Expand rentals (car_id, start_date, end_date, total_fee) into per-day contributions, clipped to the window.
+# Returns ({(day, car_id): [rentals, revenue_cents]}, {day: [cars, revenue_cents, started]}).
+def _expand(rentals, sign=1, window_start=None, window_end=None):
+    if len(rentals) > 64 and _load_numpy():
+        return _expand_vectorized(_numpy, rentals, sign, window_start, window_end)
+
+    per_car = defaultdict(lambda: [0, 0])
+    per_day = defaultdict(lambda: [0, 0, 0])
+    for car_id, start_date, end_date, total_fee in rentals:
+        days = (end_date - start_date).days + 1
+        base, remainder = _daily_cents(total_fee, days)
+        first = max(start_date, window_start) if window_start else start_date
+        last = min(end_date, window_end) if window_end else end_date
+        for offset in range((first - start_date).days, (last - start_date).days + 1):
+            day = start_date + datetime.timedelta(days=offset)
+            cents = base + (offset < remainder)
+            entry = per_car[(day, car_id)]
+            entry[0] += sign
+            entry[1] += sign * cents
+            totals = per_day[day]
+            totals[0] += sign
+            totals[1] += sign * cents
+            totals[2] += sign if offset == 0 else 0
+    return per_car, per_day
+
+
+# The same expansion as whole-array operations: one row per rental day, then grouped by (day, car)
+def _expand_vectorized(np, rentals, sign, window_start, window_end):
+    car_ids = np.fromiter((rental[0] for rental in rentals), dtype=np.int64, count=len(rentals))
+    starts = np.fromiter((rental[1].toordinal() for rental in rentals), dtype=np.int64, count=len(rentals))
+    ends = np.fromiter((rental[2].toordinal() for rental in rentals), dtype=np.int64, count=len(rentals))
+    cents = np.fromiter((int(round(float(rental[3]) * 100)) for rental in rentals), dtype=np.int64, count=len(rentals))
+
+    lengths = ends - starts + 1
+    base, remainder = np.divmod(cents, lengths)
+    first = np.maximum(starts, window_start.toordinal()) if window_start else starts
+    last = np.minimum(ends, window_end.toordinal()) if window_end else ends
+    counts = np.maximum(last - first + 1, 0)
+
+    # Row i of the expansion belongs to rental index[i] and is `offset[i]` days after that rental's start
+    index = np.repeat(np.arange(len(rentals)), counts)
+    offset = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts) + (first - starts)[index]
+    day = starts[index] + offset
+    day_cents = base[index] + (offset < remainder[index])
+    started = offset == 0
+
+    # Group by (day, car) and by day
+    keys, inverse = np.unique(np.stack([day, car_ids[index]], axis=1), axis=0, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    car_rentals = np.bincount(inverse, minlength=len(keys))
+    car_cents = np.bincount(inverse, weights=day_cents, minlength=len(keys))
+    per_car = {
+        (datetime.date.fromordinal(int(d)), int(c)): [sign * int(n), sign * int(round(r))]
+        for (d, c), n, r in zip(keys, car_rentals, car_cents)
+    }
+
+    days, day_inverse = np.unique(day, return_inverse=True)
+    day_inverse = day_inverse.reshape(-1)
+    day_cars = np.bincount(day_inverse, minlength=len(days))
+    day_revenue = np.bincount(day_inverse, weights=day_cents, minlength=len(days))
+    day_started = np.bincount(day_inverse, weights=started, minlength=len(days))
+    per_day = {
+        datetime.date.fromordinal(int(d)): [sign * int(n), sign * int(round(r)), sign * int(round(s))]
+        for d, n, r, s in zip(days, day_cars, day_revenue, day_started)
+    }
+    return per_car, per_day
+
+
+# Add per-day contributions to the aggregate tables (negative values subtract)
+def _upsert(cursor, dialect, per_car, per_day):
+    if dialect == 'sqlite':
+        car_sql = ("INSERT INTO car_daily_usage (day, car_id, rentals, revenue_cents) VALUES (%s, %s, %s, %s) "
+                   "ON CONFLICT (day, car_id) DO UPDATE SET rentals = rentals + excluded.rentals, revenue_cents = revenue_cents + excluded.revenue_cents")
+        day_sql = ("INSERT INTO daily_totals (day, occupied_cars, revenue_cents, rentals_started) VALUES (%s, %s, %s, %s) "
+                   "ON CONFLICT (day) DO UPDATE SET occupied_cars = occupied_cars + excluded.occupied_cars, "
+                   "revenue_cents = revenue_cents + excluded.revenue_cents, rentals_started = rentals_started + excluded.rentals_started")
+    else:
+        car_sql = ("INSERT INTO car_daily_usage (day, car_id, rentals, revenue_cents) VALUES (%s, %s, %s, %s) "
+                   "ON DUPLICATE KEY UPDATE rentals = rentals + VALUES(rentals), revenue_cents = revenue_cents + VALUES(revenue_cents)")
+        day_sql = ("INSERT INTO daily_totals (day, occupied_cars, revenue_cents, rentals_started) VALUES (%s, %s, %s, %s) "
+                   "ON DUPLICATE KEY UPDATE occupied_cars = occupied_cars + VALUES(occupied_cars), "
+                   "revenue_cents = revenue_cents + VALUES(revenue_cents), rentals_started = rentals_started + VALUES(rentals_started)")
+
+    # Sorted by key so that concurrent refreshes lock the rows in the same order
+    if per_car:
+        cursor.executemany(car_sql, [(day, car_id, rentals, revenue) for (day, car_id), (rentals, revenue) in sorted(per_car.items())])
+    if per_day:
+        cursor.executemany(day_sql, [(day, cars, revenue, started) for day, (cars, revenue, started) in sorted(per_day.items())])
+
+
+# Update the aggregates for rentals that moved from old_status to new_status.
+# Runs on the caller's connection before it commits, so the status change and the aggregates commit together.
+def apply_transition(conn, rental_ids, old_status, new_status):
+    sign = _sign(old_status, new_status)
+    if sign == 0 or not rental_ids:
+        return
+    cursor = conn.cursor()
+    placeholders = ", ".join(["%s"] * len(rental_ids))
+    cursor.execute(f"SELECT car_id, start_date, end_date, total_fee FROM rentals WHERE rental_id IN ({placeholders})", list(rental_ids))
+    per_car, per_day = _expand(cursor.fetchall(), sign)
+    _upsert(cursor, conn.dialect, per_car, per_day)
+
+
+# Recompute the aggregates from the given rentals tables (batch job), for every day or only for [start, end].
+# The tables have no default: a migration names the tables that existed when it was released.
+def rebuild(cursor, dialect, tables, start=None, end=None):
+    conditions, params = ["status IN (" + ", ".join(["%s"] * len(COUNTED_STATUSES)) + ")"], list(COUNTED_STATUSES)
+    window = []
+    if start:
+        conditions.append("end_date >= %s")
+        params.append(start)
+        window.append(("day >= %s", start))
+    if end:
+        conditions.append("start_date <= %s")
+        params.append(end)
+        window.append(("day <= %s", end))
+    where = " AND ".join(clause for clause, _ in window) or "1 = 1"
+    cursor.execute(f"DELETE FROM car_daily_usage WHERE {where}", [value for _, value in window])
+    cursor.execute(f"DELETE FROM daily_totals WHERE {where}", [value for _, value in window])
+
+    # Page through each table by primary key and expand each page in one go
+    count = 0
+    for table in tables:
+        after = 0
+        while True:
+            cursor.execute(
+                f"SELECT rental_id, car_id, start_date, end_date, total_fee FROM {table} WHERE rental_id > %s AND {' AND '.join(conditions)} "
+                f"ORDER BY rental_id LIMIT {BACKFILL_BATCH}",
+                [after] + params
+            )
+            rows = cursor.fetchall()
+            if not rows:
+                break
+            after = rows[-1][0]
+            count += len(rows)
+            per_car, per_day = _expand([row[1:] for row in rows], 1, start, end)
+            _upsert(cursor, dialect, per_car, per_day)
+    return count
+
+
+# Rebuild the aggregates on a connection and commit
+def refresh(conn, start=None, end=None):
+    count = rebuild(conn.cursor(), conn.dialect, SOURCE_TABLES, start, end)
+    conn.commit()
+    return count
+
+
+# Revenue, occupied cars and new rentals per day in [start, end]
+def revenue_by_day(conn, start, end):
+    cursor = conn.cursor()
+    cursor.execute(
+        "SELECT day, occupied_cars, revenue_cents, rentals_started FROM daily_totals WHERE day BETWEEN %s AND %s ORDER BY day",
+        (start, end)
+    )
+    return [(day, cents / 100, cars, started) for day, cars, cents, started in cursor.fetchall()]
+
+
+# Share of the fleet that was rented on each day in [start, end] (days without rentals included)
+def occupancy(conn, start, end):
+    cursor = conn.cursor()
+    cursor.execute("SELECT COUNT(*) FROM cars")
+    fleet = cursor.fetchone()[0]
+    occupied = {day: cars for day, _, cars, _ in revenue_by_day(conn, start, end)}
+    result = []
+    day = start
+    while day <= end:
+        cars = occupied.get(day, 0)
+        result.append((day, cars, cars / fleet if fleet else 0.0))
+        day += datetime.timedelta(days=1)
+    return result
+
+
+# Rented days and utilization per car per month for the months touching [start, end]
+def utilization_by_car_month(conn, start, end, car_id=None):
+    cursor = conn.cursor()
+    sql = ("SELECT car_id, SUBSTR(day, 1, 7), SUM(CASE WHEN rentals > 0 THEN 1 ELSE 0 END), SUM(revenue_cents) "
+           "FROM car_daily_usage WHERE day BETWEEN %s AND %s")
+    params = [start, end]
+    if car_id is not None:
+        sql += " AND car_id = %s"
+        params.append(car_id)
+    cursor.execute(sql + " GROUP BY car_id, SUBSTR(day, 1, 7) ORDER BY car_id, SUBSTR(day, 1, 7)", params)
+
+    result = []
+    for car, month, rented_days, cents in cursor.fetchall():
+        year, month_number = int(month[:4]), int(month[5:7])
+        # Only the part of the month inside the window counts towards the denominator
+        first = max(start, datetime.date(year, month_number, 1))
+        last = min(end, datetime.date(year, month_number, calendar.monthrange(year, month_number)[1]))
+        days = (last - first).days + 1
+        result.append((car, month, int(rented_days), days, int(rented_days) / days, int(cents) / 100))
+    return result
+
+
+# The cars with the most revenue (or rented days) in [start, end]
+def top_cars(conn, start, end, limit=10, by='revenue'):
+    order = "SUM(revenue_cents)" if by == 'revenue' else "SUM(CASE WHEN rentals > 0 THEN 1 ELSE 0 END)"
+    cursor = conn.cursor()
+    cursor.execute(
+        f"SELECT car_id, SUM(CASE WHEN rentals > 0 THEN 1 ELSE 0 END), SUM(revenue_cents) FROM car_daily_usage "
+        f"WHERE day BETWEEN %s AND %s GROUP BY car_id ORDER BY {order} DESC, car_id LIMIT {int(limit)}",
+        (start, end)
+    )
+    return [(car, int(days), int(cents) / 100) for car, days, cents in cursor.fetchall()]
@@ -0,0 +1,155 @@
+import collections
+import datetime
+import threading
+import time
+
+import reporting
+from availability import AVAILABLE_NOW_SQL
+from connection_pool import PoolTimeoutError
+from rental_states import check_transition
+from storage import DatabaseError
+
+
+# Time-driven transitions: (name, source status, target status, date column, index the sweep walks)
+#   overdue  - active rentals whose end date has passed are completed
+#   expired  - requests still 'on process' when their start date has passed are cancelled
+SWEEPS = (
+    ('overdue', 'active', 'completed', 'end_date'), # idx_rentals_status_end
+    ('expired', 'on process', 'cancelled', 'start_date'), # idx_rentals_status_start
+)
+
+
+# Rental scheduler class - moves rentals forward in time and keeps cars.available_now in step with the bookings
+class RentalScheduler:
+    """
+    Background sweeper running on a daemon thread every `interval` seconds.
+    Every sweep works in batches of at most `batch_size` rows, each in its own short transaction,
+    and walks an index range (status, date), so no statement scans or locks a whole table.
+    Status changes go through the same rules, report aggregates and availability engine as the managers.
+    """
+
+    def __init__(self, rental_manager, interval: float = 300.0, batch_size: int = 500, stale_after_days: int = 0, history: int = 20):
+        self.rentals = rental_manager # Pool, car cache and availability engine are reached through the manager
+        self.pool = rental_manager.pool
+        self.interval = interval # Seconds between runs
+        self.batch_size = batch_size # Rows per transaction
+        self.stale_after_days = stale_after_days # Days after its start date before an unapproved request is cancelled
+
+        self._thread = None
+        self._stop = threading.Event()
+        self._run_lock = threading.Lock() # One run at a time, also for run_once() called next to the thread
+        self._lock = threading.Lock() # Guards the metrics below
+        self._history = collections.deque(maxlen=history) # Metrics of the most recent runs, oldest first
+        self._totals = collections.Counter()
+
+        for _, source, target, _ in SWEEPS:
+            check_transition(None, source, target) # The sweeps must be legal moves of the state machine
+
+    # Run every sweep once and return the metrics of this run
+    def run_once(self, today=None):
+        today = today or datetime.date.today()
+        run = {'started_at': datetime.datetime.now().replace(microsecond=0).isoformat(), 'today': today.isoformat(),
+               'batches': 0, 'overdue': 0, 'expired': 0, 'cars_available': 0, 'cars_unavailable': 0, 'error': None}
+        started = time.perf_counter()
+        with self._run_lock:
+            try:
+                for name, source, target, column in SWEEPS:
+                    cutoff = today if name == 'overdue' else today - datetime.timedelta(days=self.stale_after_days)
+                    run[name] = self._sweep_rentals(source, target, column, cutoff, run)
+                self._sweep_cars(today, run)
+            except (DatabaseError, PoolTimeoutError) as err: # Keep what was done so far; the next run continues
+                run['error'] = str(err)
+            run['duration_ms'] = round((time.perf_counter() - started) * 1000, 3)
+        with self._lock:
+            self._history.append(run)
+            self._totals.update({key: run[key] for key in ('batches', 'overdue', 'expired', 'cars_available', 'cars_unavailable')})
+            self._totals['runs'] += 1
+            self._totals['errors'] += run['error'] is not None
+        return run
+
+    # Move rentals in `source` status whose `column` date is before `cutoff` to `target`, a batch at a time
+    def _sweep_rentals(self, source, target, column, cutoff, run):
+        moved = 0
+        while True:
+            with self.pool.transaction() as conn:
+                # The (status, date) index gives the oldest rows first; FOR UPDATE locks only this batch
+                rows = conn.execute_prepared(
+                    f"SELECT rental_id FROM rentals WHERE status = %s AND {column} < %s ORDER BY {column} LIMIT {int(self.batch_size)} FOR UPDATE",
+                    (source, cutoff)
+                ).fetchall()
+                ids = [row[0] for row in rows]
+                if ids:
+                    placeholders = ", ".join(["%s"] * len(ids))
+                    cursor = conn.cursor()
+                    cursor.execute(
+                        f"UPDATE rentals SET status = %s, version = version + 1 WHERE rental_id IN ({placeholders}) AND status = %s",
+                        (target, *ids, source)
+                    )
+                    reporting.apply_transition(conn, ids, source, target)
+            if not ids:
+                return moved
+            run['batches'] += 1
+            moved += len(ids)
+            for rental_id in ids:
+                self.rentals._release_dates(rental_id)
+            if len(ids) < self.batch_size:
+                return moved
+
+    # Recompute cars.available_now from the active rentals, a range of car IDs at a time
+    def _sweep_cars(self, today, run):
+        last_id = 0
+        while True:
+            with self.pool.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    f"SELECT car_id, available_now, {AVAILABLE_NOW_SQL} FROM cars WHERE car_id > %s ORDER BY car_id LIMIT {int(self.batch_size)}",
+                    (today, today, last_id)
+                )
+                rows = cursor.fetchall()
+                changed = [car_id for car_id, current, wanted in rows if current != wanted]
+                if changed:
+                    # Only the cars whose flag is wrong are written; the value is computed again under the row lock
+                    placeholders = ", ".join(["%s"] * len(changed))
+                    cursor.execute(f"UPDATE cars SET available_now = {AVAILABLE_NOW_SQL} WHERE car_id IN ({placeholders})", (today, today, *changed))
+            if not rows:
+                return
+            run['batches'] += 1
+            for car_id, current, wanted in rows:
+                if current != wanted:
+                    run['cars_available' if wanted else 'cars_unavailable'] += 1
+                    self.rentals.cars.refresh(car_id)
+            if len(rows) < self.batch_size:
+                return
+            last_id = rows[-1][0]
+
+    # Start the background thread (the first run happens right away)
+    def start(self):
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='rental-scheduler', daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._stop.is_set():
+            self.run_once()
+            self._stop.wait(self.interval)
+
+    # Stop the background thread after the current run
+    def stop(self, timeout=None):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+            self._thread = None
+
+    # Totals since start-up and the metrics of the most recent runs
+    def stats(self):
+        with self._lock:
+            return {
+                'running': self._thread is not None and self._thread.is_alive(),
+                'interval': self.interval,
+                'batch_size': self.batch_size,
+                'totals': dict(self._totals),
+                'last_run': self._history[-1] if self._history else None,
+                'history': list(self._history),
+            }
@@ -0,0 +1,216 @@
+import asyncio
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from connection_pool import PoolTimeoutError
+from sessions import SessionError
+from storage import DatabaseError
+
+
+# Raised when too many requests are already waiting (backpressure)
+class ServiceBusyError(Exception):
+    pass
+
+
+# Raised when an operation does not finish within its time limit
+class ServiceTimeoutError(Exception):
+    pass
+
+
+# Raised when a logged-in user calls an operation their role may not use
+class PermissionDeniedError(ValueError):
+    pass
+
+
+# Seconds each operation may take before the caller gets a ServiceTimeoutError
+DEFAULT_TIMEOUTS = {
+    'register_user': 15.0,
+    'login': 15.0,
+    'approve_rentals': 60.0,
+    'cancel_rentals': 60.0,
+    'complete_rentals': 60.0,
+    'default': 10.0,
+}
+
+
+# Rental service class - asyncio front end for the user, car and rental managers
+class RentalService:
+    """
+    Exposes the manager operations as coroutines so that one process can serve many sessions.
+    Every operation after login takes the session token and checks it (and the caller's role) in
+    memory before any work is queued; the user ID of a customer comes from the session, never the caller.
+    The managers use blocking database and bcrypt calls, so every call is offloaded to a
+    dedicated thread pool; a semaphore limits how many run at once and a bounded waiting
+    count rejects new work when the service is overloaded. Nearly every call holds a pooled
+    connection, so max_concurrency should not exceed the pool size: extra workers would only
+    queue on the pool (and time out there) instead of waiting on the semaphore.
+    """
+
+    def __init__(self, user_manager, car_manager, rental_manager, max_concurrency: int = 32, max_waiting: int = 512, timeouts: dict = None):
+        self.users = user_manager
+        self.cars = car_manager
+        self.rentals = rental_manager
+        self.max_waiting = max_waiting # Calls allowed to queue for a free slot before new ones are rejected
+        self.timeouts = dict(DEFAULT_TIMEOUTS, **(timeouts or {}))
+
+        self._executor = ThreadPoolExecutor(max_workers=max_concurrency, thread_name_prefix='service')
+        self._max_concurrency = max_concurrency
+        self._slots = None # Created lazily inside the running event loop
+        self._waiting = 0
+
+    # Run one blocking manager call with backpressure and a timeout
+    async def _call(self, operation, func, *args, **kwargs):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self._max_concurrency)
+        if self._waiting >= self.max_waiting:
+            raise ServiceBusyError(f"Service is busy, '{operation}' was rejected")
+
+        self._waiting += 1
+        try:
+            await self._slots.acquire()
+        finally:
+            self._waiting -= 1
+
+        try:
+            loop = asyncio.get_running_loop()
+            timeout = self.timeouts.get(operation, self.timeouts['default'])
+            # Note: on timeout the caller is released, but the worker thread finishes the call in the background
+            return await asyncio.wait_for(loop.run_in_executor(self._executor, lambda: func(*args, **kwargs)), timeout)
+        except asyncio.TimeoutError:
+            raise ServiceTimeoutError(f"'{operation}' did not finish within {timeout} seconds")
+        finally:
+            self._slots.release()
+
+    # Resolve a session token to its user (in memory: no database query, no bcrypt) and check the role.
+    # Raises SessionError for an invalid or expired token and PermissionDeniedError for the wrong role.
+    def _authorize(self, token, *roles):
+        user = self.users.authenticate(token)
+        if roles and user.role not in roles:
+            raise PermissionDeniedError(f"This operation needs the {' or '.join(roles)} role")
+        return user
+
+    # Users
+    async def register_user(self, name, email, password, role):
+        return await self._call('register_user', self.users.register_user, name, email, password, role)
+
+    async def login(self, email, password):
+        return await self._call('login', self.users.login, email, password)
+
+    # Session checks run in memory, so they are called directly instead of going through the executor
+    def authenticate(self, token):
+        return self.users.authenticate(token)
+
+    def logout(self, token):
+        return self.users.logout(token)
+
+    # Cars (admin)
+    async def add_car(self, token, make, model, year, mileage, in_service, min_rent_period, max_rent_period):
+        self._authorize(token, 'admin')
+        return await self._call('add_car', self.cars.add_car, make, model, year, mileage, in_service, min_rent_period, max_rent_period)
+
+    async def update_car(self, token, car_id, make, model, year, mileage, in_service, min_rent_period, max_rent_period):
+        self._authorize(token, 'admin')
+        return await self._call('update_car', self.cars.update_car, car_id, make, model, year, mileage, in_service, min_rent_period, max_rent_period)
+
+    async def delete_car(self, token, car_id):
+        self._authorize(token, 'admin')
+        return await self._call('delete_car', self.cars.delete_car, car_id)
+
+    # One page of cars after `after_id` (use the last car_id of a page to get the next one)
+    async def cars_page(self, token, after_id=0, limit=20, **filters):
+        self._authorize(token, 'admin')
+        return await self._call('cars_page', lambda: list(itertools.islice(self.cars.iter_cars(after=after_id, page_size=limit, **filters), limit)))
+
+    # Rentals - a customer books and returns in their own name
+    async def create_rental(self, token, car_id, start_date, end_date):
+        user = self._authorize(token, 'customer')
+        return await self._call('create_rental', self.rentals.create_rental, car_id, user.user_id, start_date, end_date)
+
+    async def return_rental(self, token, rental_id, expected_version=None):
+        user = self._authorize(token, 'customer')
+        return await self._call('return_rental', self.rentals.return_rental, rental_id, expected_version, user.user_id)
+
+    # Catalog queries are open to every logged-in user
+    async def find_available_cars(self, token, start_date, end_date):
+        self._authorize(token)
+        return await self._call('find_available_cars', self.rentals.find_available_cars, start_date, end_date)
+
+    async def quote_available_cars(self, token, start_date, end_date):
+        self._authorize(token)
+        return await self._call('quote_available_cars', self.rentals.quote_available_cars, start_date, end_date)
+
+    # Ranked car search (make/model prefixes, ranges, optionally free for the dates)
+    async def search_cars(self, token, text=None, start_date=None, end_date=None, limit=20, **filters):
+        self._authorize(token)
+        return await self._call('search_cars', lambda: self.rentals.search_cars(text, start_date, end_date, limit=limit, **filters))
+
+    # One page of rentals after `after_id` (use the last rental_id of a page to get the next one).
+    # A customer only ever sees their own rentals; an admin may filter by any user_id.
+    async def rentals_page(self, token, after_id=0, limit=20, **filters):
+        user = self._authorize(token)
+        if user.role != 'admin':
+            filters['user_id'] = user.user_id
+        return await self._call('rentals_page', lambda: list(itertools.islice(self.rentals.iter_rentals(after=after_id, page_size=limit, **filters), limit)))
+
+    # Admin status changes; pass the version from a listing as expected_version to fail fast
+    # if someone else changed the rental since it was read
+    async def approve_rental(self, token, rental_id, expected_version=None):
+        self._authorize(token, 'admin')
+        return await self._call('approve_rental', self.rentals.approve_rental, rental_id, expected_version)
+
+    async def cancel_rental(self, token, rental_id, expected_version=None):
+        self._authorize(token, 'admin')
+        return await self._call('cancel_rental', self.rentals.cancel_rental, rental_id, expected_version)
+
+    async def complete_rental(self, token, rental_id, expected_version=None):
+        self._authorize(token, 'admin')
+        return await self._call('complete_rental', self.rentals.complete_rental, rental_id, expected_version)
+
+    # Batch admin workflows - each runs as one transaction and returns {rental_id: outcome}
+    async def approve_rentals(self, token, rental_ids=None, start_from=None, start_to=None):
+        self._authorize(token, 'admin')
+        return await self._call('approve_rentals', self.rentals.approve_rentals, rental_ids, start_from, start_to)
+
+    async def cancel_rentals(self, token, rental_ids=None, start_from=None, start_to=None):
+        self._authorize(token, 'admin')
+        return await self._call('cancel_rentals', self.rentals.cancel_rentals, rental_ids, start_from, start_to)
+
+    async def complete_rentals(self, token, rental_ids=None, start_from=None, start_to=None):
+        self._authorize(token, 'admin')
+        return await self._call('complete_rentals', self.rentals.complete_rentals, rental_ids, start_from, start_to)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
+
+
+# Service client class - lets blocking code (the CLI menus) call the async service
+class ServiceClient:
+    """
+    Runs an event loop in a background thread and turns every coroutine of the
+    service into a plain blocking method call.
+    """
+
+    def __init__(self, service):
+        self.service = service
+        self._loop = asyncio.new_event_loop()
+        self._thread = threading.Thread(target=self._loop.run_forever, name='service-loop', daemon=True)
+        self._thread.start()
+
+    def __getattr__(self, name):
+        method = getattr(self.service, name)
+        if not asyncio.iscoroutinefunction(method):
+            return method
+
+        def call(*args, **kwargs):
+            try:
+                return asyncio.run_coroutine_threadsafe(method(*args, **kwargs), self._loop).result()
+            except (ServiceBusyError, ServiceTimeoutError, SessionError, PermissionDeniedError, PoolTimeoutError, DatabaseError) as err:
+                print(f"Error: {err}")
+                return None
+        return call
+
+    def close(self):
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._thread.join()
+        self._loop.close()
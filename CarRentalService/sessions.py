@@ -0,0 +1,239 @@
+import base64
+import collections
+import hashlib
+import hmac
+import secrets
+import threading
+import time
+
+
+# Raised for a token that is malformed, forged, expired or revoked
+class SessionError(ValueError):
+    pass
+
+
+# Raised when an email has too many failed logins in a row
+# (a ValueError so that log_in reports it like any other login error)
+class LoginThrottledError(ValueError):
+    pass
+
+
+# One logged-in user
+class Session:
+    def __init__(self, session_id, user, expires_at):
+        self.session_id = session_id
+        self.user = user # The Admin or Customer object returned by login
+        self.created_at = time.time()
+        self.expires_at = expires_at # Absolute expiry, also signed into the token
+        self.last_seen = time.monotonic()
+
+
+# Session store class - issues signed tokens and validates them from memory
+class SessionStore:
+    """
+    Bounded in-memory session store.
+    A token is "<session id>.<user id>.<expiry>.<signature>" signed with HMAC-SHA256, so a forged or
+    expired token is rejected before the store is consulted. A valid token is then looked up to
+    apply idle expiry and revocation. When the store is full the least recently used session is dropped;
+    expired sessions are purged by create() at most once every `purge_interval` seconds.
+    """
+
+    def __init__(self, secret: bytes = None, max_sessions: int = 10000, idle_timeout: float = 1800.0, absolute_timeout: float = 43200.0, purge_interval: float = 60.0):
+        self._secret = secret or secrets.token_bytes(32) # A random secret invalidates every token on restart
+        self.max_sessions = max_sessions
+        self.idle_timeout = idle_timeout # Seconds without a request before a session ends
+        self.absolute_timeout = absolute_timeout # Seconds after login when a session ends regardless
+        self.purge_interval = purge_interval
+        self._next_purge = time.monotonic() + purge_interval
+
+        self._sessions = collections.OrderedDict() # session id -> Session, least recently used first
+        self._by_user = collections.defaultdict(set) # user id -> session ids, for revoking every session of a user
+        self._lock = threading.Lock()
+
+        # Metrics
+        self._issued = 0
+        self._validated = 0
+        self._rejected = 0
+        self._evicted = 0
+        self._expired = 0
+
+    def _sign(self, payload):
+        digest = hmac.new(self._secret, payload.encode('ascii'), hashlib.sha256).digest()
+        return base64.urlsafe_b64encode(digest).rstrip(b'=').decode('ascii')
+
+    # Start a session for a user that just logged in and return its token
+    def create(self, user):
+        if time.monotonic() >= self._next_purge: # Expired sessions would otherwise stay until evicted
+            self._next_purge = time.monotonic() + self.purge_interval
+            self.purge_expired()
+        session_id = secrets.token_urlsafe(16)
+        expires_at = int(time.time() + self.absolute_timeout)
+        payload = f"{session_id}.{user.user_id}.{expires_at}"
+        with self._lock:
+            self._sessions[session_id] = Session(session_id, user, expires_at)
+            self._by_user[user.user_id].add(session_id)
+            self._issued += 1
+            while len(self._sessions) > self.max_sessions:
+                _, oldest = self._sessions.popitem(last=False)
+                self._forget_user_session(oldest)
+                self._evicted += 1
+        return f"{payload}.{self._sign(payload)}"
+
+    # Return the user of a valid token, or raise SessionError
+    def authenticate(self, token):
+        try:
+            session_id, user_id, expires_at, signature = token.split('.')
+            expires_at = int(expires_at)
+        except (AttributeError, ValueError):
+            self._reject()
+            raise SessionError("Invalid session token")
+        if not hmac.compare_digest(signature, self._sign(f"{session_id}.{user_id}.{expires_at}")):
+            self._reject()
+            raise SessionError("Invalid session token")
+        if expires_at <= time.time():
+            self.revoke(token)
+            self._reject(expired=True)
+            raise SessionError("Session expired, please log in again")
+
+        now = time.monotonic()
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None: # Revoked, evicted or issued before a restart
+                self._rejected += 1
+                raise SessionError("Session is no longer valid, please log in again")
+            if now - session.last_seen > self.idle_timeout:
+                del self._sessions[session_id]
+                self._forget_user_session(session)
+                self._rejected += 1
+                self._expired += 1
+                raise SessionError("Session expired, please log in again")
+            session.last_seen = now
+            self._sessions.move_to_end(session_id)
+            self._validated += 1
+            return session.user
+
+    def _reject(self, expired=False):
+        with self._lock:
+            self._rejected += 1
+            if expired:
+                self._expired += 1
+
+    # Caller holds the lock
+    def _forget_user_session(self, session):
+        ids = self._by_user.get(session.user.user_id)
+        if ids is not None:
+            ids.discard(session.session_id)
+            if not ids:
+                del self._by_user[session.user.user_id]
+
+    # End one session (logout); returns True if it was still active
+    def revoke(self, token):
+        session_id = str(token).split('.', 1)[0]
+        with self._lock:
+            session = self._sessions.pop(session_id, None)
+            if session is None:
+                return False
+            self._forget_user_session(session)
+            return True
+
+    # End every session of a user (e.g. after a password change); returns how many were ended
+    def revoke_user(self, user_id):
+        with self._lock:
+            ids = self._by_user.pop(user_id, set())
+            for session_id in ids:
+                self._sessions.pop(session_id, None)
+            return len(ids)
+
+    # Drop sessions past their idle or absolute expiry; returns how many were removed
+    def purge_expired(self):
+        now, wall = time.monotonic(), time.time()
+        with self._lock:
+            stale = [session for session in self._sessions.values()
+                     if now - session.last_seen > self.idle_timeout or session.expires_at <= wall]
+            for session in stale:
+                del self._sessions[session.session_id]
+                self._forget_user_session(session)
+            self._expired += len(stale)
+            return len(stale)
+
+    def stats(self):
+        with self._lock:
+            return {
+                'active': len(self._sessions),
+                'max_sessions': self.max_sessions,
+                'issued': self._issued,
+                'validated': self._validated,
+                'rejected': self._rejected,
+                'expired': self._expired,
+                'evicted': self._evicted,
+            }
+
+
+# Login throttle class - limits failed login attempts per email
+class LoginThrottle:
+    """
+    After `max_failures` failed logins for one email within `window` seconds, further
+    attempts for that email are refused for `lockout` seconds without touching the
+    database or bcrypt. A successful login clears the email's failures.
+    """
+
+    def __init__(self, max_failures: int = 5, window: float = 300.0, lockout: float = 300.0, max_tracked: int = 100000):
+        self.max_failures = max_failures
+        self.window = window
+        self.lockout = lockout
+        self.max_tracked = max_tracked # Emails remembered at most; the oldest are forgotten first
+
+        self._failures = collections.OrderedDict() # email -> deque of failure times
+        self._locked_until = {} # email -> time the lockout ends
+        self._lock = threading.Lock()
+        self._refused = 0
+
+    @staticmethod
+    def _key(email):
+        return email.strip().lower()
+
+    # Raise LoginThrottledError if the email is locked out
+    def check(self, email):
+        key = self._key(email)
+        now = time.monotonic()
+        with self._lock:
+            until = self._locked_until.get(key)
+            if until is None:
+                return
+            if until > now:
+                self._refused += 1
+                raise LoginThrottledError(f"Too many failed logins, try again in {int(until - now) + 1} seconds")
+            del self._locked_until[key]
+
+    def record_failure(self, email):
+        key = self._key(email)
+        now = time.monotonic()
+        with self._lock:
+            failures = self._failures.pop(key, None) or collections.deque()
+            failures.append(now)
+            while failures and now - failures[0] > self.window:
+                failures.popleft()
+            if len(failures) >= self.max_failures:
+                self._locked_until[key] = now + self.lockout
+                failures.clear()
+            self._failures[key] = failures # Re-inserted as the most recent entry
+            while len(self._failures) > self.max_tracked:
+                self._failures.popitem(last=False)
+            if len(self._locked_until) > self.max_tracked:
+                for email in [email for email, until in self._locked_until.items() if until <= now]:
+                    del self._locked_until[email]
+
+    def record_success(self, email):
+        key = self._key(email)
+        with self._lock:
+            self._failures.pop(key, None)
+            self._locked_until.pop(key, None)
+
+    def stats(self):
+        now = time.monotonic()
+        with self._lock:
+            return {
+                'tracked_emails': len(self._failures),
+                'locked_emails': sum(1 for until in self._locked_until.values() if until > now),
+                'refused': self._refused,
+            }
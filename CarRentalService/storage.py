@@ -0,0 +1,270 @@
+import datetime
+import os
+import sqlite3
+
+import instrumentation
+
+MAX_PREPARED_STATEMENTS = 64 # Open statement cursors kept per connection
+
+
+# Raised for any database error, whichever backend is in use
+class DatabaseError(Exception):
+    def __init__(self, message, errno=None):
+        super().__init__(message)
+        self.errno = errno
+
+
+# Cursor wrapper - rewrites SQL for the backend's dialect and turns driver errors into DatabaseError
+class _Cursor:
+    def __init__(self, cursor, connection):
+        self._cursor = cursor
+        self._connection = connection
+
+    def execute(self, sql, params=()):
+        sql = self._connection.prepare(sql)
+        try:
+            self._cursor.execute(sql, params)
+        except self._connection.driver_errors as err:
+            raise DatabaseError(str(err), getattr(err, 'errno', None)) from err
+        return self
+
+    def executemany(self, sql, seq_of_params):
+        sql = self._connection.prepare(sql)
+        try:
+            self._cursor.executemany(sql, seq_of_params)
+        except self._connection.driver_errors as err:
+            raise DatabaseError(str(err), getattr(err, 'errno', None)) from err
+        return self
+
+    def __getattr__(self, name): # fetchone, fetchall, rowcount, lastrowid, description, close ...
+        return getattr(self._cursor, name)
+
+    def __iter__(self):
+        return iter(self._cursor)
+
+
+# Connection wrapper - gives MySQL and SQLite connections the same interface
+class _Connection:
+    def __init__(self, conn, backend):
+        self._conn = conn
+        self.dialect = backend.dialect
+        self.driver_errors = backend.driver_errors
+        self.prepare = backend.prepare_sql
+        self._cursor_class = backend.cursor_class
+        self._server_prepared = backend.server_prepared_statements
+        self._statements = {} # SQL -> cursor kept open for reuse by execute_prepared()
+
+    def cursor(self, *args, **kwargs):
+        return instrumentation.instrument(self._cursor_class(self._conn.cursor(*args, **kwargs), self))
+
+    # Run a hot statement on a cursor that stays open on this connection. On MySQL the cursor is a
+    # prepared-statement cursor, so the statement is parsed by the server once per connection and
+    # later calls only send the parameters. Read the results with fetchall() before the next call.
+    def execute_prepared(self, sql, params=()):
+        cursor = self._statements.get(sql)
+        if cursor is None:
+            if len(self._statements) >= MAX_PREPARED_STATEMENTS:
+                self._close_statements()
+            raw = self._conn.cursor(prepared=True) if self._server_prepared else self._conn.cursor()
+            cursor = self._statements[sql] = self._cursor_class(raw, self)
+        return instrumentation.instrument(cursor).execute(sql, params)
+
+    def _close_statements(self):
+        for cursor in self._statements.values():
+            try:
+                cursor.close()
+            except Exception:
+                pass
+        self._statements.clear()
+
+    def commit(self):
+        try:
+            self._conn.commit()
+        except self.driver_errors as err:
+            raise DatabaseError(str(err), getattr(err, 'errno', None)) from err
+
+    # Prepared statements do not survive a new server session
+    def reconnect(self, *args, **kwargs):
+        self._statements.clear()
+        return self._conn.reconnect(*args, **kwargs)
+
+    def close(self):
+        self._close_statements()
+        return self._conn.close()
+
+    def __getattr__(self, name): # rollback, in_transaction, is_connected ...
+        return getattr(self._conn, name)
+
+
+# Storage backend interface - what the connection pool, migrations and managers need from a database
+class StorageBackend:
+    """
+    A backend knows how to open connections to one kind of database and how to adapt the
+    SQL the managers write (MySQL flavoured, %s placeholders) to it.
+    Connections returned by connect() raise DatabaseError for every driver error.
+    """
+    dialect = None
+    driver_errors = ()
+    cursor_class = _Cursor
+    server_prepared_statements = False # Whether execute_prepared() uses server-side prepared statements
+    recommended_pool_size = None # None = no limit imposed by the backend
+    identity = None # Names the database the backend points at; None for a throwaway (in-memory) database
+
+    # Open a new connection
+    def connect(self):
+        raise NotImplementedError("Each backend must implement this method.")
+
+    # Create the database if needed, bring the schema up to date and return a connection (or None on failure)
+    def bootstrap(self):
+        raise NotImplementedError("Each backend must implement this method.")
+
+    # Adapt one SQL statement to the dialect
+    def prepare_sql(self, sql):
+        return sql
+
+
+# MySQL backend - the production database
+class MySQLBackend(StorageBackend):
+    dialect = 'mysql'
+    server_prepared_statements = True
+
+    def __init__(self, host, user, password, database, allow_local_infile=False):
+        self.host = host
+        self.user = user
+        self.password = password
+        self.database = database
+        self.allow_local_infile = allow_local_infile # Needed by bulk imports that use LOAD DATA LOCAL INFILE
+        self.identity = f"mysql://{user}@{host}/{database}"
+
+    @property
+    def driver_errors(self):
+        import mysql.connector
+        return mysql.connector.Error
+
+    def connect(self):
+        import mysql.connector
+        try:
+            conn = mysql.connector.connect(
+                host=self.host,
+                user=self.user,
+                password=self.password,
+                database=self.database,
+                allow_local_infile=self.allow_local_infile
+            )
+        except mysql.connector.Error as err:
+            raise DatabaseError(str(err), err.errno) from err
+        return _Connection(conn, self)
+
+    def bootstrap(self):
+        import mysql.connector
+        from migrations import migrate
+
+        # Use a try statement as the connection attempt may fail.
+        try:
+            # Connect if the database exists.
+            conn = self.connect()
+        except DatabaseError as err:
+            if err.errno != mysql.connector.errorcode.ER_BAD_DB_ERROR:
+                # Print an error message if the database connection fails
+                print("Database connection failed:", err)
+                return None
+            # Create the database if it does not exist
+            raw = mysql.connector.connect(host=self.host, user=self.user, password=self.password, allow_local_infile=self.allow_local_infile)
+            raw.cursor().execute(f"CREATE DATABASE {self.database}")
+            raw.database = self.database
+            conn = _Connection(raw, self)
+
+        try:
+            migrate(conn) # Create the tables or upgrade an existing database in place
+        except DatabaseError as err:
+            print("Database migration failed:", err)
+            conn.close()
+            return None
+        return conn
+
+
+# Store dates as ISO strings and read DATE/DATETIME columns back as date/datetime objects
+sqlite3.register_adapter(datetime.date, lambda value: value.isoformat())
+sqlite3.register_adapter(datetime.datetime, lambda value: value.isoformat(' '))
+sqlite3.register_converter('DATE', lambda value: datetime.date.fromisoformat(value.decode()))
+sqlite3.register_converter('DATETIME', lambda value: datetime.datetime.fromisoformat(value.decode()))
+
+
+# SQLite connection - adds the few MySQL connector methods the pool relies on
+class _SQLiteConnection(sqlite3.Connection):
+    def is_connected(self):
+        try:
+            self.execute("SELECT 1")
+            return True
+        except sqlite3.Error:
+            return False
+
+    def reconnect(self, attempts=1, delay=0):
+        raise sqlite3.OperationalError("SQLite connections cannot be reconnected")
+
+
+# SQLite has no row locks: a statement that asks for FOR UPDATE takes the database write lock instead
+class _SQLiteCursor(_Cursor):
+    def execute(self, sql, params=()):
+        if 'FOR UPDATE' in sql and not self._connection.in_transaction:
+            self._cursor.execute("BEGIN IMMEDIATE")
+        return super().execute(sql, params)
+
+
+# SQLite backend - embedded database for tests and benchmarks, no server needed
+class SQLiteBackend(StorageBackend):
+    """
+    path is a database file, or ':memory:' for a private in-memory database.
+    A file database runs in WAL mode so readers do not block the writer; an in-memory
+    database is shared between the pool's connections but only supports one writer at
+    a time, so use a pool of size 1 with it.
+    """
+    dialect = 'sqlite'
+    driver_errors = sqlite3.Error
+    cursor_class = _SQLiteCursor
+
+    def __init__(self, path=':memory:', busy_timeout=10.0):
+        self.busy_timeout = busy_timeout
+        if path == ':memory:':
+            import uuid
+            # A named shared-cache database lives as long as at least one connection is open
+            self._uri = f"file:car_rental_{uuid.uuid4().hex}?mode=memory&cache=shared"
+            self.recommended_pool_size = 1
+            self._anchor = self.connect()
+        else:
+            self._uri = f"file:{path}"
+            self._anchor = None
+            self.identity = f"sqlite://{os.path.abspath(path)}"
+
+    def connect(self):
+        try:
+            conn = sqlite3.connect(
+                self._uri,
+                uri=True,
+                timeout=self.busy_timeout,
+                detect_types=sqlite3.PARSE_DECLTYPES,
+                check_same_thread=False, # Pooled connections are used by one thread at a time, but not always the same one
+                cached_statements=256, # sqlite3 keeps compiled statements per connection, the equivalent of prepared statements
+                factory=_SQLiteConnection
+            )
+            conn.execute("PRAGMA foreign_keys = ON")
+            if 'mode=memory' not in self._uri:
+                conn.execute("PRAGMA journal_mode = WAL")
+        except sqlite3.Error as err:
+            raise DatabaseError(str(err)) from err
+        return _Connection(conn, self)
+
+    def bootstrap(self):
+        from migrations import migrate
+
+        try:
+            conn = self.connect()
+            migrate(conn)
+        except DatabaseError as err:
+            print("Database initialization failed:", err)
+            return None
+        return conn
+
+    # %s placeholders become ?, and SELECT ... FOR UPDATE becomes a write-locking transaction
+    def prepare_sql(self, sql):
+        return sql.replace(' FOR UPDATE', '').replace('%s', '?')
@@ -0,0 +1,84 @@
+# Shared fixtures: every test gets its own in-memory SQLite database with the latest schema,
+# a one-connection pool and fresh manager instances. No MySQL server is needed.
+import datetime
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main # noqa: E402
+from connection_pool import ConnectionPool # noqa: E402
+from storage import SQLiteBackend # noqa: E402
+
+TODAY = datetime.date.today()
+
+
+# Date `days` from today
+def day(days):
+    return TODAY + datetime.timedelta(days=days)
+
+
+@pytest.fixture
+def backend():
+    backend = SQLiteBackend(':memory:')
+    backend.bootstrap().close()
+    return backend
+
+
+@pytest.fixture
+def pool(backend):
+    pool = ConnectionPool(backend.connect, size=1, timeout=5)
+    yield pool
+    pool.close()
+
+
+@pytest.fixture
+def managers(pool):
+    main.SingletonMeta._instances.clear() # The managers are per-process singletons
+    car_manager = main.CarManager(pool)
+    rental_manager = main.RentalManager(pool, car_manager)
+    yield car_manager, rental_manager
+    main.SingletonMeta._instances.clear()
+
+
+# Insert rows straight into the database and return the new IDs
+@pytest.fixture
+def db(pool):
+    class Rows:
+        def user(self, role='customer'):
+            with pool.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT COUNT(*) FROM users")
+                number = cursor.fetchone()[0] + 1
+                cursor.execute("INSERT INTO users (name, email, password, role) VALUES (%s, %s, 'x', %s)",
+                               (f"User {number}", f"user{number}@test", role))
+                return cursor.lastrowid
+
+        def car(self, make='Toyota', model='Corolla', year=2020, mileage=1000, in_service=1, min_days=1, max_days=30):
+            with pool.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO cars (make, model, year, mileage, in_service, available_now, min_rent_period, max_rent_period) "
+                    "VALUES (%s, %s, %s, %s, %s, %s, %s, %s)",
+                    (make, model, year, mileage, in_service, in_service, min_days, max_days)
+                )
+                return cursor.lastrowid
+
+        def rental(self, car_id, user_id, start, end, status='on process'):
+            with pool.transaction() as conn:
+                cursor = conn.cursor()
+                cursor.execute(
+                    "INSERT INTO rentals (car_id, user_id, start_date, end_date, total_fee, status) VALUES (%s, %s, %s, %s, 100, %s)",
+                    (car_id, user_id, start, end, status)
+                )
+                return cursor.lastrowid
+
+        def status(self, rental_id):
+            with pool.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute("SELECT status, version FROM rentals WHERE rental_id = %s", (rental_id,))
+                return cursor.fetchone()
+
+    return Rows()
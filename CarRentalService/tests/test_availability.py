@@ -0,0 +1,91 @@
+# Interval index of booked periods (AvailabilityEngine) and the booking path that trusts the database over it
+from conftest import day
+
+import main
+from availability import AvailabilityEngine
+
+
+def test_overlap_checks():
+    engine = AvailabilityEngine()
+    engine.book(1, 10, day(5), day(9))
+    engine.book(1, 11, day(20), day(22))
+    assert not engine.is_free(1, day(9), day(12)) # Touches the last day of a booking
+    assert not engine.is_free(1, day(0), day(30)) # Covers both bookings
+    assert engine.is_free(1, day(10), day(19))
+    assert engine.is_free(2, day(5), day(9)) # Another car
+    assert engine.free_cars([1, 2], day(21), day(21)) == [2]
+
+
+def test_long_booking_hides_behind_later_starts():
+    # The running maximum of end dates finds a long booking that starts before shorter ones
+    engine = AvailabilityEngine()
+    engine.book(1, 10, day(0), day(30))
+    engine.book(1, 11, day(2), day(3))
+    engine.book(1, 12, day(5), day(6))
+    assert not engine.is_free(1, day(20), day(21))
+    engine.release(10)
+    assert engine.is_free(1, day(20), day(21))
+    assert engine.bookings(1) == [(day(2), day(3), 11), (day(5), day(6), 12)]
+
+
+def test_reconcile_follows_the_database():
+    engine = AvailabilityEngine()
+    engine.book(1, 10, day(5), day(9)) # Cancelled by another process since
+    engine.book(1, 11, day(40), day(45)) # Outside the period; left alone
+    engine.reconcile(1, day(1), day(20), [(12, day(15), day(16))])
+    assert engine.is_free(1, day(5), day(9))
+    assert not engine.is_free(1, day(15), day(15))
+    assert [booking[2] for booking in engine.bookings(1)] == [12, 11]
+
+
+def test_create_rental_rejects_overlaps(managers, db):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    assert rentals.create_rental(car_id, user_id, day(5).isoformat(), day(9).isoformat())
+    assert rentals.create_rental(car_id, user_id, day(8).isoformat(), day(12).isoformat()) is None
+    assert rentals.create_rental(car_id, user_id, day(10).isoformat(), day(12).isoformat())
+
+
+def test_create_rental_after_cancel_by_another_process(managers, db, pool):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    rental_id = rentals.create_rental(car_id, user_id, day(5).isoformat(), day(9).isoformat())
+    with pool.transaction() as conn: # Cancelled without going through this manager
+        conn.cursor().execute("UPDATE rentals SET status = 'cancelled' WHERE rental_id = %s", (rental_id,))
+
+    assert not rentals.availability.is_free(car_id, day(5), day(9)) # The index is behind
+    assert rentals.create_rental(car_id, user_id, day(5).isoformat(), day(9).isoformat())
+
+
+def test_create_rental_sees_booking_by_another_process(managers, db):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    assert rentals.availability.is_free(car_id, day(5), day(9)) # Index loaded before the other booking
+    db.rental(car_id, user_id, day(5), day(9), 'active')
+
+    assert rentals.create_rental(car_id, user_id, day(6).isoformat(), day(7).isoformat()) is None
+    assert not rentals.availability.is_free(car_id, day(6), day(7))
+
+
+def test_reload_picks_up_changes_by_another_process(managers, db, backend, monkeypatch):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    rental_id = rentals.create_rental(car_id, user_id, day(5).isoformat(), day(9).isoformat())
+    assert rentals.find_available_cars(day(5).isoformat(), day(9).isoformat()) == []
+
+    other = backend.connect() # Another process cancels the rental
+    other.cursor().execute("UPDATE rentals SET status = 'cancelled', version = version + 1 WHERE rental_id = %s", (rental_id,))
+    other.commit()
+    assert rentals.find_available_cars(day(5).isoformat(), day(9).isoformat()) == [] # Not reloaded yet
+
+    monkeypatch.setattr(main, 'AVAILABILITY_TTL', 0)
+    assert rentals.find_available_cars(day(5).isoformat(), day(9).isoformat()) == [car_id]
+    assert [car[0] for car in rentals.search_cars('toyota', day(5).isoformat(), day(9).isoformat())] == [car_id]
+
+    other.cursor().execute( # ...and books it again
+        "INSERT INTO rentals (car_id, user_id, start_date, end_date, total_fee, status) VALUES (%s, %s, %s, %s, 100, 'active')",
+        (car_id, user_id, day(8), day(8))
+    )
+    other.commit()
+    other.close()
+    assert rentals.find_available_cars(day(5).isoformat(), day(9).isoformat()) == []
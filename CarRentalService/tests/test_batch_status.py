@@ -0,0 +1,43 @@
+# Batch status changes: per-rental outcomes and the guard against unbounded updates
+import pytest
+from conftest import day
+
+
+def test_outcomes_by_id(managers, db):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    waiting = db.rental(car_id, user_id, day(1), day(2))
+    active = db.rental(car_id, user_id, day(3), day(4), 'active')
+
+    outcomes = rentals.approve_rentals([waiting, active, 999, waiting])
+    assert outcomes == {waiting: 'active', active: "skipped (status is 'active')", 999: 'not found'}
+    assert db.status(waiting) == ('active', 1)
+    assert db.status(active) == ('active', 0)
+
+
+def test_filter_by_start_window(managers, db):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    early = db.rental(car_id, user_id, day(1), day(2))
+    late = db.rental(car_id, user_id, day(10), day(12))
+    assert rentals.cancel_rentals(start_from=day(5)) == {late: 'cancelled'}
+    assert db.status(early)[0] == 'on process'
+
+
+def test_completing_releases_the_dates(managers, db):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    rental_id = rentals.create_rental(car_id, user_id, day(1).isoformat(), day(2).isoformat())
+    rentals.approve_rentals([rental_id])
+    assert rentals.complete_rentals([rental_id]) == {rental_id: 'completed'}
+    assert rentals.availability.is_free(car_id, day(1), day(2))
+
+
+def test_no_ids_and_no_window_is_refused(managers, db):
+    _, rentals = managers
+    rental_id = db.rental(db.car(), db.user(), day(1), day(2))
+    with pytest.raises(ValueError):
+        rentals.approve_rentals()
+    with pytest.raises(ValueError):
+        rentals.cancel_rentals(statuses=('on process',))
+    assert db.status(rental_id)[0] == 'on process'
@@ -0,0 +1,131 @@
+# Car search index: every query plan must return what a plain filter over the catalog returns
+import random
+
+import pytest
+from conftest import day
+
+from car_search import CarSearchIndex, tokenize
+
+MAKES = ['Toyota', 'Tesla', 'Ford', 'Land Rover', 'Mazda']
+MODELS = ['Corolla', 'Model 3', 'Model Y', 'Focus', 'Range Rover', 'Mazda3']
+
+
+def catalog(count=3000, seed=5):
+    rng = random.Random(seed)
+    cars = []
+    for car_id in range(1, count * 2, 2): # Gaps in the IDs, like deleted cars
+        min_days = rng.randint(1, 7)
+        cars.append((car_id, rng.choice(MAKES), rng.choice(MODELS), rng.randint(2005, 2024), rng.randint(0, 200000),
+                     1 if rng.random() < 0.9 else 0, min_days, min_days + rng.randint(0, 30)))
+    return cars
+
+
+def expected(cars, text=None, year=None, mileage=None, rental_days=None, limit=20):
+    def matches(car):
+        words = tokenize(car[1]) + tokenize(car[2])
+        if not car[5] or not all(any(word.startswith(term) for word in words) for term in tokenize(text)):
+            return False
+        for position, bounds in ((3, year), (4, mileage)):
+            if bounds and not bounds[0] <= car[position] <= bounds[1]:
+                return False
+        return rental_days is None or car[6] <= rental_days <= car[7]
+    found = [car[0] for car in cars if matches(car)]
+    return found if limit is None else found[:limit]
+
+
+QUERIES = [
+    dict(year=(2015, 2016), mileage=(50000, 60000)), # Two narrow ranges
+    dict(mileage=(0, 20000)), # One common range
+    dict(year=(2024, 2024)),
+    dict(year=(2010, 2012), mileage=(0, 150000), rental_days=14),
+    dict(mileage=(10000, 10500), rental_days=3), # Rare range
+    dict(text='model', year=(2020, 2024)),
+    dict(text='mazda', mileage=(0, 5000)),
+]
+
+
+@pytest.mark.parametrize('query', QUERIES)
+@pytest.mark.parametrize('limit', [1, 20, None])
+def test_plans_agree_with_a_plain_filter(query, limit):
+    cars = catalog()
+    index = CarSearchIndex()
+    index.load(cars)
+    found = [car[0] for car in index.search(limit=limit, **query)]
+    if 'text' in query: # Ranked (whole words first), so compare the cars found, not their order
+        assert len(found) == len(expected(cars, limit=limit, **query))
+        assert set(found) <= set(expected(cars, limit=None, **query))
+    else:
+        assert found == expected(cars, limit=limit, **query)
+
+
+def test_narrow_ranges_start_from_the_smallest_slice(monkeypatch):
+    index = CarSearchIndex()
+    index.load(catalog())
+    used = []
+    sliced = index._sliced
+    monkeypatch.setattr(index, '_sliced', lambda ordered, ranges: used.append([key for _, _, key, _ in ordered]) or sliced(ordered, ranges))
+    index.search(year=(2015, 2016), mileage=(50000, 60000))
+    assert used == [['mileage', 'year']]
+    index.search(mileage=(0, 150000)) # Most cars: the first matches are found by walking the catalog
+    assert len(used) == 1
+
+
+# The plans the cost constants pick on a benchmark-sized catalog; re-run benchmarks/bench_car_search.py
+# (which times every plan of each query) before changing any of these
+@pytest.mark.parametrize('query, plan', [
+    (dict(year=(2015, 2016), mileage=(50000, 60000)), ('slice', ['mileage', 'year'])), # Narrow ranges
+    (dict(year=(2024, 2024)), ('slice', ['year'])),
+    (dict(mileage=(None, 20000)), ('scan', [])), # One car in ten: the first 20 are near the start of the catalog
+    (dict(mileage=(0, 150000), limit=None), ('scan', [])),
+    (dict(text='toy'), ('postings', ['toy'])),
+    (dict(text='toy cor'), ('postings', ['cor'])), # The rarer prefix
+    (dict(text='model', year=(2020, 2024)), ('postings', ['model'])), # Common range, text narrower
+    (dict(text='mazda', mileage=(0, 5000)), ('slice', ['mileage'])), # Rare range, text wider
+    (dict(text='land rover', rental_days=14), ('postings', ['land'])),
+    (dict(text='zzz'), ('none', [])),
+])
+def test_plan_choice(query, plan):
+    index = CarSearchIndex()
+    index.load(catalog(20000))
+    assert index.explain(**query) == plan
+
+
+def test_random_ranges_after_updates():
+    rng = random.Random(11)
+    cars = catalog(1500)
+    index = CarSearchIndex()
+    index.load(cars)
+    for _ in range(200): # Updates and deletes must keep the sorted columns in step
+        position = rng.randrange(len(cars))
+        car = cars[position]
+        if rng.random() < 0.2:
+            index.remove(car[0])
+            del cars[position]
+        else:
+            cars[position] = (car[0], car[1], car[2], rng.randint(2005, 2024), rng.randint(0, 200000), car[5], car[6], car[7])
+            index.put(cars[position])
+    for _ in range(300):
+        low_year, low_mileage = rng.randint(2005, 2024), rng.randint(0, 200000)
+        query = dict(year=(low_year, low_year + rng.randint(0, 4)), mileage=(low_mileage, low_mileage + rng.randint(0, 40000)))
+        limit = rng.choice([None, 5, 50])
+        assert [car[0] for car in index.search(limit=limit, **query)] == expected(cars, limit=limit, **query)
+
+
+def test_accept_rejects_cars_after_the_heap():
+    cars = catalog()
+    index = CarSearchIndex()
+    index.load(cars)
+    query = dict(year=(2015, 2016), mileage=(50000, 60000))
+    everything = expected(cars, limit=None, **query)
+    found = [car[0] for car in index.search(accept=lambda car_id: car_id not in everything[:3], limit=5, **query)]
+    assert found == everything[3:8]
+
+
+def test_search_needs_both_dates(managers, db):
+    _, rentals = managers
+    db.car()
+    with pytest.raises(ValueError):
+        rentals.search_cars('toy', start_date=day(1).isoformat())
+    with pytest.raises(ValueError):
+        rentals.search_cars('toy', end_date=day(1).isoformat())
+    assert len(rentals.search_cars('toy', day(1).isoformat(), day(3).isoformat())) == 1
@@ -0,0 +1,102 @@
+# Connection pool: exhaustion, waiting for a returned connection, health checks and closing
+import threading
+import time
+
+import pytest
+
+from connection_pool import ConnectionPool, PoolTimeoutError
+
+
+def test_exhausted_pool_times_out(backend):
+    pool = ConnectionPool(backend.connect, size=2, timeout=0.05)
+    with pool.connection(), pool.connection():
+        with pytest.raises(PoolTimeoutError):
+            with pool.connection():
+                pass
+        assert pool.stats()['in_use'] == 2
+    stats = pool.stats()
+    assert (stats['open'], stats['in_use'], stats['idle'], stats['timeouts']) == (2, 0, 2, 1)
+    with pool.connection(): # Usable again once the connections are back
+        pass
+    pool.close()
+
+
+def test_waiting_caller_gets_the_returned_connection(backend):
+    pool = ConnectionPool(backend.connect, size=1, timeout=5)
+    taken = []
+    def wait():
+        with pool.connection() as conn:
+            taken.append(conn)
+    with pool.connection() as conn:
+        waiter = threading.Thread(target=wait)
+        waiter.start()
+        time.sleep(0.05)
+        assert not taken
+    waiter.join(5)
+    assert taken == [conn]
+    assert pool.stats()['max_wait_ms'] >= 40
+
+
+def test_idle_connection_is_replaced_when_it_died(backend):
+    pool = ConnectionPool(backend.connect, size=1, timeout=1, check_after=0)
+    with pool.connection() as conn:
+        pass
+    conn.close() # The server dropped it while it sat in the pool
+    with pool.connection() as replacement:
+        assert replacement is not conn
+        replacement.cursor().execute("SELECT COUNT(*) FROM cars")
+    assert pool.stats()['reconnects'] == 1
+    assert pool.stats()['open'] == 1
+    pool.close()
+
+
+def test_failed_operation_on_a_dead_connection_discards_it(backend):
+    pool = ConnectionPool(backend.connect, size=1, timeout=1)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.close()
+            raise RuntimeError("lost connection")
+    assert pool.stats()['discarded'] == 1
+    with pool.connection() as fresh: # A new connection is opened in its place
+        assert fresh is not conn
+
+    with pytest.raises(RuntimeError): # A live connection is rolled back and kept
+        with pool.connection() as conn:
+            conn.cursor().execute("INSERT INTO users (name, email, password, role) VALUES ('A', 'a@test', 'x', 'customer')")
+            raise RuntimeError("bad input")
+    with pool.connection() as again:
+        assert again is conn
+        cursor = again.cursor()
+        cursor.execute("SELECT COUNT(*) FROM users")
+        assert cursor.fetchone()[0] == 0
+    assert pool.stats()['discarded'] == 1
+    pool.close()
+
+
+def test_failed_connect_does_not_use_up_the_pool(backend):
+    attempts = []
+    def connect():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError("server unreachable")
+        return backend.connect()
+    pool = ConnectionPool(connect, size=1, timeout=0.05)
+    with pytest.raises(OSError):
+        with pool.connection():
+            pass
+    with pool.connection():
+        assert pool.stats()['open'] == 1
+    pool.close()
+
+
+def test_closed_pool_refuses_checkouts(backend):
+    pool = ConnectionPool(backend.connect, size=2, timeout=1)
+    with pool.connection():
+        pass
+    with pool.connection():
+        pool.close() # Idle connections close now, this one when it is returned
+        assert pool.stats()['open'] == 1
+    assert pool.stats()['open'] == 0
+    with pytest.raises(PoolTimeoutError):
+        with pool.connection():
+            pass
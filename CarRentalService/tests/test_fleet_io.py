@@ -0,0 +1,71 @@
+# Fleet import/export: files written by export_cars import back to the same cars, bad rows are reported by line
+import csv
+import json
+
+import pytest
+
+from fleet_io import export_cars, import_cars, validate_car
+
+GOOD = {'make': 'Toyota', 'model': 'Corolla', 'year': '2020', 'mileage': '1000', 'in_service': 'yes',
+        'min_rent_period': '1', 'max_rent_period': '30'}
+
+
+def without_ids(path):
+    with open(path, newline='', encoding='utf-8') as file:
+        if path.endswith('.jsonl'):
+            records = [json.loads(line) for line in file]
+        else:
+            records = list(csv.DictReader(file))
+    return [tuple(str(value) for key, value in record.items() if key != 'car_id') for record in records]
+
+
+@pytest.mark.parametrize('suffix', ['.csv', '.jsonl'])
+def test_export_import_round_trip(managers, db, tmp_path, suffix):
+    cars, _ = managers
+    db.car()
+    db.car('Land Rover', 'Range Rover', 2015, 88000, 0, 3, 14)
+    db.car('Mercedes-Benz', 'C 200, "AMG"', 2022, 0, 1, 2, 2) # Commas and quotes survive the CSV
+    path = str(tmp_path / f"fleet{suffix}")
+    assert export_cars(cars, path, page_size=2) == 3
+    exported = without_ids(path)
+
+    report = import_cars(cars, path, batch_size=2)
+    assert (report.inserted, report.batches, report.errors) == (3, 2, [])
+    assert export_cars(cars, path) == 6
+    assert without_ids(path) == exported * 2
+    assert len(cars.search_index.search('range')) == 0 # Out of service
+    assert len(cars.search_index.search('range', in_service=None)) == 2 # The index was refreshed
+
+
+def test_bad_rows_are_reported_by_line(managers, tmp_path):
+    cars, _ = managers
+    path = tmp_path / 'fleet.csv'
+    rows = [GOOD, dict(GOOD, year='1800'), dict(GOOD, mileage='-1'), dict(GOOD, in_service='maybe'),
+            dict(GOOD, min_rent_period='5', max_rent_period='2'), dict(GOOD, make=' '), dict(GOOD, mileage='many'), GOOD]
+    with open(path, 'w', newline='', encoding='utf-8') as file:
+        writer = csv.DictWriter(file, fieldnames=list(GOOD))
+        writer.writeheader()
+        writer.writerows(rows)
+
+    report = import_cars(cars, str(path))
+    assert report.inserted == 2
+    assert [line_no for line_no, _ in report.errors] == [3, 4, 5, 6, 7, 8] # Line 1 is the header
+    assert 'mileage must be a whole number' in report.errors[-1][1]
+    assert len(cars.catalog()) == 2
+
+
+def test_broken_json_lines_are_rejected(managers, tmp_path):
+    cars, _ = managers
+    path = tmp_path / 'fleet.jsonl'
+    path.write_text(json.dumps(GOOD) + '\n{"make": \n\n' + json.dumps([1, 2]) + '\n', encoding='utf-8')
+    report = import_cars(cars, str(path))
+    assert report.inserted == 1
+    assert [line_no for line_no, _ in report.errors] == [2, 4]
+
+
+def test_available_now_is_accepted_as_the_old_name_of_in_service():
+    old = {key: value for key, value in GOOD.items() if key != 'in_service'}
+    assert validate_car(dict(old, available_now='no'))[4] == 0
+    assert validate_car(dict(old, available_now='no', in_service='yes'))[4] == 1 # The new name wins
+    with pytest.raises(ValueError, match='in_service'):
+        validate_car(old)
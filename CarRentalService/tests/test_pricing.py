@@ -0,0 +1,62 @@
+# Pricing: rental limits, multipliers and discounts, and the catalog quote agreeing with single quotes
+import datetime
+
+import pytest
+
+from pricing import PricingEngine, PricingError
+
+ORIGIN = datetime.date(2024, 1, 1) # A Monday
+CAR = (1, 'Toyota', 'Corolla', 2020, 1000, 1, 2, 10) # car_id, make, model, year, mileage, in_service, min, max
+
+
+def date(month, day_of_month):
+    return datetime.date(2024, month, day_of_month)
+
+
+def test_rental_period_limits():
+    engine = PricingEngine(origin=ORIGIN)
+    with pytest.raises(PricingError, match='at least 2 days'):
+        engine.quote(CAR, date(3, 4), date(3, 4))
+    with pytest.raises(PricingError, match='at most 10 days'):
+        engine.quote(CAR, date(3, 4), date(3, 14))
+    with pytest.raises(PricingError):
+        engine.quote(CAR, date(3, 5), date(3, 4))
+    assert engine.quote(CAR, date(3, 4), date(3, 13)) == 500.0 # Exactly the maximum
+    assert engine.quote(CAR[:6] + (None, None), date(3, 4), date(4, 30)) == 58 * 50.0 # No limits
+
+
+def test_weekend_and_season_multipliers():
+    engine = PricingEngine(origin=ORIGIN, weekend_multiplier=1.5, seasons=[('07-01', '08-31', 2.0), ('12-20', '01-05', 3.0)])
+    assert engine.quote(CAR, date(3, 4), date(3, 10)) == 50.0 * (5 + 2 * 1.5) # Monday to Sunday
+    assert engine.quote(CAR, date(7, 1), date(7, 3)) == 50.0 * 3 * 2.0 # Monday to Wednesday in season
+    # The winter season wraps around the new year
+    assert engine.day_multiplier(datetime.date(2024, 12, 31)) == 3.0
+    assert engine.day_multiplier(datetime.date(2025, 1, 4)) == 3.0 * 1.5 # Saturday
+    assert engine.day_multiplier(datetime.date(2025, 1, 6)) == 1.0
+
+
+def test_rates_and_discounts():
+    engine = PricingEngine(origin=ORIGIN, class_rates={'TOYOTA': 80}, car_rates={2: 120}, duration_discounts=[(7, 0.1), (3, 0.05)])
+    assert engine.base_rate(CAR) == 80.0 # Class rates ignore the case of the make
+    assert engine.base_rate((2,) + CAR[1:]) == 120.0 # A car's own rate wins
+    assert engine.base_rate((3, 'Ford') + CAR[2:]) == 50.0
+    assert engine.quote(CAR, date(3, 4), date(3, 5)) == 160.0
+    assert engine.quote(CAR, date(3, 4), date(3, 6)) == round(240 * 0.95, 2)
+    assert engine.quote(CAR, date(3, 4), date(3, 10)) == round(560 * 0.9, 2) # The largest applicable discount
+
+
+def test_outside_the_horizon_adds_days_one_by_one():
+    engine = PricingEngine(origin=ORIGIN, weekend_multiplier=2.0, horizon_days=30)
+    inside = PricingEngine(origin=ORIGIN, weekend_multiplier=2.0)
+    for start, end in ((date(1, 25), date(2, 3)), (date(5, 1), date(5, 10)), (datetime.date(2023, 12, 28), date(1, 2))):
+        assert engine.multiplier_sum(start, end) == inside.multiplier_sum(start, end)
+
+
+def test_catalog_quote_matches_single_quotes():
+    engine = PricingEngine(origin=ORIGIN, class_rates={'ford': 40}, weekend_multiplier=1.25, duration_discounts=[(5, 0.1)])
+    cars = [(1, 'Toyota', 'Corolla', 2020, 0, 1, 1, 3), (2, 'Ford', 'Focus', 2019, 0, 1, 2, None), (3, 'Ford', 'Fiesta', 2018, 0, 1, 8, 20)]
+    start, end = date(6, 6), date(6, 10)
+    quoted = engine.quote_catalog(cars, start, end)
+    assert [car[0] for car, _ in quoted] == [2] # Five days: too long for car 1, too short for car 3
+    assert quoted[0][1] == engine.quote(cars[1], start, end)
+    assert engine.rate_table(cars) is engine.rate_table(cars) # Kept for the same catalog
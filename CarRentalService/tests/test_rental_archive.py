@@ -0,0 +1,51 @@
+# Moving finished rentals to rentals_archive and reading both tables back as one list
+from conftest import day
+
+import main
+from rental_archive import archive_rentals
+
+
+def seed_history(db, count=25):
+    car_id, user_id = db.car(), db.user()
+    statuses = ('completed', 'cancelled', 'returned', 'active', 'on process')
+    return {db.rental(car_id, user_id, day(-100 + i * 2), day(-99 + i * 2), statuses[i % 5]): statuses[i % 5] for i in range(count)}
+
+
+def test_only_final_statuses_are_archived(pool, db):
+    rentals = seed_history(db)
+    assert archive_rentals(pool, older_than_days=30, batch_size=4) == 10
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT rental_id FROM rentals_archive")
+        archived = {row[0] for row in cursor.fetchall()}
+    assert archived == {rental_id for rental_id, status in rentals.items() if status in ('completed', 'cancelled')}
+
+
+def test_returned_rental_can_be_completed_after_archiving(managers, pool, db):
+    _, rental_manager = managers
+    rental_id = db.rental(db.car(), db.user(), day(-60), day(-55), 'returned')
+    assert archive_rentals(pool, older_than_days=30) == 0
+    assert rental_manager.complete_rental(rental_id)
+    assert archive_rentals(pool, older_than_days=30) == 1
+
+
+def test_pages_merge_both_tables(managers, pool, db):
+    _, rental_manager = managers
+    rentals = seed_history(db)
+    archive_rentals(pool, older_than_days=30)
+
+    listed = [row[0] for row in rental_manager.iter_rentals(page_size=3)]
+    assert listed == sorted(rentals) # Every rental once, in rental_id order across the page boundaries
+
+    finished = [row[0] for row in rental_manager.iter_rentals(statuses=('completed',), page_size=2)]
+    assert finished == sorted(rental_id for rental_id, status in rentals.items() if status == 'completed')
+
+    hot_only = [row[0] for row in rental_manager.iter_rentals(statuses=main.OPEN_STATUSES, archived=False, page_size=4)]
+    assert hot_only == sorted(rental_id for rental_id, status in rentals.items() if status in ('active', 'on process'))
+
+
+def test_pages_start_after_a_key(managers, pool, db):
+    _, rental_manager = managers
+    rentals = sorted(seed_history(db, 12))
+    archive_rentals(pool, older_than_days=30)
+    assert [row[0] for row in rental_manager.iter_rentals(after=rentals[5], page_size=2)] == rentals[6:]
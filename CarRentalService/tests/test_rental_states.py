@@ -0,0 +1,63 @@
+# Rental state machine and the optimistic version guard
+import pytest
+from conftest import day
+
+from rental_states import (ConcurrentUpdateError, InvalidTransitionError, RentalNotFoundError, allowed_sources,
+                           check_transition, transition)
+
+
+def test_transition_table():
+    check_transition(1, 'on process', 'active')
+    check_transition(1, 'returned', 'completed')
+    for current, target in (('active', 'on process'), ('completed', 'active'), ('cancelled', 'active'), ('returned', 'cancelled')):
+        with pytest.raises(InvalidTransitionError):
+            check_transition(1, current, target)
+    assert set(allowed_sources('completed')) == {'active', 'returned'}
+
+
+def test_transition_bumps_the_version(pool, db):
+    rental_id = db.rental(db.car(), db.user(), day(1), day(3))
+    with pool.connection() as conn:
+        assert transition(conn, rental_id, 'active') == 1
+        assert transition(conn, rental_id, 'returned', expected_version=1) == 2
+    assert db.status(rental_id) == ('returned', 2)
+
+
+def test_stale_version_is_rejected(pool, db):
+    rental_id = db.rental(db.car(), db.user(), day(1), day(3))
+    with pool.connection() as conn:
+        transition(conn, rental_id, 'active')
+        with pytest.raises(ConcurrentUpdateError):
+            transition(conn, rental_id, 'completed', expected_version=0)
+    assert db.status(rental_id) == ('active', 1)
+
+
+def test_illegal_move_and_unknown_rental(pool, db):
+    rental_id = db.rental(db.car(), db.user(), day(1), day(3), 'cancelled')
+    with pool.connection() as conn:
+        with pytest.raises(InvalidTransitionError):
+            transition(conn, rental_id, 'active')
+        with pytest.raises(RentalNotFoundError):
+            transition(conn, rental_id + 1, 'active')
+
+
+def test_other_customers_rental_is_not_found(pool, db):
+    owner, other = db.user(), db.user()
+    rental_id = db.rental(db.car(), owner, day(1), day(3), 'active')
+    with pool.connection() as conn:
+        with pytest.raises(RentalNotFoundError):
+            transition(conn, rental_id, 'returned', user_id=other)
+        transition(conn, rental_id, 'returned', user_id=owner)
+
+
+def test_manager_frees_the_dates(managers, db):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    rental_id = rentals.create_rental(car_id, user_id, day(5).isoformat(), day(9).isoformat())
+    assert not rentals.approve_rental(rental_id, expected_version=3)
+    assert rentals.approve_rental(rental_id, expected_version=0)
+    assert not rentals.availability.is_free(car_id, day(5), day(9))
+    assert rentals.return_rental(rental_id, user_id=user_id)
+    assert rentals.availability.is_free(car_id, day(5), day(9))
+    assert rentals.complete_rental(rental_id) # returned -> completed
+    assert db.status(rental_id) == ('completed', 3)
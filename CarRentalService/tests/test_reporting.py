@@ -0,0 +1,68 @@
+# Report aggregates: the totals kept up to date by status changes must equal a rebuild from the rentals
+from conftest import day
+
+import reporting
+from rental_archive import archive_rentals
+
+
+def aggregates(pool):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT day, car_id, rentals, revenue_cents FROM car_daily_usage WHERE rentals != 0 OR revenue_cents != 0 ORDER BY day, car_id")
+        per_car = [tuple(map(str, row)) for row in cursor.fetchall()]
+        cursor.execute("SELECT day, occupied_cars, revenue_cents, rentals_started FROM daily_totals "
+                       "WHERE occupied_cars != 0 OR revenue_cents != 0 OR rentals_started != 0 ORDER BY day")
+        per_day = [tuple(map(str, row)) for row in cursor.fetchall()]
+    return per_car, per_day
+
+
+def rebuilt(pool):
+    with pool.connection() as conn:
+        reporting.refresh(conn)
+    return aggregates(pool)
+
+
+def test_status_changes_match_a_rebuild(managers, pool, db):
+    _, rentals = managers
+    cars, user_id = [db.car(), db.car('Ford', 'Focus')], db.user()
+    # Three-day rentals with a fee of 100: the cents do not split evenly over the days
+    ids = [db.rental(cars[i % 2], user_id, day(-40 + i * 3), day(-38 + i * 3)) for i in range(12)]
+
+    rentals.approve_rentals(ids[:9]) # Batch: on process -> active
+    assert rentals.approve_rental(ids[9]) # Single
+    rentals.cancel_rentals(ids[10:]) # Never counted
+    rentals.cancel_rentals(ids[:2], statuses=('active',)) # Counted, then no longer
+    assert rentals.return_rental(ids[2])
+    assert rentals.complete_rental(ids[2]) # returned -> completed: still counted
+    rentals.complete_rentals(ids[3:6])
+
+    incremental = aggregates(pool)
+    assert incremental[0] # Something was counted
+    assert incremental == rebuilt(pool)
+
+
+def test_rebuild_includes_archived_rentals(managers, pool, db):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    ids = [db.rental(car_id, user_id, day(-90 + i * 5), day(-88 + i * 5)) for i in range(6)]
+    rentals.approve_rentals(ids)
+    rentals.complete_rentals(ids[:4])
+
+    incremental = aggregates(pool)
+    assert archive_rentals(pool, older_than_days=30) == 4
+    assert incremental == rebuilt(pool)
+
+
+def test_windowed_rebuild_leaves_other_days_alone(managers, pool, db):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    ids = [db.rental(car_id, user_id, day(-30 + i * 4), day(-28 + i * 4)) for i in range(6)]
+    rentals.approve_rentals(ids)
+
+    incremental = aggregates(pool)
+    with pool.connection() as conn:
+        reporting.refresh(conn, day(-20), day(-10))
+    assert aggregates(pool) == incremental
+    with pool.connection() as conn:
+        days = reporting.revenue_by_day(conn, day(-30), day(-7))
+    assert round(sum(revenue for _, revenue, _, _ in days), 2) == 600.0 # Every cent of the six fees
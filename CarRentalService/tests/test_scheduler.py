@@ -0,0 +1,78 @@
+# Scheduler sweeps: overdue rentals are completed, stale requests cancelled and cars.available_now kept in step
+from conftest import TODAY, day
+
+import reporting
+from scheduler import RentalScheduler
+from test_reporting import aggregates
+
+
+def available_now(pool, car_id):
+    with pool.connection() as conn:
+        cursor = conn.cursor()
+        cursor.execute("SELECT available_now FROM cars WHERE car_id = %s", (car_id,))
+        return cursor.fetchone()[0]
+
+
+def test_sweeps_move_rentals_in_batches(managers, pool, db):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    overdue = [db.rental(car_id, user_id, day(-20 + i), day(-10 + i), 'active') for i in range(5)]
+    current = db.rental(car_id, user_id, day(-3), TODAY, 'active') # Ends today: not overdue yet
+    stale = [db.rental(car_id, user_id, day(-5 + i), day(5), 'on process') for i in range(3)]
+    upcoming = db.rental(car_id, user_id, TODAY, day(2), 'on process')
+
+    run = RentalScheduler(rentals, batch_size=2).run_once()
+    assert (run['overdue'], run['expired'], run['error']) == (5, 3, None)
+    assert all(db.status(rental_id) == ('completed', 1) for rental_id in overdue)
+    assert all(db.status(rental_id) == ('cancelled', 1) for rental_id in stale)
+    assert db.status(current)[0] == 'active'
+    assert db.status(upcoming)[0] == 'on process'
+
+    second = RentalScheduler(rentals).run_once() # Nothing left to do
+    assert (second['overdue'], second['expired']) == (0, 0)
+
+
+def test_stale_after_days_gives_requests_a_grace_period(managers, db):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    recent = db.rental(car_id, user_id, day(-2), day(5))
+    old = db.rental(car_id, user_id, day(-4), day(5))
+    assert RentalScheduler(rentals, stale_after_days=3).run_once()['expired'] == 1
+    assert db.status(old)[0] == 'cancelled'
+    assert db.status(recent)[0] == 'on process'
+
+
+def test_sweeps_keep_reports_and_availability_in_step(managers, pool, db):
+    _, rentals = managers
+    car_id, user_id = db.car(), db.user()
+    rental_id = rentals.create_rental(car_id, user_id, day(1).isoformat(), day(3).isoformat())
+    rentals.approve_rental(rental_id)
+    assert not rentals.availability.is_free(car_id, day(1), day(3))
+
+    RentalScheduler(rentals).run_once(today=day(5)) # A few days later
+    assert db.status(rental_id)[0] == 'completed'
+    assert rentals.availability.is_free(car_id, day(1), day(3))
+    incremental = aggregates(pool)
+    with pool.connection() as conn:
+        reporting.refresh(conn)
+    assert aggregates(pool) == incremental
+
+
+def test_car_sweep_sets_available_now(managers, pool, db):
+    cars, rentals = managers
+    rented, free, retired = db.car(), db.car(), db.car(in_service=0)
+    user_id = db.user()
+    db.rental(rented, user_id, day(-1), day(1), 'active')
+    db.rental(free, user_id, day(1), day(2), 'active') # Starts tomorrow
+    assert cars.get_car(rented)[8] == 1 # Stale until the sweep
+
+    run = RentalScheduler(rentals, batch_size=2).run_once()
+    assert (run['cars_unavailable'], run['cars_available']) == (1, 0)
+    assert (available_now(pool, rented), available_now(pool, free), available_now(pool, retired)) == (0, 1, 0)
+    assert cars.get_car(rented)[8] == 0 # The car cache was refreshed
+
+    scheduler = RentalScheduler(rentals)
+    run = scheduler.run_once(today=day(3)) # Both rentals are over
+    assert run['overdue'] == 2
+    assert (run['cars_available'], available_now(pool, rented), available_now(pool, free)) == (1, 1, 1)
+    assert scheduler.stats()['totals']['runs'] == 1
@@ -0,0 +1,24 @@
+# The blocking client the menus use: errors are printed and the call returns None instead of ending the menu loop
+import pytest
+
+from connection_pool import PoolTimeoutError
+from service import ServiceClient
+from storage import DatabaseError
+
+
+class FailingService:
+    def __init__(self, error):
+        self.error = error
+
+    async def cars_page(self, token):
+        raise self.error
+
+
+@pytest.mark.parametrize('error', [DatabaseError("server has gone away"), PoolTimeoutError("No database connection available")])
+def test_client_reports_database_errors(error, capsys):
+    client = ServiceClient(FailingService(error))
+    try:
+        assert client.cars_page('token') is None
+    finally:
+        client.close()
+    assert capsys.readouterr().out == f"Error: {error}\n"
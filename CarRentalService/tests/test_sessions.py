@@ -0,0 +1,116 @@
+# Session tokens (signing, idle and absolute expiry, eviction, purge) and the login throttle, on a fake clock
+import pytest
+
+import sessions
+from sessions import LoginThrottle, LoginThrottledError, SessionError, SessionStore
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return self.now
+
+
+class User:
+    def __init__(self, user_id):
+        self.user_id = user_id
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sessions, 'time', clock)
+    return clock
+
+
+def test_token_round_trip_and_forgery(clock):
+    store = SessionStore(secret=b'k' * 32)
+    user = User(7)
+    token = store.create(user)
+    assert store.authenticate(token) is user
+    session_id, user_id, expires_at, signature = token.split('.')
+    for forged in (f"{session_id}.8.{expires_at}.{signature}", token[:-2], 'garbage', None):
+        with pytest.raises(SessionError):
+            store.authenticate(forged)
+    with pytest.raises(SessionError): # Another secret, e.g. after a restart
+        SessionStore(secret=b'j' * 32).authenticate(token)
+
+
+def test_idle_and_absolute_expiry(clock):
+    store = SessionStore(idle_timeout=100, absolute_timeout=1000)
+    token = store.create(User(1))
+    for _ in range(9): # Each request restarts the idle timer
+        clock.now += 99
+        store.authenticate(token)
+    clock.now += 101
+    with pytest.raises(SessionError, match='expired'):
+        store.authenticate(token)
+
+    token = store.create(User(1))
+    for _ in range(10):
+        clock.now += 99
+        store.authenticate(token)
+    clock.now += 99 # 1089 seconds after login
+    with pytest.raises(SessionError, match='expired'):
+        store.authenticate(token)
+    assert store.stats()['expired'] == 2
+
+
+def test_revoke_and_least_recently_used_eviction(clock):
+    store = SessionStore(max_sessions=2)
+    first, second = store.create(User(1)), store.create(User(2))
+    store.authenticate(first) # Now the second is the least recently used
+    third = store.create(User(1))
+    with pytest.raises(SessionError):
+        store.authenticate(second)
+    assert store.stats()['evicted'] == 1
+
+    assert store.revoke_user(1) == 2
+    for token in (first, third):
+        with pytest.raises(SessionError):
+            store.authenticate(token)
+    assert not store.revoke(first)
+
+
+def test_create_purges_expired_sessions(clock):
+    store = SessionStore(idle_timeout=100, purge_interval=60)
+    for user_id in range(5):
+        store.create(User(user_id))
+    clock.now += 150
+    assert store.stats()['active'] == 5 # Nothing looked at them yet
+    store.create(User(9))
+    assert store.stats()['active'] == 1
+    assert store.purge_expired() == 0
+
+
+def test_throttle_locks_out_after_repeated_failures(clock):
+    throttle = LoginThrottle(max_failures=3, window=60, lockout=300)
+    for _ in range(2):
+        throttle.check('a@test')
+        throttle.record_failure('a@test')
+    clock.now += 61 # The old failures fall out of the window
+    throttle.record_failure('a@test')
+    throttle.check('a@test')
+
+    throttle.record_failure('A@test ') # Same email
+    throttle.record_failure('a@test')
+    with pytest.raises(LoginThrottledError):
+        throttle.check('a@test')
+    throttle.check('b@test') # Other emails are not affected
+    assert throttle.stats() == {'tracked_emails': 1, 'locked_emails': 1, 'refused': 1}
+
+    clock.now += 301
+    throttle.check('a@test')
+
+
+def test_success_clears_failures(clock):
+    throttle = LoginThrottle(max_failures=2)
+    throttle.record_failure('a@test')
+    throttle.record_success('a@test')
+    throttle.record_failure('a@test')
+    throttle.check('a@test')